@@ -0,0 +1,52 @@
+"""
+async_render.py - asyncio wrapper around yolo_graph.render_bytes
+
+    svg = await render_async(yaml_text, "dark", DISPLAY_CONFIG)
+    svg = await render_async(model_dict, config, DISPLAY_CONFIG, fmt="svgz", executor=pool)
+
+Parsing, layout and routing are CPU-bound, so they run in an executor and
+the event loop only awaits the result. executor=None uses the loop's default
+thread pool; a ThreadPoolExecutor or ProcessPoolExecutor can be passed (or
+set once with set_executor). A ProcessPoolExecutor sidesteps the GIL for big
+models, at the cost of pickling the source and the result.
+
+Cancelling the awaiting task (task.cancel(), asyncio.wait_for timeouts, a
+client disconnect in the web framework) drops a render that has not started
+yet. In a thread it also sets the render's cancel event, so it stops before
+its next stage instead of running to completion. A render already running in
+a process finishes in the background and its result is discarded.
+"""
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from yolo_graph import render_bytes, RenderCancelled
+
+_executor = None
+
+
+def set_executor(executor):
+    """render_async 未指定 executor 时使用的默认 executor (None = 事件循环的默认线程池)"""
+    global _executor
+    _executor = executor
+
+
+async def render_async(source, config, display_config, fmt="svg", executor=None):
+    """
+    render_bytes 的异步版本, 返回 bytes; 参数同 render_bytes (不支持 out, 结果在事件循环中写出).
+    等待中的任务被取消时抛出 asyncio.CancelledError.
+    """
+    executor = executor or _executor
+    loop = asyncio.get_running_loop()
+    # 线程之间共享取消事件; 进程 worker 中无法共享, 只能取消尚未开始的任务
+    cancel = None if isinstance(executor, ProcessPoolExecutor) else threading.Event()
+    fut = loop.run_in_executor(executor, partial(render_bytes, source, config, display_config, fmt, None, cancel))
+    try:
+        return await fut
+    except asyncio.CancelledError:
+        if cancel is not None: cancel.set()
+        raise
+    except RenderCancelled:
+        raise asyncio.CancelledError() from None
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+batch.py - Render a whole model zoo in one run across a process pool
+Usage:
+    python batch.py examples/ "zoo/**/*.yaml" [--themes paper,dark] [--out svg_out] [--workers N]
+                    [--cache-dir .yolo_graph_cache | --no-cache] [--modules my_modules.yaml]
+                    [--sheet zoo.svg [--columns N] [--thumb-width PX]]
+"""
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import themes
+import yolo_graph
+import module_registry
+from main import DISPLAY_CONFIG
+from render_cache import RenderCache, DEFAULT_CACHE_DIR
+
+# 每个 worker 进程只构建一次主题配置 (和缓存句柄), 之后所有任务复用
+_WORKER_CONFIGS = {}
+_WORKER_CACHE = None
+
+
+def _init_worker(theme_names, cache_dir):
+    global _WORKER_CACHE
+    for name in theme_names:
+        _WORKER_CONFIGS[name] = themes.get_config(name)
+    if cache_dir:
+        _WORKER_CACHE = RenderCache(cache_dir)
+
+
+def _render_model(yaml_path, outputs, display_config):
+    """
+    在 worker 中渲染一个 YAML 的所有主题 (解析 / 布局只做一次), 异常只影响当前模型.
+    outputs: [(theme_name, out_path), ...]; 每个主题返回一条结果, 耗时为该模型的总耗时.
+    """
+    t0 = time.perf_counter()
+    targets = [(_WORKER_CONFIGS.get(t) or themes.get_config(t), o) for t, o in outputs]
+    try:
+        hits = yolo_graph.render_themes(yaml_path, targets, display_config, cache=_WORKER_CACHE)
+        err = None
+    except Exception as e:
+        hits = [False] * len(outputs)
+        err = f"{type(e).__name__}: {e}"
+    dt = time.perf_counter() - t0
+    return [(yaml_path, t, o, err, dt, None if _WORKER_CACHE is None else hit)
+            for (t, o), hit in zip(outputs, hits)]
+
+
+def collect_yamls(patterns):
+    """展开目录 / glob 模式, 返回去重后的 YAML 路径列表 (保持输入顺序)"""
+    found = []
+    for p in patterns:
+        if os.path.isdir(p):
+            hits = sorted(glob.glob(os.path.join(p, "**", "*.yaml"), recursive=True) +
+                          glob.glob(os.path.join(p, "**", "*.yml"), recursive=True))
+        elif any(c in p for c in "*?["):
+            hits = sorted(glob.glob(p, recursive=True))
+        else:
+            hits = [p]
+        found.extend(hits)
+    seen = set()
+    return [p for p in found if not (p in seen or seen.add(p))]
+
+
+def plan_outputs(yaml_paths, theme_names, out_dir):
+    """为每个 (YAML, 主题) 生成输出路径; 同名文件用父目录名区分"""
+    stems = {}
+    for p in yaml_paths:
+        stem = os.path.splitext(os.path.basename(p))[0]
+        stems[stem] = stems.get(stem, 0) + 1
+
+    jobs = []
+    for p in yaml_paths:
+        stem = os.path.splitext(os.path.basename(p))[0]
+        if stems[stem] > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(p)))
+            stem = f"{parent}_{stem}"
+        for t in theme_names:
+            jobs.append((p, t, os.path.join(out_dir, f"{stem}_{t}.svg")))
+    return jobs
+
+
+def run_batch(patterns, theme_names=("paper",), out_dir="svg_out", workers=None,
+              display_config=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    批量渲染; 返回 [(yaml_path, theme, out_path, error_or_None, seconds, cache_hit), ...]
+    cache_dir 为 None 时不使用缓存 (cache_hit 为 None).
+    """
+    display_config = DISPLAY_CONFIG if display_config is None else display_config
+    yaml_paths = collect_yamls(patterns)
+    if not yaml_paths:
+        print("⚠️ No YAML files matched.")
+        return []
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = plan_outputs(yaml_paths, theme_names, out_dir)
+    by_model = {}
+    for p, t, o in jobs:
+        by_model.setdefault(p, []).append((t, o))
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(by_model)))
+
+    print(f"📦 {len(yaml_paths)} models x {len(theme_names)} themes = {len(jobs)} jobs | 👷 {workers} workers")
+    t0 = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(tuple(theme_names), cache_dir)) as pool:
+        futures = {pool.submit(_render_model, p, outputs, display_config): (p, outputs) for p, outputs in by_model.items()}
+        for fut in as_completed(futures):
+            try:
+                model_results = fut.result()
+            except Exception as e:
+                # worker 进程崩溃 (OOM、C 扩展段错误 ...) 时抛出 BrokenProcessPool, 记为该模型所有输出的错误
+                p, outputs = futures[fut]
+                model_results = [(p, t, o, f"{type(e).__name__}: {e}", 0.0, None if cache_dir is None else False)
+                                 for t, o in outputs]
+            for res in model_results:
+                yaml_path, theme_name, out_path, err, dt, cached = res
+                if err is None:
+                    tag = " 💾" if cached else ""
+                    print(f"✅ {yaml_path} [{theme_name}] -> {out_path} ({dt*1000:.1f} ms){tag}")
+                else:
+                    print(f"❌ {yaml_path} [{theme_name}] {err} ({dt*1000:.1f} ms)")
+                results.append(res)
+    if cache_dir:
+        # worker 只在超过上限时淘汰; 结束时再统一检查一次
+        RenderCache(cache_dir).evict()
+
+    failed = sum(1 for r in results if r[3] is not None)
+    print(f"🏁 Done: {len(results) - failed} ok, {failed} failed in {time.perf_counter() - t0:.2f}s")
+    if cache_dir:
+        hits = sum(1 for r in results if r[5])
+        print(f"💾 Cache: {hits} hits, {len(results) - hits} misses ({cache_dir})")
+    return results
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ("-h", "--help"):
+        print('Usage: python batch.py DIR|GLOB [...] [--themes paper,dark|all] [--out svg_out] [--workers N] '
+              '[--cache-dir DIR | --no-cache] [--modules FILE] [--sheet FILE [--columns N] [--thumb-width PX]]')
+        return 0
+
+    theme_names = ["paper"]
+    out_dir = "svg_out"
+    workers = None
+    cache_dir = DEFAULT_CACHE_DIR
+    sheet, columns, thumb_w = None, None, 480
+    patterns = []
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a == "--themes" and i + 1 < len(args):
+            value = args[i + 1]
+            theme_names = list(themes.THEMES) if value == "all" else [t for t in value.split(",") if t]
+            i += 2
+        elif a == "--out" and i + 1 < len(args):
+            out_dir = args[i + 1]; i += 2
+        elif a == "--workers" and i + 1 < len(args):
+            workers = int(args[i + 1]); i += 2
+        elif a == "--cache-dir" and i + 1 < len(args):
+            cache_dir = args[i + 1]; i += 2
+        elif a == "--sheet" and i + 1 < len(args):
+            sheet = args[i + 1]; i += 2
+        elif a == "--columns" and i + 1 < len(args):
+            columns = int(args[i + 1]); i += 2
+        elif a == "--thumb-width" and i + 1 < len(args):
+            thumb_w = int(args[i + 1]); i += 2
+        elif a == "--no-cache":
+            cache_dir = None; i += 1
+        elif a == "--modules" and i + 1 < len(args):
+            # 通过环境变量传给 worker 进程 (spawn 模式下也能生效)
+            module_registry.load_plugin(args[i + 1])
+            prev = os.environ.get("YOLO_GRAPH_MODULES")
+            os.environ["YOLO_GRAPH_MODULES"] = os.pathsep.join(filter(None, [prev, args[i + 1]]))
+            i += 2
+        else:
+            patterns.append(a); i += 1
+
+    if sheet:
+        # 目录图: 所有模型排进一个文档, 每个主题一张 (多个主题时文件名加 _<theme>)
+        import contact_sheet
+        yaml_paths = collect_yamls(patterns)
+        if not yaml_paths:
+            print("⚠️ No YAML files matched.")
+            return 1
+        stem, ext = os.path.splitext(sheet)
+        failed = False
+        for t in theme_names:
+            out = sheet if len(theme_names) == 1 else f"{stem}_{t}{ext}"
+            config = dict(themes.get_config(t), compact=True)
+            results = contact_sheet.run_sheet(yaml_paths, out, config, DISPLAY_CONFIG, columns, thumb_w, workers)
+            failed = failed or any(err is not None for _, _, err in results)
+        return 1 if failed else 0
+
+    results = run_batch(patterns, theme_names, out_dir, workers, cache_dir=cache_dir)
+    return 1 if any(r[3] is not None for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+bench_layout.py - Layout engine benchmark on synthetic deep graphs
+Usage:
+    python benchmarks/bench_layout.py [--layers 1000,10000,50000] [--engine layered]
+"""
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import themes
+from layer_graph import build_graph
+from layout import compute_layout
+from synthetic import synthetic_model
+
+
+def main():
+    sizes = [1000, 10000, 50000]
+    engine = "layered"
+    args = sys.argv[1:]
+    if "--layers" in args: sizes = [int(s) for s in args[args.index("--layers") + 1].split(",")]
+    if "--engine" in args: engine = args[args.index("--engine") + 1]
+
+    config = themes.get_config("paper")
+    config["layout_engine"] = engine
+    print(f"engine: {engine}")
+    for n in sizes:
+        graph = build_graph(synthetic_model(n))
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            geom = compute_layout(graph, config)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{n:>7} layers  {graph.num_edges:>7} edges  layout {best*1000:8.1f} ms  "
+              f"canvas {geom.width:.0f}x{geom.height:.0f}")
+
+
+if __name__ == "__main__":
+    main()
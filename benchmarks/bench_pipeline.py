@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py - Stage-by-stage benchmark of the YAML -> SVG pipeline
+Usage:
+    python benchmarks/bench_pipeline.py [--tiers small,medium,large] [--repeat 3] [--engine lanes]
+                                        [--json results.json] [--compare baseline.json] [--threshold 1.2]
+
+Tiers:
+    small   the checked-in examples/*.yaml
+    medium  synthetic models with 200 / 1000 layers
+    large   synthetic models with 5000 / 20000 layers
+Stages: load (yaml_loader) / build (per-layer inference) / layout / route / render (SVGBuilder.generate) / write.
+Times are the best of --repeat runs; peak memory per stage is measured in a separate tracemalloc pass.
+"""
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import glob
+import json
+import time
+import platform
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import themes
+from main import DISPLAY_CONFIG
+from layer_graph import build_graph
+from layout import compute_layout
+from routing import route_edges
+from yolo_graph import render_svg
+from yaml_loader import load_model_text
+from synthetic import synthetic_yaml
+
+STAGES = ("load", "build", "layout", "route", "render", "write")
+
+TIERS = {
+    "medium": [("synthetic_200", 200), ("synthetic_1000", 1000)],
+    "large": [("synthetic_5000", 5000), ("synthetic_20000", 20000)],
+}
+
+
+def tier_cases(tier, fan_in=2, skip=24):
+    """返回 [(name, yaml_text), ...]; small 档直接使用仓库中的 examples"""
+    if tier == "small":
+        cases = []
+        for p in sorted(glob.glob(os.path.join(ROOT, "examples", "*.yaml"))):
+            with open(p, 'r', encoding='utf-8') as f:
+                cases.append((os.path.splitext(os.path.basename(p))[0], f.read()))
+        return cases
+    return [(name, synthetic_yaml(n, fan_in=fan_in, skip=skip)) for name, n in TIERS[tier]]
+
+
+def run_pipeline(text, config, out_path, probe):
+    """按阶段执行一次完整流水线; probe(stage) 在每个阶段结束时调用"""
+    d = load_model_text(text); probe("load")
+    graph = build_graph(d); probe("build")
+    geom = compute_layout(graph, config); probe("layout")
+    routes = list(route_edges(graph, geom, config)); probe("route")
+    buf = io.StringIO()
+    render_svg(graph, geom, config, DISPLAY_CONFIG, buf, routes)
+    svg = buf.getvalue(); probe("render")
+    with open(out_path, 'w', encoding='utf-8') as f: f.write(svg)
+    probe("write")
+    return graph, len(svg)
+
+
+def bench_case(name, tier, text, config, repeat, out_path):
+    best = dict.fromkeys(STAGES, float("inf"))
+    for _ in range(repeat):
+        t = [time.perf_counter()]
+        def probe(stage):
+            now = time.perf_counter()
+            best[stage] = min(best[stage], now - t[0])
+            t[0] = now
+        graph, size = run_pipeline(text, config, out_path, probe)
+
+    # 峰值内存单独测一遍 (tracemalloc 本身会拖慢计时)
+    peaks = {}
+    tracemalloc.start()
+    def probe_mem(stage):
+        peaks[stage] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.reset_peak()
+    run_pipeline(text, config, out_path, probe_mem)
+    tracemalloc.stop()
+
+    stages_ms = {s: round(best[s] * 1000, 3) for s in STAGES}
+    return {"name": name, "tier": tier, "layers": len(graph), "edges": graph.num_edges,
+            "svg_bytes": size, "stages_ms": stages_ms, "total_ms": round(sum(stages_ms.values()), 3),
+            "peak_kb": {s: round(peaks[s], 1) for s in STAGES}}
+
+
+def compare(results, baseline_path, threshold):
+    """与旧的 JSON 结果逐阶段对比, 返回变慢超过 threshold 倍的 (case, stage, old, new) 列表"""
+    with open(baseline_path, 'r', encoding='utf-8') as f: old = json.load(f)
+    old_cases = {r["name"]: r for r in old.get("results", [])}
+    regressions = []
+    print(f"\n📏 Compared with {baseline_path} (threshold {threshold:.2f}x)")
+    for r in results:
+        o = old_cases.get(r["name"])
+        if o is None: continue
+        cells = []
+        for s in STAGES + ("total",):
+            a = o["total_ms"] if s == "total" else o["stages_ms"].get(s)
+            b = r["total_ms"] if s == "total" else r["stages_ms"][s]
+            if not a: continue
+            ratio = b / a
+            # 亚毫秒的阶段噪声太大, 不计入回归
+            if ratio > threshold and b > 1.0:
+                regressions.append((r["name"], s, a, b))
+                cells.append(f"{s} {ratio:.2f}x ❌")
+            else:
+                cells.append(f"{s} {ratio:.2f}x")
+        print(f"  {r['name']:<18} " + "  ".join(cells))
+    return regressions
+
+
+def main():
+    args = sys.argv[1:]
+    opt = lambda name, default: args[args.index(name) + 1] if name in args else default
+    tiers = opt("--tiers", "small,medium").split(",")
+    repeat = int(opt("--repeat", 3))
+    engine = opt("--engine", "lanes")
+    json_path = opt("--json", None)
+    baseline = opt("--compare", None)
+    threshold = float(opt("--threshold", 1.2))
+    fan_in = int(opt("--fan-in", 2))
+    skip = int(opt("--skip", 24))
+
+    config = themes.get_config("paper")
+    config["layout_engine"] = engine
+    out_path = os.path.join(tempfile.gettempdir(), f"bench_pipeline_{os.getpid()}.svg")
+
+    print(f"engine: {engine} | router: {config['edge_router']} | repeat: {repeat}")
+    header = f"{'case':<18}{'layers':>7}{'edges':>7}" + "".join(f"{s:>9}" for s in STAGES) + f"{'total':>10}{'peak':>10}"
+    print(header)
+    results = []
+    for tier in tiers:
+        for name, text in tier_cases(tier, fan_in, skip):
+            r = bench_case(name, tier, text, config, repeat, out_path)
+            results.append(r)
+            print(f"{name:<18}{r['layers']:>7}{r['edges']:>7}" +
+                  "".join(f"{r['stages_ms'][s]:>9.2f}" for s in STAGES) +
+                  f"{r['total_ms']:>10.2f}{max(r['peak_kb'].values()):>8.0f}KB")
+    try: os.remove(out_path)
+    except OSError: pass
+
+    if json_path:
+        doc = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                        "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "engine": engine,
+                        "router": config["edge_router"], "repeat": repeat, "units": {"stages_ms": "ms", "peak_kb": "KiB"}},
+               "results": results}
+        with open(json_path, 'w', encoding='utf-8') as f: json.dump(doc, f, indent=2)
+        print(f"💾 Saved to {json_path}")
+
+    if baseline:
+        regressions = compare(results, baseline, threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) slower than {threshold:.2f}x")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
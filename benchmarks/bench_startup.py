@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py - Cold-start time of a single-diagram CLI invocation
+Usage:
+    python benchmarks/bench_startup.py [model.yaml] [--runs 10]
+
+Runs `python main.py model.yaml out.svg` in fresh interpreters and reports the
+wall time, plus `python -X importtime -c "import main"` for the import cost alone.
+Run it without PYTHONDONTWRITEBYTECODE so both sides use cached bytecode.
+"""
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_times(cmd, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def import_cost():
+    """import main 的累计导入耗时 (ms), 以及最耗时的几个顶层依赖"""
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, cum_us, name = line.split("|")
+        # 名称前每层缩进两个空格: " main" 为顶层, "   yolo_graph" 为 main 的直接依赖
+        rows.append((int(cum_us), len(name) - len(name.lstrip()), name.strip()))
+    # 子模块先于父模块输出: main 之前、上一个顶层模块之后的第二层即 main 的直接依赖
+    end = next((i for i, r in enumerate(rows) if r[1] == 1 and r[2] == "main"), None)
+    if end is None:
+        return 0.0, []
+    children = []
+    for us, depth, name in reversed(rows[:end]):
+        if depth == 1: break
+        if depth == 3: children.append((us, name))
+    top = sorted(children, reverse=True)[:5]
+    return rows[end][0] / 1000, [(name, us / 1000) for us, name in top]
+
+
+def main():
+    args = sys.argv[1:]
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 10
+    model = next((a for a in args if a.endswith((".yaml", ".yml"))), os.path.join("examples", "yolov8.yaml"))
+    out = os.path.join(tempfile.gettempdir(), f"bench_startup_{os.getpid()}.svg")
+
+    baseline = run_times([sys.executable, "-c", "pass"], runs)
+    cli = run_times([sys.executable, "main.py", model, out], runs)
+    total_ms, top = import_cost()
+    try: os.remove(out)
+    except OSError: pass
+
+    print(f"python -c pass        min {baseline[0]*1000:7.1f} ms   median {baseline[1]*1000:7.1f} ms")
+    print(f"main.py {os.path.basename(model):<13} min {cli[0]*1000:7.1f} ms   median {cli[1]*1000:7.1f} ms")
+    print(f"import main           {total_ms:7.1f} ms")
+    for name, ms in top:
+        print(f"    {name:<22}{ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
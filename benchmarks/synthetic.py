@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+synthetic.py - Synthetic Ultralytics-style model YAMLs for benchmarks
+Usage:
+    python benchmarks/synthetic.py --layers 2000 [--fan-in 2] [--skip 24] [--every 8] [--heads 3] > model.yaml
+"""
+# -*- coding: utf-8 -*-
+import sys
+
+
+def synthetic_model(num_layers, fan_in=2, skip=24, every=8, heads=3):
+    """
+    YOLO 风格的合成模型: 一半 backbone (Conv / C2f), 一半带 Concat 跳连的 neck, 末尾 heads 个 Detect.
+    fan_in: 每个 Concat 的输入数 (-1 加上 fan_in-1 个跳连); skip: 跳连距离; every: 每隔多少层放一个 Concat.
+    """
+    bb_len = num_layers // 2
+    backbone = []
+    for i in range(bb_len):
+        if i % 4 == 0: backbone.append([-1, 1, "Conv", [64, 3, 2 if i % 16 == 0 else 1]])
+        else: backbone.append([-1, 2, "C2f", [64, True]])
+    head = []
+    neck_len = num_layers - bb_len - heads
+    for j in range(neck_len):
+        i = bb_len + j
+        if j % every == 0 and j:
+            srcs = [-1] + [max(0, i - skip * k) for k in range(1, fan_in)]
+            head.append([srcs, 1, "Concat", [1]])
+        elif j % every == 1:
+            head.append([-1, 1, "nn.Upsample", [None, 2, "nearest"]])
+        else:
+            head.append([-1, 1, "C2f", [128]])
+    last = bb_len + neck_len - 1
+    for h in range(heads):
+        head.append([[max(0, last - k * every) for k in range(3)], 1, "Detect", ["nc"]])
+    return {"nc": 80, "backbone": backbone, "head": head}
+
+
+def _flow(v):
+    """层定义的 YAML flow 写法; 只需覆盖合成模型里出现的类型"""
+    if isinstance(v, list): return "[" + ", ".join(_flow(x) for x in v) + "]"
+    if v is None: return "null"
+    if isinstance(v, bool): return "true" if v else "false"
+    return str(v)
+
+
+def synthetic_yaml(num_layers, **kw):
+    """与 synthetic_model 相同, 返回 YAML 文本 (每层一行, 与官方配置的写法一致)"""
+    d = synthetic_model(num_layers, **kw)
+    lines = [f"nc: {d['nc']}"]
+    for key in ("backbone", "head"):
+        lines.append(f"{key}:")
+        for item in d[key]:
+            lines.append("  - " + _flow(item))
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    args = sys.argv[1:]
+    opt = lambda name, default: int(args[args.index(name) + 1]) if name in args else default
+    sys.stdout.write(synthetic_yaml(opt("--layers", 1000), fan_in=opt("--fan-in", 2), skip=opt("--skip", 24),
+                                    every=opt("--every", 8), heads=opt("--heads", 3)))
+
+
+if __name__ == "__main__":
+    main()
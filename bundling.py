@@ -0,0 +1,198 @@
+"""
+bundling.py - Edge bundling: merge fan-out / fan-in edges into shared trunks
+
+Runs after routing.route_edges when the theme config has "edge_bundling" on.
+Left-to-right edges (leaving a node's right side, entering another node's
+left side) are grouped
+    fan-out   by source: one stub from the source to a vertical bus, then a
+              short horizontal branch from the bus into each target
+    fan-in    by target (edges not already bundled): one stub per source into
+              a bus just left of the target, one branch into the target
+    corridor  same-column skip connections (routing "detour_right") share one
+              vertical trunk to the right of the column, drawn only over the
+              merged spans of its edges
+    spine     straight edges between vertically adjacent nodes of a column are
+              joined into one path per dash style
+Every source and target keeps its own stub (and every target its own arrow),
+so each endpoint stays identifiable. A group is drawn as a single <path>, and
+all arrowheads of all bundles as one more <path>. Bus positions are checked against the node grid
+(routing.GridIndex); branches that would cut through a node stay ordinary
+edges, and groups left with fewer than two edges are not bundled.
+"""
+# -*- coding: utf-8 -*-
+from routing import GridIndex
+
+
+class BundledRoutes:
+    """
+    捆绑结果:
+        singles  未捆绑的连线, 与 route_edges 的元素相同 (start_pt, end_pt, dashed, routing, via)
+        bundles  [(dashed, polylines, tips), ...]; polylines 为折线点列表,
+                 tips 为箭头 (x, y, dx, dy): 终点坐标与单位朝向
+    """
+    __slots__ = ("singles", "bundles", "bundled")
+
+    def __init__(self):
+        self.singles = []
+        self.bundles = []
+        self.bundled = 0
+
+
+def _left_to_right(geom, src, dst, start_pt, end_pt):
+    """起点在源节点右边中点, 终点在目标节点左边中点, 且方向向右"""
+    x, y, w, h = geom.rect(src)
+    if abs(start_pt[0] - (x + w)) > 0.01 or abs(start_pt[1] - (y + h / 2)) > 0.01:
+        return False
+    x, y, w, h = geom.rect(dst)
+    if abs(end_pt[0] - x) > 0.01 or abs(end_pt[1] - (y + h / 2)) > 0.01:
+        return False
+    return end_pt[0] > start_pt[0]
+
+
+class EdgeBundler:
+    """按源节点 / 目标节点分组捆绑; 每组的竖直总线避开节点"""
+
+    def __init__(self, graph, geom, margin=8, max_tries=8, corridor_gap=24):
+        self.graph = graph
+        self.geom = geom
+        self.margin = margin
+        self.corridor_gap = corridor_gap
+        self.max_tries = max_tries
+        self.index = GridIndex.from_geometry(geom)
+        self.buses = GridIndex(cell=self.index.cell)   # 已占用的竖直总线, 不同分组的总线不重合
+
+    def _bus_x(self, x, lo, hi, y0, y1, exclude):
+        """在 (lo, hi) 内寻找一条不穿过节点、不与已有总线重合的竖直通道 x, 从 x 开始向右尝试; 找不到返回 None"""
+        hit = self.index.hit_segment
+        m = self.margin
+        for _ in range(self.max_tries):
+            if not (lo < x < hi): return None
+            key = hit(x, y0, x, y1, exclude, m)
+            if key is None:
+                if self.buses.hit_segment(x, y0, x, y1, (), 2) is None: return x
+                x += m
+                continue
+            rx, ry, rw, rh = self.index.rects[key]
+            x = rx + rw + m
+        return None
+
+    def _take_bus(self, x, y0, y1):
+        self.buses.insert(len(self.buses.rects), (x, y0, 0, y1 - y0))
+
+    def _clear(self, x0, x1, y, exclude):
+        return self.index.hit_segment(x0, y, x1, y, exclude, 1) is None
+
+    def _fan_out(self, members, routes, src):
+        """members: 同一源节点的边下标; 返回 (bus_x, 保留的边) 或 None"""
+        sx, sy = routes[members[0]][0]
+        dst = self.graph.edge_dst
+        near = min(routes[e][1][0] for e in members)
+        exclude = {src}.union(dst[e] for e in members)
+        ys = [routes[e][1][1] for e in members] + [sy]
+        x = self._bus_x((sx + near) / 2, sx + self.margin, near - self.margin, min(ys), max(ys), exclude)
+        if x is None or not self._clear(sx, x, sy, exclude): return None
+        keep = [e for e in members if self._clear(x, routes[e][1][0], routes[e][1][1], (dst[e],))]
+        return (x, keep) if len(keep) > 1 else None
+
+    def _fan_in(self, members, routes, dst):
+        ex, ey = routes[members[0]][1]
+        src = self.graph.edge_src
+        far = max(routes[e][0][0] for e in members)
+        exclude = {dst}.union(src[e] for e in members)
+        ys = [routes[e][0][1] for e in members] + [ey]
+        x = self._bus_x((far + ex) / 2, far + self.margin, ex - self.margin, min(ys), max(ys), exclude)
+        if x is None or not self._clear(x, ex, ey, exclude): return None
+        keep = [e for e in members if self._clear(routes[e][0][0], x, routes[e][0][1], (src[e],))]
+        return (x, keep) if len(keep) > 1 else None
+
+    def _corridor(self, members, routes):
+        """同列跳连: 返回 (trunk_x, 合并后的竖直区间) 或 None"""
+        x = max(max(routes[e][0][0], routes[e][1][0]) for e in members) + self.corridor_gap
+        spans = sorted((min(routes[e][0][1], routes[e][1][1]), max(routes[e][0][1], routes[e][1][1]))
+                       for e in members)
+        merged = [list(spans[0])]
+        for y0, y1 in spans[1:]:
+            if y0 <= merged[-1][1]: merged[-1][1] = max(merged[-1][1], y1)
+            else: merged.append([y0, y1])
+        for _ in range(self.max_tries):
+            if all(self.index.hit_segment(x, y0, x, y1, (), self.margin) is None
+                   and self.buses.hit_segment(x, y0, x, y1, (), 2) is None for y0, y1 in merged):
+                for y0, y1 in merged: self._take_bus(x, y0, y1)
+                return x, merged
+            x += self.margin
+        return None
+
+    def bundle(self, routes):
+        graph, geom = self.graph, self.geom
+        out = BundledRoutes()
+        taken = [False] * len(routes)
+        by_src, by_dst, by_col = {}, {}, {}
+        for e, ((start_pt, end_pt, dashed, routing, via), s, d) in enumerate(
+                zip(routes, graph.edge_src, graph.edge_dst)):
+            if routing == "vertical_straight":
+                by_col.setdefault(("spine", dashed), []).append(e)
+            elif routing == "detour_right":
+                by_col.setdefault((graph.lane[s], geom.neck_col[s], dashed), []).append(e)
+            elif routing != "vertical_straight" and _left_to_right(geom, s, d, start_pt, end_pt):
+                by_src.setdefault((s, dashed), []).append(e)
+                by_dst.setdefault((d, dashed), []).append(e)
+
+        for (s, dashed), members in by_src.items():
+            if len(members) < 2: continue
+            found = self._fan_out(members, routes, s)
+            if found is None: continue
+            x, keep = found
+            sx, sy = routes[keep[0]][0]
+            ends = [routes[e][1] for e in keep]
+            ys = [y for _, y in ends] + [sy]
+            lines = [[(sx, sy), (x, sy)], [(x, min(ys)), (x, max(ys))]]
+            lines += [[(x, ey), (ex, ey)] for ex, ey in ends]
+            self._take_bus(x, min(ys), max(ys))
+            out.bundles.append((dashed, lines, [(ex, ey, 1, 0) for ex, ey in ends]))
+            for e in keep: taken[e] = True
+
+        for (d, dashed), members in by_dst.items():
+            members = [e for e in members if not taken[e]]
+            if len(members) < 2: continue
+            found = self._fan_in(members, routes, d)
+            if found is None: continue
+            x, keep = found
+            ex, ey = routes[keep[0]][1]
+            starts = [routes[e][0] for e in keep]
+            ys = [y for _, y in starts] + [ey]
+            lines = [[(sx, sy), (x, sy)] for sx, sy in starts]
+            lines += [[(x, min(ys)), (x, max(ys))], [(x, ey), (ex, ey)]]
+            self._take_bus(x, min(ys), max(ys))
+            out.bundles.append((dashed, lines, [(ex, ey, 1, 0)]))
+            for e in keep: taken[e] = True
+
+        for key, members in by_col.items():
+            if len(members) < 2: continue
+            dashed = key[-1]
+            if key[0] == "spine":
+                # 相邻层的竖直直线本身不会重叠, 只合并为一个 <path>
+                out.bundles.append((dashed, [[routes[e][0], routes[e][1]] for e in members],
+                                    [routes[e][1] + (0, 1) for e in members]))
+                for e in members: taken[e] = True
+                continue
+            found = self._corridor(members, routes)
+            if found is None: continue
+            x, merged = found
+            lines = [[(x, y0), (x, y1)] for y0, y1 in merged]
+            tips = []
+            for e in members:
+                (sx, sy), (ex, ey) = routes[e][0], routes[e][1]
+                lines.append([(sx, sy), (x, sy)])
+                lines.append([(x, ey), (ex, ey)])
+                tips.append((ex, ey, -1, 0))
+                taken[e] = True
+            out.bundles.append((dashed, lines, tips))
+
+        out.singles = [r for r, t in zip(routes, taken) if not t]
+        out.bundled = sum(taken)
+        return out
+
+
+def bundle_routes(graph, geom, routes):
+    """routes: route_edges 的结果 (列表); 返回 BundledRoutes"""
+    return EdgeBundler(graph, geom).bundle(routes)
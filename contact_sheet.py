@@ -0,0 +1,118 @@
+"""
+contact_sheet.py - Many models as scaled thumbnails in one SVG document
+
+    python batch.py examples/ --sheet zoo.svg [--columns 4] [--thumb-width 480]
+
+Every model is parsed, laid out and routed in its own worker process (the
+same pool setup as batch.py); only the Geometry / routes come back. The
+parent then writes a single document: the header, stylesheet and <defs>
+(gradients, shadow filter, arrow marker) once, followed by one
+<g transform="translate(x y) scale(s)"> per model holding its unmodified
+body. With compact output (what batch.py --sheet writes) the per-size node
+templates are shared across all models too. Models are placed row by row;
+each thumbnail is scaled down to the column width and captioned with its
+file name.
+"""
+# -*- coding: utf-8 -*-
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import profiling
+from yolo_graph import load_graph, annotate_shapes, layout_graph, route_graph, svg_document, draw_graph_at
+
+CAPTION_H = 28   # 缩略图上方标题栏的高度
+GAP = 24         # 缩略图之间及到画布边缘的间距
+
+
+def layout_model(yaml_path, config, display_config):
+    """解析 + 布局 + 路由一个模型, 返回 (graph, geom, routes); 在 worker 进程中运行"""
+    graph = load_graph(yaml_path)
+    annotate_shapes(graph, display_config)
+    geom = layout_graph(graph, config, display_config)
+    return graph, geom, route_graph(graph, geom, config)
+
+
+def layout_models(yaml_paths, config, display_config, workers=None):
+    """
+    并行布局多个模型; 返回与 yaml_paths 同序的 [(yaml_path, (graph, geom, routes) | None, error | None), ...].
+    workers=1 时在当前进程中依次完成.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(yaml_paths)))
+    results = []
+    if workers == 1:
+        for p in yaml_paths:
+            try:
+                results.append((p, layout_model(p, config, display_config), None))
+            except Exception as e:
+                results.append((p, None, f"{type(e).__name__}: {e}"))
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(layout_model, p, config, display_config) for p in yaml_paths]
+        for p, fut in zip(yaml_paths, futures):
+            try:
+                results.append((p, fut.result(), None))
+            except Exception as e:
+                results.append((p, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def place_thumbnails(sizes, columns, thumb_w):
+    """
+    sizes: [(width, height), ...]; 逐行排列, 每个缩略图缩放到不超过 thumb_w 宽 (不放大).
+    返回 ([(x, y, scale), ...], 画布宽, 画布高); (x, y) 为缩略图左上角, 标题栏在其上方.
+    """
+    placements = []
+    y = GAP
+    for row in range(0, len(sizes), columns):
+        row_h = 0
+        for col, (w, h) in enumerate(sizes[row:row + columns]):
+            scale = min(1.0, thumb_w / w) if w else 1.0
+            placements.append((GAP + col * (thumb_w + GAP), y + CAPTION_H, scale))
+            row_h = max(row_h, h * scale)
+        y += CAPTION_H + row_h + GAP
+    width = GAP + min(columns, len(sizes)) * (thumb_w + GAP)
+    return placements, width, y
+
+
+def render_sheet(yaml_paths, out_file, config, display_config, columns=None, thumb_w=480, workers=None):
+    """
+    把 yaml_paths 中的模型排成一张目录图写入 out_file (.svg / .svgz).
+    columns: 每行的模型数, 默认约为 sqrt(模型数); 返回 layout_models 的结果 (出错的模型不出现在图中).
+    """
+    prof = profiling.begin(f"sheet: {out_file}")
+    try:
+        with prof.stage("layout"): results = layout_models(yaml_paths, config, display_config, workers)
+        models = [(p, r) for p, r, err in results if r is not None]
+        prof.count("models", len(models))
+        if not models:
+            return results
+        columns = columns or math.ceil(math.sqrt(len(models)))
+        placements, width, height = place_thumbnails([(g.width, g.height) for _, (_, g, _) in models],
+                                                     columns, thumb_w)
+        with prof.stage("render"):
+            with svg_document(out_file, config, width, height) as svg:
+                for k, ((path, (graph, geom, routes)), (x, y, scale)) in enumerate(zip(models, placements)):
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    draw_graph_at(svg, graph, geom, routes, display_config, x, y, scale,
+                                  caption=f"{name} ({len(graph)} layers)", id_prefix=f"m{k}_")
+        prof.count("elements", svg.elements)
+        if prof is not profiling.NULL_PROFILE:
+            prof.count("bytes", os.path.getsize(out_file))
+        return results
+    finally:
+        profiling.end(prof)
+
+
+def run_sheet(yaml_paths, out_file, config, display_config, columns=None, thumb_w=480, workers=None):
+    """render_sheet + 命令行输出 (batch.py --sheet)"""
+    t0 = time.perf_counter()
+    results = render_sheet(yaml_paths, out_file, config, display_config, columns, thumb_w, workers)
+    for p, r, err in results:
+        if err is not None: print(f"❌ {p} {err}")
+    ok = sum(1 for _, r, _ in results if r is not None)
+    if ok:
+        size = os.path.getsize(out_file)
+        print(f"🗂️ Sheet: {ok} models -> {out_file} ({size / 1024:.1f} KB, {time.perf_counter() - t0:.2f}s)")
+    return results
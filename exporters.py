@@ -0,0 +1,124 @@
+"""
+exporters.py - Non-SVG writers fed from the same parsed LayerGraph
+
+    .json         node / edge lists with channels, strides, lanes and args
+    .dot / .gv    Graphviz digraph, one cluster per lane
+    .mmd          Mermaid flowchart, one subgraph per lane
+The format is picked from the output file extension, so yolo_graph.render_themes
+can mix SVG and exporter targets: the YAML is parsed and inferred once, and
+exporters skip layout and routing entirely. More writers can be added with
+register_exporter(".ext", fn) where fn(graph, out, config, display_config)
+writes to the text stream out.
+"""
+# -*- coding: utf-8 -*-
+import os
+
+from layer_graph import TYPE_NAMES, TYPE_CONCAT, LANE_BACKBONE, LANE_NECK, LANE_HEAD
+
+LANE_NAMES = {LANE_BACKBONE: "backbone", LANE_NECK: "neck", LANE_HEAD: "head"}
+_LANE_TITLES = {LANE_BACKBONE: "Backbone", LANE_NECK: "Neck", LANE_HEAD: "Head"}
+
+# --export 中使用的格式名 -> 扩展名
+FORMATS = {"svg": ".svg", "svgz": ".svgz", "html": ".html", "json": ".json", "dot": ".dot", "mermaid": ".mmd", "mmd": ".mmd"}
+
+
+def _dashed(graph, s, d):
+    """与 SVG 相同的虚线规则: 跨泳道或跨层的连接"""
+    return graph.lane[s] != graph.lane[d] or d - s > 1
+
+
+def write_json(graph, out, config, display_config):
+    """{"meta", "nodes": [...], "edges": [[src, dst], ...]}; 有 shapes 时附带所选尺度的参数量 / FLOPs"""
+    import json
+    shapes = graph.shapes
+    k = shapes.scale_index(display_config.get("scale")) if shapes is not None else None
+    nodes = []
+    for i in range(len(graph)):
+        node = {"id": i, "label": graph.labels[i], "module": graph.modules[i], "type": TYPE_NAMES[graph.type_id[i]],
+                "lane": LANE_NAMES[graph.lane[i]], "from": list(graph.sources(i)), "repeats": graph.repeats[i],
+                "args": graph.args[i], "c1": graph.c1[i], "c2": graph.c2[i], "stride": graph.stride[i],
+                "text": graph.sub_text(i, display_config)}
+        if graph.layer_counts is not None:
+            node["layers"] = graph.layer_counts[i]
+        if k is not None:
+            node["params"] = float(shapes.params[i, k])
+            node["flops"] = float(shapes.flops[i, k])
+        nodes.append(node)
+    doc = {"meta": graph.meta, "backbone_len": graph.backbone_len, "nodes": nodes,
+           "edges": [[s, d] for s, d in zip(graph.edge_src, graph.edge_dst)]}
+    json.dump(doc, out, ensure_ascii=False, indent=1, default=str)
+    out.write("\n")
+
+
+def _dot_esc(s):
+    return str(s).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _dot_str(s):
+    return '"' + _dot_esc(s) + '"'
+
+
+def write_dot(graph, out, config, display_config):
+    """Graphviz: 每个泳道一个 cluster, 节点颜色取主题的 type_colors"""
+    colors = config["colors"]
+    font = config["font"].split(",")[0].strip().strip("'\"")
+    w = out.write
+    w("digraph model {\n")
+    w('  rankdir=TB; newrank=true; bgcolor="transparent";\n')
+    w(f'  node [shape=box, style="rounded,filled", fontname={_dot_str(font)}, fontsize=11, '
+      f'color={_dot_str(colors["stroke"])}, fillcolor={_dot_str(colors["fill_node"])}, fontcolor={_dot_str(colors["text_main"])}];\n')
+    w(f'  edge [color={_dot_str(colors["line"])}, arrowsize=0.6];\n')
+    type_colors = config["type_colors"]
+    for lane in (LANE_BACKBONE, LANE_NECK, LANE_HEAD):
+        members = [i for i in range(len(graph)) if graph.lane[i] == lane]
+        if not members: continue
+        bg = colors["bg_" + LANE_NAMES[lane]]
+        w(f'  subgraph cluster_{LANE_NAMES[lane]} {{\n    label={_dot_str(_LANE_TITLES[lane])}; style=filled; '
+          f'color={_dot_str(bg)}; fillcolor={_dot_str(bg)};\n')
+        for i in members:
+            attrs = f'label="{_dot_esc(graph.labels[i])}\\n{_dot_esc(graph.sub_text(i, display_config))}"'
+            tc = type_colors.get(TYPE_NAMES[graph.type_id[i]])
+            if tc: attrs += f", color={_dot_str(tc)}"
+            if graph.type_id[i] == TYPE_CONCAT: attrs += f", penwidth=1.5, fillcolor={_dot_str(colors['fill_concat'])}"
+            w(f"    n{i} [{attrs}];\n")
+        w("  }\n")
+    for s, d in zip(graph.edge_src, graph.edge_dst):
+        w(f"  n{s} -> n{d}{' [style=dashed]' if _dashed(graph, s, d) else ''};\n")
+    w("}\n")
+
+
+def _mmd_str(s):
+    return str(s).replace('"', "#quot;").replace("<", "#lt;").replace(">", "#gt;")
+
+
+def write_mermaid(graph, out, config, display_config):
+    """Mermaid flowchart: 每个泳道一个 subgraph, 跨层连接用虚线"""
+    w = out.write
+    w("flowchart TB\n")
+    for lane in (LANE_BACKBONE, LANE_NECK, LANE_HEAD):
+        members = [i for i in range(len(graph)) if graph.lane[i] == lane]
+        if not members: continue
+        w(f"  subgraph {LANE_NAMES[lane]}[{_LANE_TITLES[lane]}]\n")
+        for i in members:
+            w(f'    n{i}["{_mmd_str(graph.labels[i])}<br/>{_mmd_str(graph.sub_text(i, display_config))}"]\n')
+        w("  end\n")
+    for s, d in zip(graph.edge_src, graph.edge_dst):
+        w(f"  n{s} {'-.->' if _dashed(graph, s, d) else '-->'} n{d}\n")
+
+
+EXPORTERS = {
+    ".json": write_json,
+    ".dot": write_dot,
+    ".gv": write_dot,
+    ".mmd": write_mermaid,
+}
+
+
+def register_exporter(ext, fn):
+    """注册输出格式: fn(graph, out, config, display_config), ext 如 ".csv" """
+    EXPORTERS[ext.lower()] = fn
+
+
+def exporter_for(path):
+    """按扩展名返回导出函数; SVG 及未知扩展名返回 None"""
+    return EXPORTERS.get(os.path.splitext(str(path))[1].lower())
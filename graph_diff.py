@@ -0,0 +1,244 @@
+"""
+graph_diff.py - Structural diff between two LayerGraphs
+
+The backbone and head layer sequences of the old and new model are aligned
+in linear space over (module, args, from) keys:
+    pass 1  aligns on (module, args) to get a first old <-> new index map
+    pass 2  re-aligns with the `from` indices of the new model remapped
+            through that map, so layers inserted upstream do not make
+            every downstream Concat / Detect look different
+Each pass first takes the longest run of identical keys with Myers' O((N+M)D)
+diff (middle-snake, linear space), then pairs the layers left in each gap
+with Hirschberg's alignment: pairs that share the module are "changed", the
+rest are added / removed. Cost grows with the size of the edit, not with the
+depth of the model.
+
+The result is one union LayerGraph (inferred columns copied from the inputs,
+no re-inference) plus a status per node and per edge, rendered by
+yolo_graph.render_diff.
+"""
+# -*- coding: utf-8 -*-
+from layer_graph import LayerGraph
+
+SAME, ADDED, REMOVED, CHANGED = 0, 1, 2, 3
+STATUS_NAMES = ("same", "added", "removed", "changed")
+
+# 高亮颜色 (与主题无关)
+DIFF_COLORS = {ADDED: "#2E9D4F", REMOVED: "#D64545", CHANGED: "#E8930C"}
+
+
+# 间隙内加权对齐的上限 (格子数), 超过时整段按删除 + 新增处理
+MAX_GAP_CELLS = 4_000_000
+
+
+def _middle_snake(a, b, alo, ahi, blo, bhi):
+    """Myers 线性空间算法: 返回最短编辑路径中点所在的 snake (x0, y0, x1, y1)"""
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta & 1
+    dmax = (n + m + 1) // 2
+    off = dmax + 1
+    vf = [0] * (2 * off + 1)
+    vb = [0] * (2 * off + 1)
+    for d in range(dmax + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[off + k - 1] < vf[off + k + 1]): x = vf[off + k + 1]
+            else: x = vf[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]: x += 1; y += 1
+            vf[off + k] = x
+            if odd and delta - d < k < delta + d and x + vb[off + delta - k] >= n:
+                return alo + x0, blo + y0, alo + x, blo + y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[off + k - 1] < vb[off + k + 1]): x = vb[off + k + 1]
+            else: x = vb[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]: x += 1; y += 1
+            vb[off + k] = x
+            if not odd and -d <= delta - k <= d and x + vf[off + delta - k] >= n:
+                return ahi - x, bhi - y, ahi - x0, bhi - y0
+    raise AssertionError("middle snake not found")
+
+
+def _common(a, b, alo, ahi, blo, bhi, out):
+    """键完全相同的最长公共子序列 (Myers O((N+M)D), 线性空间), 匹配对 (i, j) 按序追加到 out"""
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        out.append((alo, blo)); alo += 1; blo += 1
+    tail = 0
+    while ahi - tail > alo and bhi - tail > blo and a[ahi - 1 - tail] == b[bhi - 1 - tail]: tail += 1
+    ahi -= tail; bhi -= tail
+    if alo < ahi and blo < bhi:
+        x0, y0, x1, y1 = _middle_snake(a, b, alo, ahi, blo, bhi)
+        _common(a, b, alo, x0, blo, y0, out)
+        out.extend((x0 + t, y0 + t) for t in range(x1 - x0))
+        _common(a, b, x1, ahi, y1, bhi, out)
+    out.extend((ahi + t, bhi + t) for t in range(tail))
+
+
+def _score_row(a, b, a_mod, b_mod):
+    """Needleman-Wunsch 打分的最后一行 (空位 0, 模块相同 1, 键完全相同 2), O(len(b)) 内存"""
+    m = len(b)
+    prev = [0] * (m + 1)
+    for x, xm in zip(a, a_mod):
+        cur = [0] * (m + 1)
+        left = 0
+        for j in range(m):
+            best = prev[j + 1]
+            if left > best: best = left
+            if x == b[j]: diag = prev[j] + 2
+            elif xm == b_mod[j]: diag = prev[j] + 1
+            else: diag = 0
+            if diag > best: best = diag
+            cur[j + 1] = left = best
+        prev = cur
+    return prev
+
+
+def _hirschberg(a, b, a_mod, b_mod, a0, b0, ops):
+    """Hirschberg 加权对齐, 结果追加到 ops: (status, old_idx, new_idx); a0 / b0 为下标偏移"""
+    n, m = len(a), len(b)
+    if n == 0:
+        ops.extend((ADDED, -1, b0 + j) for j in range(m))
+        return
+    if m == 0 or n * m > MAX_GAP_CELLS:
+        ops.extend((REMOVED, a0 + i, -1) for i in range(n))
+        ops.extend((ADDED, -1, b0 + j) for j in range(m))
+        return
+    if n == 1:
+        x, xm = a[0], a_mod[0]
+        hit = next((j for j in range(m) if b[j] == x), None)
+        if hit is None:
+            hit = next((j for j in range(m) if b_mod[j] == xm), None)
+        if hit is None:
+            ops.append((REMOVED, a0, -1))
+            ops.extend((ADDED, -1, b0 + j) for j in range(m))
+            return
+        ops.extend((ADDED, -1, b0 + j) for j in range(hit))
+        ops.append((SAME if b[hit] == x else CHANGED, a0, b0 + hit))
+        ops.extend((ADDED, -1, b0 + j) for j in range(hit + 1, m))
+        return
+    mid = n // 2
+    left = _score_row(a[:mid], b, a_mod[:mid], b_mod)
+    right = _score_row(a[:mid - 1:-1], b[::-1], a_mod[:mid - 1:-1], b_mod[::-1])
+    k = max(range(m + 1), key=lambda j: left[j] + right[m - j])
+    _hirschberg(a[:mid], b[:k], a_mod[:mid], b_mod[:k], a0, b0, ops)
+    _hirschberg(a[mid:], b[k:], a_mod[mid:], b_mod[k:], a0 + mid, b0 + k, ops)
+
+
+def align(a, b, a_mod, b_mod, a0=0, b0=0):
+    """
+    对齐两个键序列, 返回 [(status, old_idx, new_idx), ...] (按新旧顺序交织).
+    先用 Myers 求键完全相同的公共子序列, 再在相邻匹配之间的间隙里用 Hirschberg 按模块配对
+    (a_mod / b_mod), 区分 CHANGED 与 ADDED / REMOVED. 两步都只需线性内存,
+    耗时约为 O((N+M)D) 加上各间隙面积之和.
+    """
+    n, m = len(a), len(b)
+    pairs = []
+    _common(a, b, 0, n, 0, m, pairs)
+    pairs.append((n, m))
+    ops = []
+    i = j = 0
+    for x, y in pairs:
+        if x > i or y > j:
+            _hirschberg(a[i:x], b[j:y], a_mod[i:x], b_mod[j:y], a0 + i, b0 + j, ops)
+        if x < n:
+            ops.append((SAME, a0 + x, b0 + y))
+        i, j = x + 1, y + 1
+    return ops
+
+
+class GraphDiff:
+    """
+    diff 结果:
+        graph        并集 LayerGraph (新模型的层 + 被删除的旧层)
+        node_status  每个并集节点的 SAME / ADDED / REMOVED / CHANGED
+        edge_status  每条并集边 (graph.edge_src / edge_dst 顺序) 的 SAME / ADDED / REMOVED
+        old_of / new_of  并集节点 -> 旧 / 新模型中的下标 (-1 表示不存在)
+    """
+    __slots__ = ("graph", "node_status", "edge_status", "old_of", "new_of")
+
+    def counts(self):
+        """{"added": n, "removed": n, "changed": n, "same": n} (节点), 外加边的增删数"""
+        out = {name: 0 for name in STATUS_NAMES}
+        for s in self.node_status: out[STATUS_NAMES[s]] += 1
+        out["edges_added"] = sum(1 for s in self.edge_status if s == ADDED)
+        out["edges_removed"] = sum(1 for s in self.edge_status if s == REMOVED)
+        return out
+
+    def summary(self):
+        c = self.counts()
+        return (f"+{c['added']} added, -{c['removed']} removed, ~{c['changed']} changed layers | "
+                f"+{c['edges_added']} / -{c['edges_removed']} edges")
+
+
+def _layer_keys(graph, lo, hi, src_map=None):
+    """
+    [lo, hi) 各层的 (module, args[, from]) 键.
+    src_map: from 下标 -> 对齐后的公共下标; 没有对应层的输入 (两侧都被替换的层) 记为相对距离,
+    这样 "C2f 换成 C3k2" 不会让后面以 -1 接入的层也显示为修改. 负数 (模型输入) 保持原值.
+    """
+    keys, mods = [], []
+    for i in range(lo, hi):
+        mod = graph.modules[i]
+        key = (mod, repr(graph.args[i]))
+        if src_map is not None:
+            srcs = graph.sources(i)
+            srcs = [s if s < 0 else src_map.get(s, ("gap", i - s)) for s in srcs]
+            key += (tuple(srcs),)
+        keys.append(key)
+        mods.append(mod)
+    return keys, mods
+
+
+def _align_graphs(old, new, new_to_old=None):
+    """分别对齐 backbone 与 head 两段; 返回 ops 列表与 backbone 部分的长度"""
+    sections = ((0, old.backbone_len, 0, new.backbone_len),
+                (old.backbone_len, len(old), new.backbone_len, len(new)))
+    old_map = None if new_to_old is None else {i: i for i in new_to_old.values()}
+    ops, bb_ops = [], 0
+    for k, (a_lo, a_hi, b_lo, b_hi) in enumerate(sections):
+        a, a_mod = _layer_keys(old, a_lo, a_hi, old_map)
+        b, b_mod = _layer_keys(new, b_lo, b_hi, new_to_old)
+        ops.extend(align(a, b, a_mod, b_mod, a_lo, b_lo))
+        if k == 0: bb_ops = len(ops)
+    return ops, bb_ops
+
+
+def diff_graphs(old, new):
+    """对比两个已推断的 LayerGraph, 返回 GraphDiff"""
+    # pass 1: 只看 (module, args), 得到初步的新 -> 旧映射
+    ops, _ = _align_graphs(old, new)
+    new_to_old = {j: i for status, i, j in ops if i >= 0 and j >= 0}
+    # pass 2: 新模型的 from 映射到旧下标后重新对齐
+    ops, bb_ops = _align_graphs(old, new, new_to_old)
+
+    union = LayerGraph(bb_ops, dict(new.meta))
+    node_of_old, node_of_new = {}, {}
+    for k, (status, i, j) in enumerate(ops):
+        if i >= 0: node_of_old[i] = k
+        if j >= 0: node_of_new[j] = k
+    old_edges = {(node_of_old[s], node_of_old[d]) for s, d in zip(old.edge_src, old.edge_dst)}
+    new_edges = {(node_of_new[s], node_of_new[d]) for s, d in zip(new.edge_src, new.edge_dst)}
+
+    for k, (status, i, j) in enumerate(ops):
+        if j >= 0:
+            # 新模型的输入, 再补上只在旧模型中存在的输入 (被删除的边)
+            sources = [node_of_new.get(s, s) for s in new.sources(j)]
+            if i >= 0:
+                sources += [node_of_old[s] for s in old.sources(i)
+                            if s in node_of_old and node_of_old[s] not in sources]
+            union.copy_row(new, j, sources)
+        else:
+            union.copy_row(old, i, [node_of_old.get(s, s) for s in old.sources(i)])
+
+    d = GraphDiff()
+    d.graph = union
+    d.node_status = bytearray(status for status, _, _ in ops)
+    d.old_of = [i for _, i, _ in ops]
+    d.new_of = [j for _, _, j in ops]
+    d.edge_status = bytearray(
+        SAME if (e in new_edges and e in old_edges) else ADDED if e in new_edges else REMOVED
+        for e in zip(union.edge_src, union.edge_dst))
+    return d
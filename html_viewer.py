@@ -0,0 +1,342 @@
+"""
+html_viewer.py - Self-contained HTML viewer drawing the graph on a <canvas>
+
+A static SVG of a search-space model puts every node into the DOM (rect,
+clipPath, strip and two texts each). The .html output keeps the DOM at a
+single <canvas>. The laid-out geometry goes into the page as compact JSON:
+    nodes    flat [x, y, w, h, fill, type, label, sub] per node, the texts
+             as indices into a shared string table
+    edges    one [flags, x0, y0, ...] per edge, flags = dashed | kind << 1 |
+             no_arrow << 3 with kind 0 = line, 1 = cubic, 2 = polyline;
+             bundled edges (edge_bundling) become polylines plus `tips`
+A small script builds a uniform grid over node and edge bounding boxes, and
+each frame draws only the cells inside the viewport. Arrowheads, subtitles
+and titles are dropped once they would be too small to read, and nodes
+shrink to flat batched rectangles when zoomed far out. Frame cost therefore
+follows what is on screen, not the model size. Wheel zooms around the
+cursor, dragging pans, and a double click fits the whole graph.
+"""
+# -*- coding: utf-8 -*-
+import json
+
+from layer_graph import TYPE_NAMES, TYPE_CONCAT, LANE_BACKBONE, LANE_NECK, LANE_HEAD
+from routing import curve_controls
+
+# 节点填充的顺序与 data["fills"] 一致
+_FILLS = ("grad_bb", "grad_neck", "grad_head", "grad_concat", "grad_node")
+_LANE_FILL = {LANE_BACKBONE: 0, LANE_NECK: 1, LANE_HEAD: 2}
+_LANE_BG = {LANE_BACKBONE: "bg_backbone", LANE_NECK: "bg_neck", LANE_HEAD: "bg_head"}
+
+_DASHED, _CUBIC, _POLY, _NO_ARROW = 1, 1 << 1, 2 << 1, 1 << 3
+
+
+def _num(v):
+    """坐标保留 1 位小数, 整数不带小数点"""
+    v = round(v, 1)
+    return int(v) if v == int(v) else v
+
+
+def _edge(start_pt, end_pt, dashed, routing, via):
+    flags = _DASHED if dashed else 0
+    if routing == "orthogonal" and via:
+        flags |= _POLY
+        pts = [start_pt, *via, end_pt]
+    else:
+        ctrl = curve_controls(start_pt, end_pt, routing)
+        if ctrl is None:
+            pts = [start_pt, end_pt]
+        else:
+            flags |= _CUBIC
+            pts = [start_pt, *ctrl, end_pt]
+    return [flags] + [_num(c) for p in pts for c in p]
+
+
+def viewer_data(graph, geom, routes, config, display_config):
+    """页面中嵌入的 JSON 数据 (见模块说明)"""
+    strings, ids = [], {}
+
+    def sid(s):
+        k = ids.get(s)
+        if k is None:
+            k = ids[s] = len(strings)
+            strings.append(s)
+        return k
+
+    type_colors = config["type_colors"]
+    nodes = []
+    for i in range(len(graph)):
+        fill = 3 if graph.type_id[i] == TYPE_CONCAT else _LANE_FILL.get(graph.lane[i], 4)
+        nodes += [_num(geom.x[i]), _num(geom.y[i]), _num(geom.w[i]), _num(geom.h[i]), fill, graph.type_id[i],
+                  sid(graph.labels[i]), sid(graph.sub_text(i, display_config))]
+
+    bundles = getattr(routes, "bundles", None)
+    edges = [_edge(*r) for r in (routes if bundles is None else routes.singles)]
+    tips = []
+    for dashed, lines, bundle_tips in bundles or ():
+        flags = _POLY | _NO_ARROW | (_DASHED if dashed else 0)
+        edges += [[flags] + [_num(c) for p in line for c in p] for line in lines]
+    if bundles:
+        tips = [_num(v) for t in dict.fromkeys(t for _, _, ts in bundles for t in ts) for v in t]
+
+    colors = config["colors"]
+    grads = config["gradients"]
+    return {
+        "size": [_num(geom.width), _num(geom.height)],
+        "font": config["font"],
+        "radius": config["radius"],
+        "colors": {k: colors[k] for k in ("stroke", "line", "text_main", "text_sub")},
+        "fills": [[grads[g + "_start"], grads[g + "_end"]] for g in _FILLS],
+        "types": [type_colors.get(t) for t in TYPE_NAMES],
+        "lanes": [[_num(x), _num(w), label, colors[_LANE_BG[lane]]] for x, w, label, lane in geom.lane_bounds],
+        "strings": strings,
+        "nodes": nodes,
+        "edges": edges,
+        "tips": tips,
+    }
+
+
+_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>%(title)s</title>
+<style>
+html, body { margin: 0; height: 100%%; overflow: hidden; background: %(bg)s; }
+canvas { display: block; width: 100%%; height: 100%%; cursor: grab; touch-action: none; }
+canvas.drag { cursor: grabbing; }
+#hud { position: fixed; right: 8px; bottom: 6px; font: 11px sans-serif; color: %(sub)s; pointer-events: none; }
+</style>
+</head>
+<body>
+<canvas id="view"></canvas>
+<div id="hud"></div>
+<script type="application/json" id="graph">%(data)s</script>
+<script>
+(function () {
+  "use strict";
+  const D = JSON.parse(document.getElementById("graph").textContent);
+  const cv = document.getElementById("view"), ctx = cv.getContext("2d"), hud = document.getElementById("hud");
+  const N = D.nodes, E = D.edges, S = D.strings, C = D.colors, n = N.length / 8;
+  const CELL = 256;
+
+  // 均匀网格空间索引: 格子 -> 元素下标
+  function grid(count, box) {
+    const cells = new Map();
+    for (let i = 0; i < count; i++) {
+      const b = box(i);
+      for (let gx = Math.floor(b[0] / CELL); gx <= Math.floor(b[2] / CELL); gx++)
+        for (let gy = Math.floor(b[1] / CELL); gy <= Math.floor(b[3] / CELL); gy++) {
+          const k = gx + "," + gy;
+          let list = cells.get(k);
+          if (!list) cells.set(k, list = []);
+          list.push(i);
+        }
+    }
+    return cells;
+  }
+  const edgeBox = E.map(function (e) {
+    let x0 = Infinity, y0 = Infinity, x1 = -Infinity, y1 = -Infinity;
+    for (let k = 1; k < e.length; k += 2) {
+      x0 = Math.min(x0, e[k]); x1 = Math.max(x1, e[k]); y0 = Math.min(y0, e[k + 1]); y1 = Math.max(y1, e[k + 1]);
+    }
+    return [x0, y0, x1, y1];
+  });
+  const nodeCells = grid(n, nodeBox), edgeCells = grid(E.length, edgeBoxOf);
+  const nodeSeen = new Uint32Array(n), edgeSeen = new Uint32Array(E.length);
+  let frame = 0;
+
+  // 视口内的元素; 格子数多于元素数时直接遍历全部
+  function visible(cells, seen, total, boxOf, r) {
+    const gx0 = Math.floor(r[0] / CELL), gx1 = Math.floor(r[2] / CELL);
+    const gy0 = Math.floor(r[1] / CELL), gy1 = Math.floor(r[3] / CELL);
+    const out = [];
+    if ((gx1 - gx0 + 1) * (gy1 - gy0 + 1) > total) {
+      for (let i = 0; i < total; i++) {
+        const b = boxOf(i);
+        if (b[2] >= r[0] && b[0] <= r[2] && b[3] >= r[1] && b[1] <= r[3]) out.push(i);
+      }
+      return out;
+    }
+    for (let gx = gx0; gx <= gx1; gx++)
+      for (let gy = gy0; gy <= gy1; gy++) {
+        const list = cells.get(gx + "," + gy);
+        if (!list) continue;
+        for (const i of list) {
+          if (seen[i] === frame) continue;
+          seen[i] = frame;
+          const b = boxOf(i);
+          if (b[2] >= r[0] && b[0] <= r[2] && b[3] >= r[1] && b[1] <= r[3]) out.push(i);
+        }
+      }
+    return out;
+  }
+  function nodeBox(i) { const o = i * 8; return [N[o], N[o + 1], N[o] + N[o + 2], N[o + 1] + N[o + 3]]; }
+  function edgeBoxOf(i) { return edgeBox[i]; }
+
+  let scale = 1, tx = 0, ty = 0, dpr = 1, queued = false;
+
+  function fit() {
+    const w = cv.clientWidth, h = cv.clientHeight;
+    scale = Math.min(w / D.size[0], h / D.size[1]) * 0.98;
+    tx = (w - D.size[0] * scale) / 2; ty = (h - D.size[1] * scale) / 2;
+  }
+  function resize() {
+    dpr = window.devicePixelRatio || 1;
+    cv.width = Math.round(cv.clientWidth * dpr); cv.height = Math.round(cv.clientHeight * dpr);
+    redraw();
+  }
+  function redraw() {
+    if (!queued) { queued = true; requestAnimationFrame(draw); }
+  }
+
+  function tracePath(e) {
+    const f = e[0], kind = (f >> 1) & 3;
+    ctx.moveTo(e[1], e[2]);
+    if (kind === 1) ctx.bezierCurveTo(e[3], e[4], e[5], e[6], e[7], e[8]);
+    else for (let k = 3; k < e.length; k += 2) ctx.lineTo(e[k], e[k + 1]);
+  }
+  function arrow(x, y, dx, dy) {
+    const l = Math.hypot(dx, dy) || 1;
+    dx /= l; dy /= l;
+    ctx.moveTo(x - 6 * dx + 3.6 * dy, y - 6 * dy - 3.6 * dx);
+    ctx.lineTo(x + 1.2 * dx, y + 1.2 * dy);
+    ctx.lineTo(x - 6 * dx - 3.6 * dy, y - 6 * dy + 3.6 * dx);
+    ctx.closePath();
+  }
+
+  function draw() {
+    queued = false;
+    frame++;
+    const w = cv.clientWidth, h = cv.clientHeight;
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.clearRect(0, 0, cv.width, cv.height);
+    ctx.setTransform(dpr * scale, 0, 0, dpr * scale, dpr * tx, dpr * ty);
+    const view = [-tx / scale, -ty / scale, (w - tx) / scale, (h - ty) / scale];
+    const px = 1 / scale;  // 一个屏幕像素对应的世界坐标长度
+
+    for (const [x, lw, label, bg] of D.lanes) { ctx.fillStyle = bg; ctx.fillRect(x, 30, lw, D.size[1] - 30); }
+
+    // 连线: 实线 / 虚线各合并为一条路径
+    const edges = visible(edgeCells, edgeSeen, E.length, edgeBoxOf, view);
+    ctx.strokeStyle = C.line; ctx.fillStyle = C.line;
+    ctx.lineWidth = Math.max(1.2, 0.6 * px);
+    for (const dashed of [0, 1]) {
+      ctx.setLineDash(dashed ? [5, 3] : []);
+      ctx.beginPath();
+      for (const i of edges) if ((E[i][0] & 1) === dashed) tracePath(E[i]);
+      ctx.stroke();
+    }
+    ctx.setLineDash([]);
+    if (scale * 6 >= 2) {
+      ctx.beginPath();
+      for (const i of edges) {
+        const e = E[i], m = e.length;
+        if (e[0] & 8) continue;
+        let k = m - 4;  // 终点前最后一个与终点不重合的点给出箭头方向
+        while (k > 1 && e[k] === e[m - 2] && e[k + 1] === e[m - 1]) k -= 2;
+        arrow(e[m - 2], e[m - 1], e[m - 2] - e[k], e[m - 1] - e[k + 1]);
+      }
+      const T = D.tips;
+      for (let k = 0; k < T.length; k += 4)
+        if (T[k] >= view[0] && T[k] <= view[2] && T[k + 1] >= view[1] && T[k + 1] <= view[3])
+          arrow(T[k], T[k + 1], T[k + 2], T[k + 3]);
+      ctx.fill();
+    }
+
+    // 节点: 缩得很小时按填充色批量画实心矩形
+    const nodes = visible(nodeCells, nodeSeen, n, nodeBox, view);
+    const small = scale * 44 < 6;
+    if (small) {
+      for (let f = 0; f < D.fills.length; f++) {
+        ctx.fillStyle = D.fills[f][1];
+        ctx.beginPath();
+        for (const i of nodes) { const o = i * 8; if (N[o + 4] === f) ctx.rect(N[o], N[o + 1], N[o + 2], N[o + 3]); }
+        ctx.fill();
+      }
+    } else {
+      ctx.strokeStyle = C.stroke;
+      for (const i of nodes) {
+        const o = i * 8, x = N[o], y = N[o + 1], nw = N[o + 2], nh = N[o + 3], fill = D.fills[N[o + 4]];
+        if (fill[0] === fill[1]) ctx.fillStyle = fill[0];
+        else {
+          const g = ctx.createLinearGradient(0, y, 0, y + nh);
+          g.addColorStop(0, fill[0]); g.addColorStop(1, fill[1]);
+          ctx.fillStyle = g;
+        }
+        ctx.beginPath();
+        if (D.radius && ctx.roundRect) ctx.roundRect(x, y, nw, nh, D.radius); else ctx.rect(x, y, nw, nh);
+        ctx.fill();
+        ctx.lineWidth = N[o + 4] === 3 ? 1.5 : 1;
+        ctx.stroke();
+        const strip = D.types[N[o + 5]];
+        if (strip) {
+          ctx.save(); ctx.clip();
+          ctx.fillStyle = strip; ctx.fillRect(x, y, 5, nh);
+          ctx.restore();
+        }
+      }
+      // 文字在屏幕上小于约 6px 时不画
+      const labels = scale * 14 >= 7, subs = scale * 10 >= 6;
+      if (labels) {
+        ctx.textAlign = "center"; ctx.textBaseline = "middle";
+        ctx.fillStyle = C.text_main; ctx.font = "bold 14px " + D.font;
+        for (const i of nodes) { const o = i * 8; ctx.fillText(S[N[o + 6]], N[o] + N[o + 2] / 2 + 2, N[o + 1] + N[o + 3] / 2 - 8); }
+        if (subs) {
+          ctx.fillStyle = C.text_sub; ctx.font = "10px " + D.font;
+          for (const i of nodes) { const o = i * 8; ctx.fillText(S[N[o + 7]], N[o] + N[o + 2] / 2 + 2, N[o + 1] + N[o + 3] / 2 + 11); }
+        }
+      }
+    }
+
+    if (scale * 18 >= 6) {
+      ctx.textAlign = "center"; ctx.textBaseline = "alphabetic";
+      ctx.fillStyle = C.text_main; ctx.font = "bold 18px " + D.font;
+      ctx.strokeStyle = "#90A4AE"; ctx.lineWidth = 1;
+      for (const [x, lw, label] of D.lanes) {
+        ctx.fillText(label, x + lw / 2, 55);
+        ctx.beginPath(); ctx.moveTo(x + 20, 65); ctx.lineTo(x + lw - 20, 65); ctx.stroke();
+      }
+    }
+    hud.textContent = nodes.length + " / " + n + " nodes, " + edges.length + " / " + E.length + " edges, " +
+                      Math.round(scale * 100) + "%%";
+  }
+
+  cv.addEventListener("wheel", function (ev) {
+    ev.preventDefault();
+    const k = Math.exp(-ev.deltaY * (ev.deltaMode ? 0.05 : 0.0015));
+    const ns = Math.min(8, Math.max(1e-3, scale * k));
+    tx = ev.offsetX - (ev.offsetX - tx) * ns / scale; ty = ev.offsetY - (ev.offsetY - ty) * ns / scale;
+    scale = ns;
+    redraw();
+  }, { passive: false });
+  let drag = null;
+  cv.addEventListener("pointerdown", function (ev) {
+    drag = [ev.clientX - tx, ev.clientY - ty]; cv.setPointerCapture(ev.pointerId); cv.classList.add("drag");
+  });
+  cv.addEventListener("pointermove", function (ev) {
+    if (!drag) return;
+    tx = ev.clientX - drag[0]; ty = ev.clientY - drag[1];
+    redraw();
+  });
+  cv.addEventListener("pointerup", function () { drag = null; cv.classList.remove("drag"); });
+  cv.addEventListener("dblclick", function () { fit(); redraw(); });
+  window.addEventListener("resize", resize);
+  fit();
+  resize();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+def write_html(graph, geom, routes, config, display_config, out, title="Model Graph"):
+    """把布局结果写成独立的 HTML 查看器 (out 为文本流)"""
+    data = json.dumps(viewer_data(graph, geom, routes, config, display_config),
+                      ensure_ascii=False, separators=(",", ":"))
+    # JSON 放在 <script> 中, 避免提前结束标签
+    data = data.replace("</", "<\\/")
+    colors = config["colors"]
+    esc = str(title).replace("&", "&amp;").replace("<", "&lt;")
+    out.write(_PAGE % {"title": esc, "bg": colors["bg_neck"], "sub": colors["text_sub"], "data": data})
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+ingest.py - Render architecture-search archives record by record
+Usage:
+    python ingest.py archive.jsonl [more.yaml ...] --out out_dir|out.tar|out.tar.gz|out.zip
+                     [--formats svg,json] [--theme paper] [--compact] [--shard-size 1000]
+                     [--workers N] [--chunk 64] [--modules my_modules.yaml]
+
+Inputs are memory-mapped and cut into records without loading the whole file:
+    .jsonl / .ndjson    one model per line: a model dict ({"backbone": ..., "head": ...}),
+                        or {"name": ..., "model": {...}} / {"name": ..., "yaml": "..."}
+    .yaml / .yml        multi-document YAML, documents separated by `---` lines
+                        (as in YAML itself, an unindented `---` always starts a new
+                        document, even inside a block scalar; indented ones are content)
+Each record goes through the in-memory pipeline (yolo_graph.render_bytes) and
+its outputs are written to
+    out_dir/            shard_00000/, shard_00001/, ... with --shard-size records each,
+                        files named <record index>_<name>.<ext>
+    out.tar[.gz|.bz2|.xz] / out.zip   one archive, members named like the sharded layout
+next to a manifest (out_dir/manifest.jsonl or out.manifest.jsonl): one JSON line
+per record with its name, source, layer / edge counts, output channels, peak
+channels, final stride, output files and error. Record names are sanitised
+and names longer than 80 bytes are shortened with a hash suffix; a
+record that cannot be rendered or written (bad YAML, OSError from the sink)
+only gets an error entry, it never stops the run. The manifest is streamed, and
+at most --workers x 2 chunks of --chunk records are in flight, so memory stays
+flat however many records the archive holds. --workers N renders chunks in a
+process pool (one task per chunk, not per record); the default renders in-process.
+"""
+# -*- coding: utf-8 -*-
+import io
+import os
+import re
+import sys
+import json
+import mmap
+import hashlib
+import time
+from collections import deque
+
+import themes
+import module_registry
+from main import DISPLAY_CONFIG
+from yolo_graph import graph_from_source, render_bytes, RenderCancelled
+from exporters import FORMATS
+
+_DOC_SEP = re.compile(rb"^---[ \t]*(?:#[^\n]*)?\r?$", re.M)
+_SAFE_NAME = re.compile(r"[^\w.-]+")
+MAX_NAME = 80   # 文件名中记录名的最大 UTF-8 字节数, 文件系统通常限制为 255 字节
+
+
+def _safe_name(label):
+    """记录名转为可用作文件名的形式; 过长时截断并附上完整名称的哈希, 不同的长名称不会撞车"""
+    name = _SAFE_NAME.sub("_", str(label))
+    raw = name.encode("utf-8")
+    if len(raw) > MAX_NAME:
+        digest = hashlib.sha1(str(label).encode("utf-8", "replace")).hexdigest()[:12]
+        name = f"{raw[:MAX_NAME - 13].decode('utf-8', 'ignore')}_{digest}"
+    return name
+
+
+def _mapped(path):
+    """只读 mmap; 空文件返回 b"" (长度为 0 的文件无法映射)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_records(path):
+    """
+    逐条产出 (name, source, payload): payload 为模型字典或 YAML 文本 (bytes), source 为 "文件:行号 / 文档号".
+    只有当前记录被复制出 mmap.
+    """
+    stem = _safe_name(os.path.splitext(os.path.basename(path))[0])
+    mm = _mapped(path)
+    try:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            pos, line_no, k = 0, 0, 0
+            size = len(mm)
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end < 0: end = size
+                line = mm[pos:end]
+                pos = end + 1
+                line_no += 1
+                if not line.strip():
+                    continue
+                name = f"{stem}_{k:07d}"
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    record = e   # 坏行只记为这一条记录的错误
+                if isinstance(record, dict) and "backbone" not in record and "head" not in record:
+                    label = record.get("name", record.get("id"))
+                    if label is not None: name = _safe_name(label)
+                    record = record["model"] if "model" in record else record.get("yaml", record)
+                    if isinstance(record, str): record = record.encode("utf-8")
+                yield name, f"{path}:{line_no}", record
+                k += 1
+        else:
+            start, k = 0, 0
+            for m in [None] if not len(mm) else _iter_seps(mm):
+                end = m.start() if m is not None else len(mm)
+                doc = mm[start:end]
+                start = m.end() + 1 if m is not None else len(mm)
+                if not _has_content(doc):
+                    continue
+                yield f"{stem}_{k:07d}", f"{path}#{k}", doc
+                k += 1
+    finally:
+        if isinstance(mm, mmap.mmap): mm.close()
+
+
+def _iter_seps(mm):
+    yield from _DOC_SEP.finditer(mm)
+    yield None
+
+
+def _has_content(doc):
+    """文档中有注释以外的内容"""
+    return any(line.strip() and not line.lstrip().startswith(b"#") for line in doc.splitlines())
+
+
+def model_stats(graph):
+    """清单中的统计: 层数 / 边数 / 输出通道 / 峰值通道 / 最终步长"""
+    n = len(graph)
+    return {"layers": n, "edges": graph.num_edges,
+            "c_out": graph.c2[n - 1] if n else 0, "c_max": max(graph.c2) if n else 0,
+            "stride": int(graph.stride[n - 1]) if n else 0}
+
+
+def render_chunk(records, config, display_config, formats):
+    """
+    渲染一批记录 (在当前进程或 worker 进程中): 返回 [(name, source, stats, [(ext, bytes), ...], error), ...].
+    每条记录只解析一次, 各格式共用同一个 LayerGraph.
+    """
+    out = []
+    for name, source, payload in records:
+        try:
+            if isinstance(payload, Exception): raise payload
+            graph = graph_from_source(payload)
+            if not len(graph):
+                raise ValueError("no layers")
+            files = [(FORMATS[fmt], render_bytes(graph, config, display_config, fmt)) for fmt in formats]
+            out.append((name, source, model_stats(graph), files, None))
+        except (RenderCancelled, KeyboardInterrupt):
+            raise
+        except Exception as e:
+            out.append((name, source, None, [], f"{type(e).__name__}: {e}"))
+    return out
+
+
+class DirSink:
+    """按分片目录写出: out_dir/shard_NNNNN/<序号>_<name><ext>, 每个分片 shard_size 条记录"""
+
+    def __init__(self, out_dir, shard_size=1000):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.manifest_path = os.path.join(out_dir, "manifest.jsonl")
+        self._shard = -1
+
+    def open(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+
+    def member(self, index, name, ext):
+        # 记录序号做前缀: 名称重复时也不会覆盖, 且无需记住已用过的名称
+        return f"shard_{index // self.shard_size:05d}/{index:08d}_{name}{ext}"
+
+    def write(self, index, member, data):
+        shard = index // self.shard_size
+        if shard != self._shard:
+            os.makedirs(os.path.join(self.out_dir, f"shard_{shard:05d}"), exist_ok=True)
+            self._shard = shard
+        with open(os.path.join(self.out_dir, member), 'wb') as f: f.write(data)
+
+    def close(self):
+        pass
+
+
+class TarSink(DirSink):
+    """单个 tar 包 (.tar / .tar.gz / .tgz / .tar.bz2 / .tar.xz), 成员按分片目录命名"""
+
+    def __init__(self, path, shard_size=1000):
+        super().__init__(path, shard_size)
+        self.manifest_path = _archive_stem(path) + ".manifest.jsonl"
+        self._now = time.time()
+
+    def open(self):
+        import tarfile
+        mode = {".gz": "w:gz", ".tgz": "w:gz", ".bz2": "w:bz2", ".xz": "w:xz"}.get(os.path.splitext(self.out_dir)[1], "w")
+        self._tar = tarfile.open(self.out_dir, mode)
+
+    def write(self, index, member, data):
+        import tarfile
+        info = tarfile.TarInfo(member)
+        info.size = len(data)
+        info.mtime = self._now
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self._tar.close()
+
+
+class ZipSink(DirSink):
+    def __init__(self, path, shard_size=1000):
+        super().__init__(path, shard_size)
+        self.manifest_path = _archive_stem(path) + ".manifest.jsonl"
+
+    def open(self):
+        import zipfile
+        self._zip = zipfile.ZipFile(self.out_dir, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    def write(self, index, member, data):
+        self._zip.writestr(member, data)
+
+    def close(self):
+        self._zip.close()
+
+
+def _archive_stem(path):
+    for ext in (".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".tar", ".zip"):
+        if path.lower().endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def sink_for(out, shard_size=1000):
+    """按输出名选择写出方式: .zip / .tar* 为单个归档, 其余为分片目录"""
+    low = out.lower()
+    if low.endswith(".zip"): return ZipSink(out, shard_size)
+    if low.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")): return TarSink(out, shard_size)
+    return DirSink(out, shard_size)
+
+
+def _chunks(paths, size):
+    chunk = []
+    for path in paths:
+        for record in iter_records(path):
+            chunk.append(record)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_ingest(paths, out, config, display_config=None, formats=("svg",), shard_size=1000, workers=1, chunk=64,
+               progress=None):
+    """
+    把 paths 中的归档逐条渲染到 out (见模块说明); 返回 (成功数, 失败数).
+    progress(done, failed): 每完成一批记录调用一次.
+    """
+    display_config = DISPLAY_CONFIG if display_config is None else display_config
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}', available: {', '.join(FORMATS)}")
+    sink = sink_for(out, shard_size)
+    sink.open()
+    done = failed = 0
+    index = 0
+    try:
+        with open(sink.manifest_path, 'w', encoding='utf-8') as manifest:
+            def consume(results):
+                nonlocal done, failed, index
+                for name, source, stats, files, err in results:
+                    entry = {"index": index, "name": name, "source": source}
+                    if err is None:
+                        entry.update(stats)
+                        entry["files"] = []
+                        try:
+                            for ext, data in files:
+                                member = sink.member(index, name, ext)
+                                sink.write(index, member, data)
+                                entry["files"].append(member)
+                        except OSError as e:
+                            # 写出失败 (文件名非法、磁盘满 ...) 只记为这一条记录的错误
+                            err = f"{type(e).__name__}: {e}"
+                    if err is None:
+                        done += 1
+                    else:
+                        entry["error"] = err
+                        failed += 1
+                    manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    index += 1
+                if progress: progress(done, failed)
+
+            if workers <= 1:
+                for records in _chunks(paths, chunk):
+                    consume(render_chunk(records, config, display_config, formats))
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                # 最多 workers * 2 批在途, 按提交顺序写出
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    inflight = deque()
+                    for records in _chunks(paths, chunk):
+                        inflight.append(pool.submit(render_chunk, records, config, display_config, formats))
+                        if len(inflight) >= workers * 2:
+                            consume(inflight.popleft().result())
+                    while inflight:
+                        consume(inflight.popleft().result())
+    finally:
+        sink.close()
+    return done, failed
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ("-h", "--help"):
+        print("Usage: python ingest.py ARCHIVE [...] --out DIR|FILE.tar[.gz]|FILE.zip [--formats svg,json] "
+              "[--theme paper] [--compact] [--shard-size 1000] [--workers N] [--chunk 64] [--modules FILE]")
+        return 0
+
+    out = None
+    formats = ["svg"]
+    theme_name = "paper"
+    compact = False
+    shard_size, workers, chunk = 1000, 1, 64
+    paths = []
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a == "--out" and i + 1 < len(args):
+            out = args[i + 1]; i += 2
+        elif a == "--formats" and i + 1 < len(args):
+            formats = [f.strip().lower() for f in args[i + 1].split(",") if f.strip()]; i += 2
+        elif a == "--theme" and i + 1 < len(args):
+            theme_name = args[i + 1]; i += 2
+        elif a == "--compact":
+            compact = True; i += 1
+        elif a == "--shard-size" and i + 1 < len(args):
+            shard_size = int(args[i + 1]); i += 2
+        elif a == "--workers" and i + 1 < len(args):
+            workers = int(args[i + 1]); i += 2
+        elif a == "--chunk" and i + 1 < len(args):
+            chunk = int(args[i + 1]); i += 2
+        elif a == "--modules" and i + 1 < len(args):
+            # 通过环境变量传给 worker 进程 (spawn 模式下也能生效)
+            module_registry.load_plugin(args[i + 1])
+            prev = os.environ.get("YOLO_GRAPH_MODULES")
+            os.environ["YOLO_GRAPH_MODULES"] = os.pathsep.join(filter(None, [prev, args[i + 1]]))
+            i += 2
+        else:
+            paths.append(a); i += 1
+    if out is None or not paths:
+        print("❌ Need at least one archive and --out")
+        return 1
+
+    config = themes.get_config(theme_name)
+    if compact: config["compact"] = True
+    t0 = time.perf_counter()
+    last = [0.0]
+
+    def progress(done, failed):
+        now = time.perf_counter()
+        if now - last[0] >= 1.0:
+            last[0] = now
+            print(f"⏳ {done + failed} records ({failed} failed, {(done + failed) / (now - t0):.0f}/s)")
+
+    print(f"📥 {len(paths)} archives -> {out} | formats: {','.join(formats)} | 👷 {workers} workers")
+    try:
+        done, failed = run_ingest(paths, out, config, DISPLAY_CONFIG, formats, shard_size, workers, chunk, progress)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    dt = time.perf_counter() - t0
+    print(f"🏁 Done: {done} ok, {failed} failed in {dt:.2f}s ({(done + failed) / max(dt, 1e-9):.0f} records/s)")
+    print(f"📋 Manifest: {sink_for(out, shard_size).manifest_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
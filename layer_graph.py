@@ -0,0 +1,272 @@
+"""
+layer_graph.py - Compact intermediate representation of a parsed model YAML
+
+The YAML is parsed once into a LayerGraph: a column-oriented layer table
+(array-backed, one slot per field instead of one dict per layer) plus a flat
+edge list. Layout, routing and every output format read from this structure.
+"""
+# -*- coding: utf-8 -*-
+import json
+from array import array
+
+from module_registry import (resolve, TYPE_NAMES, TYPE_OTHER, TYPE_CONV, TYPE_CONCAT,
+                             TYPE_DETECT, TYPE_UPSAMPLE, TYPE_C2F)
+
+# 泳道编号
+LANE_BACKBONE, LANE_NECK, LANE_HEAD = 0, 1, 2
+
+# 模型级别的键, 保存在 LayerGraph.meta 中
+META_KEYS = ("nc", "scales", "depth_multiple", "width_multiple")
+
+# to_bytes / from_bytes 序列化的数组列
+_ARRAY_COLUMNS = ("from_ptr", "from_idx", "c1", "c2", "stride", "lane", "type_id", "repeats", "edge_src", "edge_dst")
+
+
+class LayerGraph:
+    """
+    Column-oriented layer table.
+
+    Per-layer columns (index = layer idx):
+        c1, c2      input / output channels
+        stride      cumulative stride after the layer
+        lane        LANE_BACKBONE / LANE_NECK / LANE_HEAD
+        type_id     index into TYPE_NAMES
+        repeats     YAML `n`
+        labels      display label
+        modules     raw YAML module name
+        args        raw YAML args (kept for show_args)
+    Sources of layer i are from_idx[from_ptr[i]:from_ptr[i+1]] (absolute indices).
+    Edges (src -> dst) between existing layers are kept in edge_src / edge_dst
+    in the same order as the sources appear in the YAML.
+    meta holds the model-level keys (nc, scales, depth/width multiples).
+    shapes is an optional shapes.ShapeTable (per-scale channels, params, FLOPs).
+    layer_counts is None, or for a collapsed overview (lod.collapse) the number
+    of original layers behind each node; repeats keeps its YAML meaning.
+    """
+    __slots__ = ("backbone_len", "from_ptr", "from_idx", "c1", "c2", "stride",
+                 "lane", "type_id", "repeats", "labels", "modules", "args",
+                 "edge_src", "edge_dst", "meta", "shapes", "layer_counts")
+
+    def __init__(self, backbone_len=0, meta=None):
+        self.backbone_len = backbone_len
+        self.meta = meta or {}
+        self.shapes = None
+        self.layer_counts = None
+        self.from_ptr = array('i', [0])
+        self.from_idx = array('i')
+        self.c1 = array('q')
+        self.c2 = array('q')
+        self.stride = array('d')
+        self.lane = array('b')
+        self.type_id = array('b')
+        self.repeats = array('i')
+        self.labels = []
+        self.modules = []
+        self.args = []
+        self.edge_src = array('i')
+        self.edge_dst = array('i')
+
+    def __len__(self):
+        return len(self.c2)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_src)
+
+    def sources(self, i):
+        return self.from_idx[self.from_ptr[i]:self.from_ptr[i + 1]]
+
+    def _infer(self, i, item):
+        """推断第 i 层 [from, n, module, args] (只读取前面的层), 返回 add_row 的参数元组"""
+        f_idx, n, m, args = item
+        args = args or []
+        m_str = str(m)
+        from_idxs = [f_idx] if isinstance(f_idx, int) else list(f_idx)
+        abs_from = [(src if src >= 0 else i + src) for src in from_idxs]
+
+        c1 = self.c2[i - 1] if i else 3
+        mod = resolve(m_str)   # 每个不同的模块名只解析一次
+
+        src_channels = [self.c2[s] if 0 <= s < i else c1 for s in abs_from]
+        c2 = mod.channel_fn(c1, args, src_channels)
+        next_stride = mod.stride_fn(self.stride[i - 1] if i else 1, args)
+
+        lane = LANE_BACKBONE
+        if i >= self.backbone_len:
+            lane = LANE_HEAD if mod.is_head else LANE_NECK
+        return c1, c2, next_stride, lane, mod.type_id, n, mod.label, m_str, args, abs_from
+
+    def append(self, item):
+        """追加一层 [from, n, module, args], 同时完成通道 / 步长推断"""
+        return self.add_row(*self._infer(len(self.c2), item))
+
+    def update_row(self, i, item):
+        """
+        用 item 原地重新推断第 i 层 (增量更新, 见 watch.py). 输入 (from) 或泳道改变时
+        图结构随之改变, 返回 False 且不做修改.
+        """
+        c1, c2, stride, lane, type_id, n, label, m_str, args, abs_from = self._infer(i, item)
+        if lane != self.lane[i] or abs_from != self.sources(i).tolist():
+            return False
+        self.c1[i] = c1
+        self.c2[i] = c2
+        self.stride[i] = stride
+        self.type_id[i] = type_id
+        self.repeats[i] = n
+        self.labels[i] = label
+        self.modules[i] = m_str
+        self.args[i] = args
+        return True
+
+    def add_row(self, c1, c2, stride, lane, type_id, repeats, label, module, args, sources):
+        """直接追加一行已推断好的层 (不做推断); sources 为本图中的绝对下标"""
+        j = len(self.c2)
+        self.c1.append(c1)
+        self.c2.append(c2)
+        self.stride.append(stride)
+        self.lane.append(lane)
+        self.type_id.append(type_id)
+        self.repeats.append(repeats)
+        self.labels.append(label)
+        self.modules.append(module)
+        self.args.append(args)
+        for src_idx in sources:
+            self.from_idx.append(src_idx)
+            if 0 <= src_idx < j:
+                self.edge_src.append(src_idx)
+                self.edge_dst.append(j)
+        self.from_ptr.append(len(self.from_idx))
+        return j
+
+    def copy_row(self, other, i, sources):
+        """追加 other 的第 i 层 (推断结果原样复制, 不再重新推断); sources 为本图中的绝对下标"""
+        return self.add_row(other.c1[i], other.c2[i], other.stride[i], other.lane[i], other.type_id[i],
+                            other.repeats[i], other.labels[i], other.modules[i], other.args[i], sources)
+
+    def to_bytes(self):
+        """
+        序列化 (不含 shapes / layer_counts): 一行 JSON 头 (数组列的类型 / 长度, 文本列, meta) + 各数组列的原始字节.
+        与 pickle 不同, from_bytes 不会执行数据中的任何代码; args 需能用 JSON 表示, 否则抛出 TypeError.
+        """
+        head = {"backbone_len": self.backbone_len, "meta": self.meta,
+                "labels": self.labels, "modules": self.modules, "args": self.args,
+                "arrays": [(name, getattr(self, name).typecode, len(getattr(self, name))) for name in _ARRAY_COLUMNS]}
+        return b"".join([json.dumps(head, separators=(",", ":")).encode("utf-8"), b"\n"] +
+                        [getattr(self, name).tobytes() for name in _ARRAY_COLUMNS])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """to_bytes 的逆操作; 数据不完整时抛出 ValueError"""
+        cut = data.index(b"\n")
+        head = json.loads(data[:cut])
+        graph = cls(head["backbone_len"], head["meta"])
+        graph.labels, graph.modules, graph.args = head["labels"], head["modules"], head["args"]
+        pos = cut + 1
+        for name, typecode, n in head["arrays"]:
+            col = array(typecode)
+            end = pos + n * col.itemsize
+            if end > len(data): raise ValueError("truncated LayerGraph data")
+            col.frombytes(data[pos:end])
+            setattr(graph, name, col)
+            pos = end
+        return graph
+
+    def sub_text(self, i, display_config):
+        """节点副标题 (通道 / 堆叠数 / 参数 / 步长)"""
+        label = self.labels[i]
+        c1, c2 = self.c1[i], self.c2[i]
+        repeats = self.repeats[i]
+        args = self.args[i]
+        shapes = self.shapes
+        if shapes is not None and display_config.get("scale"):
+            # 使用指定尺度缩放后的真实通道数与堆叠数
+            k = shapes.scale_index(display_config["scale"])
+            c1, c2, repeats = int(shapes.c1[i, k]), int(shapes.c2[i, k]), int(shapes.repeats[i, k])
+        info_parts = []
+        if display_config.get("show_channels", True):
+            if c1 != c2 and self.type_id[i] != TYPE_DETECT:
+                info_parts.append(f"{c1}→{c2}")
+            else:
+                info_parts.append(f"{c2}c")
+
+        if self.layer_counts is not None and self.layer_counts[i] > 1:
+            info_parts.append(f"{self.layer_counts[i]} layers")
+
+        if display_config.get("show_repeats", True) and repeats > 1:
+            info_parts.append(f"n={repeats}")
+
+        if display_config.get("show_args", False) and args:
+            # Concat 的参数通常是维度轴，没必要显示
+            if self.type_id[i] != TYPE_CONCAT:
+                rem_args = args[1:] if (args and isinstance(args[0], int)) else args
+                if rem_args:
+                    args_str = str(rem_args).replace(" ", "")
+                    limit = display_config.get("max_args_chars", 10)
+                    if len(args_str) > limit: args_str = args_str[:limit - 2] + ".."
+                    info_parts.append(f"a:{args_str}")
+
+        if display_config.get("show_stride", True):
+            info_parts.append(f"/{int(self.stride[i])}x")
+
+        if shapes is not None:
+            k = shapes.scale_index(display_config.get("scale"))
+            if display_config.get("show_params", False) and shapes.params[i, k]:
+                info_parts.append(format_count(shapes.params[i, k]))
+            if display_config.get("show_flops", False) and shapes.flops[i, k]:
+                info_parts.append(format_count(shapes.flops[i, k], "F"))
+
+        return " ".join(info_parts) or "Layer"
+
+
+def format_count(x, unit=""):
+    """1234567 -> 1.23M"""
+    x = float(x)
+    for div, suffix in ((1e9, "G"), (1e6, "M"), (1e3, "K")):
+        if abs(x) >= div:
+            return f"{x / div:.2f}{suffix}{unit}"
+    return f"{x:.0f}{unit}"
+
+
+def build_graph(d):
+    """从已加载的 YAML 字典构建 LayerGraph"""
+    backbone = d.get('backbone', []) or []
+    head = d.get('head', []) or []
+    meta = {k: d[k] for k in META_KEYS if k in d}
+    graph = LayerGraph(len(backbone), meta)
+    for item in backbone:
+        graph.append(item)
+    for item in head:
+        graph.append(item)
+    return graph
+
+
+_OPEN_BACKBONE = 1 << 62  # 流式构建时 backbone 长度尚未确定
+
+
+def build_graph_stream(records):
+    """
+    从 (section, payload) 记录流增量构建 LayerGraph (见 yaml_loader.iter_model):
+    每层到达时立即完成通道 / 步长推断, 不保留原始层列表.
+    head 出现在 backbone 之前时, head 的层会先缓存到 backbone 结束后再追加.
+    """
+    graph = LayerGraph(_OPEN_BACKBONE)
+    meta = {}
+    pending = []
+    backbone_seen = False
+    for section, payload in records:
+        if section == "meta":
+            key, value = payload
+            if key in META_KEYS: meta[key] = value
+        elif section == "backbone":
+            backbone_seen = True
+            graph.append(payload)
+        elif not backbone_seen:
+            pending.append(payload)
+        else:
+            if graph.backbone_len == _OPEN_BACKBONE: graph.backbone_len = len(graph)
+            graph.append(payload)
+    if graph.backbone_len == _OPEN_BACKBONE: graph.backbone_len = len(graph)
+    for item in pending:
+        graph.append(item)
+    graph.meta = {k: meta[k] for k in META_KEYS if k in meta}
+    return graph
@@ -0,0 +1,252 @@
+"""
+layout.py - Layout engines: LayerGraph -> Geometry
+
+Engines are registered in LAYOUT_ENGINES and selected through the
+"layout_engine" key of the theme config (see themes.DEFAULT_OPTIONS):
+    lanes    - classic three-lane YOLO layout (backbone column, folded neck, head)
+    layered  - Sugiyama-style layered layout for arbitrarily deep graphs
+"""
+# -*- coding: utf-8 -*-
+from layer_graph import LANE_BACKBONE, LANE_NECK, LANE_HEAD
+
+
+class Geometry:
+    """布局结果: 每个节点的矩形 (x, y, w, h) 及所在 neck 列, 外加画布与泳道尺寸"""
+    __slots__ = ("x", "y", "w", "h", "neck_col", "order", "width", "height",
+                 "lane_bounds")
+
+    def __init__(self, n):
+        self.x = [0] * n
+        self.y = [0] * n
+        self.w = [0] * n
+        self.h = [0] * n
+        self.neck_col = [-1] * n
+        self.order = []           # 节点绘制顺序
+        self.width = 0
+        self.height = 0
+        self.lane_bounds = []     # [(x, w, label, lane), ...]
+
+    def rect(self, i):
+        return self.x[i], self.y[i], self.w[i], self.h[i]
+
+
+def lane_widths(graph, config, widths=None):
+    """
+    各泳道 (neck 为单列) 的宽度. widths 为自适应节点宽度 (text_metrics.node_widths) 时,
+    泳道宽度 = max(默认宽度, 最宽节点 + 默认留白).
+    """
+    lw = {LANE_BACKBONE: config["lane_width_bb"],
+          LANE_NECK: config["lane_width_neck_col"],
+          LANE_HEAD: config["lane_width_head"]}
+    if widths is not None:
+        node_w = config["node_w"]
+        margin = {lane: w - node_w for lane, w in lw.items()}
+        for i, w in enumerate(widths):
+            if w > node_w:
+                lane = graph.lane[i]
+                if w + margin[lane] > lw[lane]: lw[lane] = w + margin[lane]
+    return lw
+
+
+def layout_lanes(graph, config, widths=None):
+    """经典三泳道布局: Backbone 单列, Neck 最多折叠为三列, Head 按输入源对齐"""
+    n = len(graph)
+    geom = Geometry(n)
+    node_w, node_h = config["node_w"], config["node_h"]
+    lanes = graph.lane
+    lw = lane_widths(graph, config, widths)
+    lane_bb, lane_neck, lane_head = lw[LANE_BACKBONE], lw[LANE_NECK], lw[LANE_HEAD]
+
+    def place(i, center_x, y, neck_col):
+        w = node_w if widths is None else widths[i]
+        geom.x[i] = center_x - w/2; geom.y[i] = y
+        geom.w[i] = w; geom.h[i] = node_h
+        geom.neck_col[i] = neck_col
+        geom.order.append(i)
+
+    # Backbone
+    current_y = 100
+    center_x = lane_bb / 2
+    for i in range(n):
+        if lanes[i] != LANE_BACKBONE: continue
+        place(i, center_x, current_y, -1)
+        current_y += config["bb_step"]
+    max_bb_y = current_y - config["bb_step"] + node_h
+
+    # Neck
+    neck_start_y = 100
+    neck_curr_y = neck_start_y
+    neck_col_idx = 0
+    neck_cols_layout = [[], [], []]
+    for i in range(n):
+        if lanes[i] != LANE_NECK: continue
+        if neck_curr_y > max_bb_y and neck_col_idx < 2:
+            neck_col_idx += 1; neck_curr_y = neck_start_y
+        neck_cols_layout[neck_col_idx].append(i)
+        neck_curr_y += config["neck_step"]
+
+    actual_neck_width = 0
+    for c_id, items in enumerate(neck_cols_layout):
+        if not items: continue
+        base_x = lane_bb + c_id * (lane_neck + config["col_gap"])
+        center_x = base_x + lane_neck / 2
+        curr_y = neck_start_y
+        for i in items:
+            place(i, center_x, curr_y, c_id)
+            curr_y += config["neck_step"]
+        actual_neck_width = base_x + lane_neck
+
+    # Head
+    head_start_x = actual_neck_width
+    head_curr_y = neck_start_y
+    center_x = head_start_x + lane_head / 2
+    placed = bytearray(n)
+    for i in geom.order: placed[i] = 1
+    for i in range(n):
+        if lanes[i] != LANE_HEAD: continue
+        src_ys = [geom.y[s] for s in graph.sources(i) if 0 <= s < n and placed[s]]
+        target_y = sum(src_ys)/len(src_ys) if src_ys else head_curr_y
+        if target_y < head_curr_y: target_y = head_curr_y
+        place(i, center_x, target_y, 99)
+        placed[i] = 1
+        head_curr_y = target_y + config["neck_step"]
+
+    geom.width = head_start_x + lane_head
+    geom.height = max_bb_y + 50
+    geom.lane_bounds = [
+        (0, lane_bb, "Backbone", LANE_BACKBONE),
+        (lane_bb, head_start_x - lane_bb, "Neck", LANE_NECK),
+        (head_start_x, lane_head, "Head", LANE_HEAD),
+    ]
+    return geom
+
+
+def layout_layered(graph, config, widths=None, sweeps=4):
+    """
+    Sugiyama 风格分层布局, 总体 O((V+E) log V):
+      1. 分层 (rank): 最长路径; 跨泳道的边不占新行, 因此 neck/head 与其输入并排
+      2. 交叉最小化: 在每个 (rank, 泳道) 分组内按邻居重心 (barycenter) 上下交替排序
+      3. 坐标分配: 泳道 = 列约束, 泳道宽度取该泳道最宽一行, 组内居中
+    跨多行的长边不插入虚拟节点, 交给连线阶段处理.
+    """
+    n = len(graph)
+    geom = Geometry(n)
+    node_w, node_h = config["node_w"], config["node_h"]
+    step = config["bb_step"]
+    lanes = graph.lane
+    lane_slot_w = lane_widths(graph, config, widths)
+
+    # 1. 分层: 节点已按拓扑序排列 (from 只引用更早的层)
+    preds = [()] * n
+    succs = [[] for _ in range(n)]
+    rank = [0] * n
+    for i in range(n):
+        ps = [s for s in graph.sources(i) if 0 <= s < i]
+        preds[i] = ps
+        r = 0
+        for p in ps:
+            succs[p].append(i)
+            rp = rank[p] + (lanes[p] == lanes[i])
+            if rp > r: r = rp
+        rank[i] = r
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault((rank[i], lanes[i]), []).append(i)
+    keys = sorted(groups)
+
+    # 2. 交叉最小化: 重心排序, 位置键 = 泳道 * span + 组内序号
+    span = max((len(g) for g in groups.values()), default=1) + 1
+    pos = [0.0] * n
+    for g in groups.values():
+        for k, v in enumerate(g):
+            pos[v] = lanes[v] * span + k
+
+    def sweep(order_keys, neighbours):
+        for key in order_keys:
+            g = groups[key]
+            if len(g) < 2: continue
+            bary = {}
+            for v in g:
+                nb = neighbours[v]
+                bary[v] = sum(pos[u] for u in nb) / len(nb) if nb else pos[v]
+            g.sort(key=bary.__getitem__)
+            base = key[1] * span
+            for k, v in enumerate(g):
+                pos[v] = base + k
+
+    for it in range(sweeps):
+        if it % 2 == 0: sweep(keys, preds)
+        else: sweep(reversed(keys), succs)
+
+    # 3. 坐标分配
+    lane_slots = {LANE_BACKBONE: 1, LANE_NECK: 1, LANE_HEAD: 1}
+    for (r, lane), g in groups.items():
+        if len(g) > lane_slots[lane]: lane_slots[lane] = len(g)
+    lane_x, lane_w = {}, {}
+    x0 = 0
+    for lane in (LANE_BACKBONE, LANE_NECK, LANE_HEAD):
+        lane_x[lane] = x0
+        lane_w[lane] = lane_slots[lane] * lane_slot_w[lane]
+        x0 += lane_w[lane]
+
+    top = 100
+    max_y = top
+    for key in keys:
+        r, lane = key
+        g = groups[key]
+        slot_w = lane_slot_w[lane]
+        offset = lane_x[lane] + (lane_w[lane] - len(g) * slot_w) / 2
+        y = top + r * step
+        for k, v in enumerate(g):
+            w = node_w if widths is None else widths[v]
+            geom.x[v] = offset + k * slot_w + (slot_w - w) / 2
+            geom.y[v] = y
+            geom.w[v] = w; geom.h[v] = node_h
+            geom.neck_col[v] = k if lane == LANE_NECK else (-1 if lane == LANE_BACKBONE else 99)
+        if y > max_y: max_y = y
+    geom.order = sorted(range(n), key=lambda v: (lanes[v], v))
+
+    geom.width = x0
+    geom.height = max_y + node_h + 50
+    geom.lane_bounds = [
+        (lane_x[LANE_BACKBONE], lane_w[LANE_BACKBONE], "Backbone", LANE_BACKBONE),
+        (lane_x[LANE_NECK], lane_w[LANE_NECK], "Neck", LANE_NECK),
+        (lane_x[LANE_HEAD], lane_w[LANE_HEAD], "Head", LANE_HEAD),
+    ]
+    return geom
+
+
+LAYOUT_ENGINES = {
+    "lanes": layout_lanes,
+    "layered": layout_layered,
+}
+
+
+def register_layout_engine(name, fn):
+    """
+    注册自定义布局引擎: fn(graph, config) -> Geometry.
+    支持自适应节点宽度的引擎额外接受 widths (每个节点的宽度列表, 见 compute_layout).
+    """
+    LAYOUT_ENGINES[name] = fn
+
+
+def compute_layout(graph, config, widths=None):
+    """widths: 可选的逐节点宽度 (text_metrics.node_widths), None 表示全部为 node_w"""
+    name = config.get("layout_engine", "lanes")
+    engine = LAYOUT_ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown layout engine '{name}', available: {', '.join(LAYOUT_ENGINES)}")
+    if widths is None:
+        return engine(graph, config)
+    return engine(graph, config, widths)
+
+
+# 影响几何 (布局 + 连线路由) 的配置键; 颜色 / 字体 / 圆角等只影响序列化
+LAYOUT_KEYS = ("layout_engine", "edge_router", "edge_bundling", "node_w", "node_h", "bb_step", "neck_step",
+               "col_gap", "lane_width_bb", "lane_width_neck_col", "lane_width_head")
+
+
+def layout_key(config):
+    """布局键相同的主题可以共用同一份 Geometry 和连线"""
+    return tuple(config.get(k) for k in LAYOUT_KEYS)
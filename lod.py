@@ -0,0 +1,91 @@
+"""
+lod.py - Level of detail for large graphs: stage grouping and collapsed overviews
+
+Consecutive layers of the same lane are grouped into stages, split wherever
+the cumulative stride changes (i.e. at every downsample / upsample). A stage
+can then be
+    collapsed   one summary node per stage (collapse), edges between stages
+                deduplicated: the overview of a deep model
+    grouped     the full graph with each stage wrapped in its own <g>
+    tiled       one detail graph per stage (stage_subgraph), linked from the
+                overview
+See yolo_graph.render_lod for the output side.
+"""
+# -*- coding: utf-8 -*-
+from array import array
+
+from layer_graph import LayerGraph, LANE_BACKBONE
+
+
+class Stages:
+    """阶段划分: 第 k 个阶段为层 [start[k], start[k+1]); stage_of[i] 为第 i 层所在阶段"""
+    __slots__ = ("start", "stage_of")
+
+    def __init__(self, start, n):
+        self.start = array('i', start)
+        self.start.append(n)
+        self.stage_of = array('i', [0]) * n
+        for k in range(len(start)):
+            for i in range(self.start[k], self.start[k + 1]):
+                self.stage_of[i] = k
+
+    def __len__(self):
+        return len(self.start) - 1
+
+    def members(self, k):
+        return range(self.start[k], self.start[k + 1])
+
+
+def find_stages(graph, max_layers=0):
+    """按泳道与步长变化划分阶段; max_layers > 0 时单个阶段最多包含这么多层"""
+    n = len(graph)
+    start = [0] if n else []
+    for i in range(1, n):
+        if (graph.stride[i] != graph.stride[i - 1] or graph.lane[i] != graph.lane[i - 1]
+                or (max_layers and i - start[-1] >= max_layers)):
+            start.append(i)
+    return Stages(start, n)
+
+
+def stage_label(graph, a, b):
+    """阶段节点标题: 单层沿用原标题; 多层为 "首层…末层", 标题全部相同时为 "C2f×3" """
+    first, last = graph.labels[a], graph.labels[b - 1]
+    if b - a == 1:
+        return first
+    if all(graph.labels[i] == first for i in range(a, b)):
+        return f"{first}×{b - a}"
+    return f"{first}…{last}"
+
+
+def collapse(graph, stages):
+    """
+    每个阶段折叠为一个汇总节点: c1 取首层、c2 / 步长取末层, 阶段内的层数记在 layer_counts
+    (显示为 "k layers"); 多层阶段的 repeats 为 1, 不与 YAML 的 n 混淆.
+    色条类型取末层 (通常是阶段的主体模块). 阶段之间的边去重后保留.
+    """
+    stage_of = stages.stage_of
+    out = LayerGraph(0, dict(graph.meta))
+    out.layer_counts = array('i')
+    for k in range(len(stages)):
+        a, b = stages.start[k], stages.start[k + 1]
+        sources = []
+        for i in range(a, b):
+            for s in graph.sources(i):
+                src = stage_of[s] if 0 <= s < i else -1
+                if src != k and src not in sources: sources.append(src)
+        single = b - a == 1
+        out.add_row(graph.c1[a], graph.c2[b - 1], graph.stride[b - 1], graph.lane[a], graph.type_id[b - 1],
+                    graph.repeats[a] if single else 1, stage_label(graph, a, b),
+                    graph.modules[a] if single else "stage", graph.args[a] if single else [], sources)
+        out.layer_counts.append(b - a)
+        if graph.lane[a] == LANE_BACKBONE: out.backbone_len = k + 1
+    return out
+
+
+def stage_subgraph(graph, stages, k):
+    """第 k 个阶段的完整子图 (用于分块输出); 来自阶段外的输入不画连线"""
+    a, b = stages.start[k], stages.start[k + 1]
+    out = LayerGraph(b - a if graph.lane[a] == LANE_BACKBONE else 0, dict(graph.meta))
+    for i in range(a, b):
+        out.copy_row(graph, i, [s - a if a <= s < i else -1 for s in graph.sources(i)])
+    return out
@@ -2,33 +2,51 @@
 """
 YOLO Graph Generator v2.0
 Usage:
-    python main.py model.yaml [output.svg] [--theme paper|pro|candy|dark]
+    python main.py model.yaml [output.svg] [--theme paper|pro|candy|dark|all] [--layout lanes|layered]
+                   [--router curves|avoid|orthogonal] [--auto-size] [--modules my_modules.yaml] [--css] [--compact] [--profile [profile.json]]
+                   [--diff old.yaml] [--lod [overview|groups|tiles]] [--export json,dot,mermaid] [--bundle] [--watch]
+output.json / .dot / .gv / .mmd writes that format instead of SVG; output.html writes a canvas viewer.
 """
 # -*- coding: utf-8 -*-
 
+import os
 import sys
-import themes
-import yolo_graph
+# themes / yolo_graph (以及 PyYAML) 在 main() 中按需导入, 打印用法或被 batch / server 导入时不加载
 # ================= 🔧 信息显示配置 =================
 # 将这里的 True/False 改为你想要的状态
 DISPLAY_CONFIG = {
     "show_channels": True,  # 显示通道 (如 64->128 或 128c)
     "show_repeats":  True,  # 显示堆叠数 (如 n=3)
     "show_stride":   True,  # 显示倍率 (如 /32x)
-    "show_args":     False, # 显示详细参数 (如 a:3,2) -> ⚠️ 如果字太多溢出，请关掉这个
+    "show_args":     False, # 显示详细参数 (如 a:3,2), 文字溢出时可加 --auto-size 让节点按文字宽度加宽
+    "max_args_chars": 24,   # show_args 参数字符串的最大长度, 超出部分截断为 ".."
+    "scale":         None,  # 按 YAML scales 缩放通道 / 堆叠数 (如 "n", "s"), None 表示原始值
+    "show_params":   False, # 显示每层参数量 (如 1.23M), 需要 numpy
+    "show_flops":    False, # 显示每层 FLOPs (如 0.45GF), 需要 numpy
 }
 
+def _report_profile(prof, json_path=None):
+    if json_path:
+        import json
+        with open(json_path, 'w', encoding='utf-8') as f: json.dump(prof.as_dict(), f, indent=2)
+        print(f"⏱️ Profile saved to {json_path}")
+    else:
+        print(prof.report())
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python main.py model.yaml [output.svg] [--theme paper|pro|candy|dark]")
+        print("Usage: python main.py model.yaml [output.svg] [--theme paper|pro|candy|dark|all] [--layout lanes|layered] [--router curves|avoid|orthogonal] [--auto-size] [--css] [--compact] [--profile [profile.json]] [--diff old.yaml] [--lod [overview|groups|tiles]] [--export json,dot,mermaid] [--bundle] [--watch]")
         return
 
+    import themes
+    import yolo_graph
+
     yaml_path = sys.argv[1]
     
     out_name = "yolo_graph.svg"
     if len(sys.argv) > 2 and not sys.argv[2].startswith("--"):
         out_name = sys.argv[2]
-        if not out_name.endswith(".svg"): out_name += ".svg"
+        if not out_name.endswith((".svg", ".svgz", ".html", ".json", ".dot", ".gv", ".mmd")): out_name += ".svg"
     
     theme_name = "paper"
     if "--theme" in sys.argv:
@@ -37,12 +55,84 @@ def main():
             theme_name = sys.argv[idx + 1]
         except IndexError: pass
 
-    config = themes.get_config(theme_name)
-    
+    if "--modules" in sys.argv:
+        try:
+            import module_registry
+            module_registry.load_plugin(sys.argv[sys.argv.index("--modules") + 1])
+        except IndexError: pass
+
+    # --theme all: 一次布局, 输出 output_<theme>.svg (如 svg/graph_paper.svg)
+    theme_names = list(themes.THEMES) if theme_name == "all" else [theme_name]
+    targets = []
+    for name in theme_names:
+        config = themes.get_config(name)
+        if "--layout" in sys.argv:
+            try:
+                config["layout_engine"] = sys.argv[sys.argv.index("--layout") + 1]
+            except IndexError: pass
+        if "--router" in sys.argv:
+            try:
+                config["edge_router"] = sys.argv[sys.argv.index("--router") + 1]
+            except IndexError: pass
+        if "--auto-size" in sys.argv:
+            config["auto_size"] = True
+        if "--bundle" in sys.argv:
+            config["edge_bundling"] = True
+        if "--css" in sys.argv:
+            config["css_classes"] = True
+        if "--compact" in sys.argv:
+            config["compact"] = True
+        stem, ext = os.path.splitext(out_name)
+        out_file = out_name if theme_name != "all" else f"{stem}_{name}{ext}"
+        targets.append((config, out_file))
+
+    # --export json,dot,mermaid: 同一次解析顺带输出其他格式, 文件名为 output.<ext>
+    if "--export" in sys.argv:
+        import exporters
+        stem = os.path.splitext(out_name)[0]
+        idx = sys.argv.index("--export")
+        if idx + 1 >= len(sys.argv) or sys.argv[idx + 1].startswith("--"):
+            print(f"❌ --export needs a format list, e.g. --export json,dot (available: {', '.join(exporters.FORMATS)})")
+            return
+        for fmt in sys.argv[idx + 1].split(","):
+            ext = exporters.FORMATS.get(fmt.strip().lower())
+            if ext is None:
+                print(f"❌ Unknown export format '{fmt}', available: {', '.join(exporters.FORMATS)}")
+                return
+            if all(out_file != stem + ext for _, out_file in targets):
+                targets.append((targets[0][0], stem + ext))
+
+    # --profile: 打印各阶段耗时; --profile out.json: 写成 JSON
+    if "--profile" in sys.argv:
+        import profiling
+        idx = sys.argv.index("--profile")
+        profile_json = sys.argv[idx + 1] if idx + 1 < len(sys.argv) and sys.argv[idx + 1].endswith(".json") else None
+        profiling.enable()
+        profiling.add_hook(lambda p: _report_profile(p, profile_json))
+
     print(f"🎨 Theme: '{theme_name}' | 📊 Info: {DISPLAY_CONFIG}")
     try:
-        yolo_graph.parse_and_layout(yaml_path, out_name, config, DISPLAY_CONFIG)
-        print(f"✅ Saved to {out_name}")
+        if "--diff" in sys.argv:
+            # --diff old.yaml: 以 old.yaml 为基准, 高亮 model.yaml 中新增 / 删除 / 修改的层
+            old_path = sys.argv[sys.argv.index("--diff") + 1]
+            diff = yolo_graph.render_diff(old_path, yaml_path, targets, DISPLAY_CONFIG)
+            print(f"🔀 Diff {old_path} -> {yaml_path}: {diff.summary()}")
+        elif "--lod" in sys.argv:
+            # --lod: 按步长分阶段折叠; groups = 完整图 + 每阶段一个 <g>; tiles = 折叠图 + 每阶段一张细节图
+            idx = sys.argv.index("--lod")
+            mode = sys.argv[idx + 1] if idx + 1 < len(sys.argv) and not sys.argv[idx + 1].startswith("--") else "overview"
+            stages = yolo_graph.render_lod(yaml_path, targets, DISPLAY_CONFIG, mode)
+            print(f"🗂️ LOD ({mode}): {len(stages.stage_of)} layers -> {len(stages)} stages")
+        elif "--watch" in sys.argv:
+            # --watch: 保存后只重新推断 / 重绘改动的层及其下游, 原地修补输出文件 (Ctrl+C 结束)
+            import watch
+            print(f"👀 Watching {yaml_path} (Ctrl+C to stop)")
+            watch.watch(yaml_path, targets, DISPLAY_CONFIG,
+                        on_update=lambda mode, layers, dt: print(f"🔄 {mode}: {layers} layers in {dt * 1000:.1f} ms"))
+        else:
+            yolo_graph.render_themes(yaml_path, targets, DISPLAY_CONFIG)
+        for _, out_file in targets:
+            print(f"✅ Saved to {out_file}")
     except Exception as e:
         print(f"❌ Error: {e}")
         print("Please ensure the YAML file is valid and try again.")
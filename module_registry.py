@@ -0,0 +1,181 @@
+"""
+module_registry.py - Module semantics registry
+
+Maps a YAML module name (Conv, C3k2, nn.Upsample, ...) to its category, the
+type_colors key used for its colour strip, how its output channels are
+inferred and how it changes the stride. Each distinct module string is
+resolved once (memoised), so the per-layer loop does no string scanning.
+
+Custom blocks can be registered from Python with register_module() or from a
+YAML plugin file (load_plugin(), main.py --modules, or the YOLO_GRAPH_MODULES
+environment variable, os.pathsep separated):
+
+    MyDownBlock: {category: conv, color: Conv, channels: args0, stride: down2}
+    MyFusion:    {category: concat, color: Concat, channels: concat}
+"""
+# -*- coding: utf-8 -*-
+import os
+from functools import lru_cache
+
+# 模块类别 (type id), 名称与主题中的 type_colors 键一致
+TYPE_NAMES = ("Other", "Conv", "Concat", "Detect", "Upsample", "C2f")
+TYPE_OTHER, TYPE_CONV, TYPE_CONCAT, TYPE_DETECT, TYPE_UPSAMPLE, TYPE_C2F = range(len(TYPE_NAMES))
+
+# ---------------- 通道规则: fn(c1, args, src_channels) -> c2 ----------------
+
+def _ch_args0(c1, args, src_channels):
+    # 普通模块 (Conv, C2f等)，输出通道通常在 args[0]
+    return args[0] if (args and isinstance(args[0], int)) else c1
+
+
+def _ch_concat(c1, args, src_channels):
+    # Concat 的输出通道数 = 所有输入源的通道数之和
+    return sum(src_channels)
+
+
+def _ch_same(c1, args, src_channels):
+    return c1
+
+
+CHANNEL_RULES = {"args0": _ch_args0, "concat": _ch_concat, "same": _ch_same}
+
+# ---------------- 步长规则: fn(stride, args) -> stride ----------------
+
+def _st_none(stride, args):
+    return stride
+
+
+def _st_conv(stride, args):
+    # [c2, k, s, ...]
+    s = args[2] if len(args) > 2 else 1
+    return stride * s if isinstance(s, int) and s > 0 else stride
+
+
+def _st_down2(stride, args):
+    return stride * 2
+
+
+def _st_up(stride, args):
+    # nn.Upsample [size, scale_factor, mode]
+    f = args[1] if len(args) > 1 else 2
+    return stride / f if isinstance(f, (int, float)) and f > 0 else stride / 2
+
+
+def _st_pool(stride, args):
+    # nn.MaxPool2d [k, s]; stride 缺省等于 kernel
+    s = args[1] if len(args) > 1 else (args[0] if args else 1)
+    return stride * s if isinstance(s, int) and s > 0 else stride
+
+
+STRIDE_RULES = {"none": _st_none, "conv": _st_conv, "down2": _st_down2, "up": _st_up, "pool": _st_pool}
+
+
+class ModuleSpec:
+    """category: 语义类别; color: type_colors 的键; channels / stride: 规则名或函数"""
+    __slots__ = ("category", "color", "channels", "stride")
+
+    def __init__(self, category="other", color="Other", channels="args0", stride="none"):
+        self.category = category
+        self.color = color
+        self.channels = channels
+        self.stride = stride
+
+    def as_dict(self):
+        return {k: (v if isinstance(v, str) else getattr(v, "__name__", repr(v)))
+                for k, v in ((s, getattr(self, s)) for s in self.__slots__)}
+
+
+class ResolvedModule:
+    """resolve() 的结果: 每个不同的模块字符串只计算一次"""
+    __slots__ = ("name", "label", "spec", "type_id", "is_head", "channel_fn", "stride_fn")
+
+
+_REGISTRY = {}
+
+
+def _register_builtin(names, **spec):
+    for name in names.split():
+        _REGISTRY[name] = ModuleSpec(**spec)
+
+
+_register_builtin("Conv DWConv GhostConv RepConv LightConv SCDown CBLinear",
+                  category="conv", color="Conv", stride="conv")
+_register_builtin("AConv ADown Focus", category="conv", color="Conv", stride="down2")
+_register_builtin("C1 C2 C2f C3 C3x C3k C3k2 C3Ghost C3TR RepC3 C2fCIB C2fAttn BottleneckCSP "
+                  "Bottleneck GhostBottleneck ELAN1 RepNCSPELAN4 ResNetLayer",
+                  category="csp", color="C2f")
+_register_builtin("C2PSA C2fPSA PSA A2C2f AIFI", category="attention", color="Other")
+_register_builtin("SPP SPPF SPPELAN", category="pool", color="Other")
+_register_builtin("MaxPool2d", category="pool", color="Other", stride="pool")
+_register_builtin("Concat CBFuse", category="concat", color="Concat", channels="concat")
+_register_builtin("Upsample", category="upsample", color="Upsample", stride="up")
+_register_builtin("Detect Segment Pose OBB v10Detect WorldDetect YOLOEDetect RTDETRDecoder Classify",
+                  category="detect", color="Detect")
+
+_BUILTIN = dict(_REGISTRY)
+
+
+def _fallback(name):
+    """未注册模块: 按名称约定猜测一次 (结果被 resolve 缓存)"""
+    if name.endswith("Conv"): return _BUILTIN["Conv"]
+    if "Concat" in name: return _BUILTIN["Concat"]
+    if "Detect" in name: return _BUILTIN["Detect"]
+    if "Upsample" in name: return _BUILTIN["Upsample"]
+    return ModuleSpec()
+
+
+@lru_cache(maxsize=None)
+def resolve(module):
+    """模块字符串 (如 'nn.Upsample') -> ResolvedModule"""
+    m_str = str(module)
+    name = m_str.split(".")[-1]
+    spec = _REGISTRY.get(name) or _fallback(name)
+    r = ResolvedModule()
+    r.name = name
+    r.label = m_str.replace("nn.modules.", "").replace("ularytics.", "")
+    r.spec = spec
+    r.type_id = TYPE_NAMES.index(spec.color) if spec.color in TYPE_NAMES else 0
+    r.is_head = spec.category == "detect"
+    r.channel_fn = spec.channels if callable(spec.channels) else CHANNEL_RULES[spec.channels]
+    r.stride_fn = spec.stride if callable(spec.stride) else STRIDE_RULES[spec.stride]
+    return r
+
+
+def register_module(name, category="other", color="Other", channels="args0", stride="none"):
+    """注册 / 覆盖一个模块的语义; channels / stride 可为规则名或函数"""
+    if isinstance(channels, str) and channels not in CHANNEL_RULES:
+        raise ValueError(f"Unknown channel rule '{channels}' for {name}, available: {', '.join(CHANNEL_RULES)}")
+    if isinstance(stride, str) and stride not in STRIDE_RULES:
+        raise ValueError(f"Unknown stride rule '{stride}' for {name}, available: {', '.join(STRIDE_RULES)}")
+    if color not in TYPE_NAMES:
+        raise ValueError(f"Unknown color key '{color}' for {name}, available: {', '.join(TYPE_NAMES)}")
+    _REGISTRY[name] = ModuleSpec(category, color, channels, stride)
+    resolve.cache_clear()
+
+
+def load_plugin(path):
+    """从 YAML 插件文件批量注册模块, 返回注册的模块名列表"""
+    import yaml
+    with open(path, 'r', encoding='utf-8') as f: entries = yaml.safe_load(f) or {}
+    for name, spec in entries.items():
+        spec = spec or {}
+        register_module(str(name), spec.get("category", "other"), spec.get("color", "Other"),
+                        spec.get("channels", "args0"), spec.get("stride", "none"))
+    return list(entries)
+
+
+def load_env_plugins(var="YOLO_GRAPH_MODULES"):
+    for path in filter(None, os.environ.get(var, "").split(os.pathsep)):
+        load_plugin(path)
+
+
+def fingerprint():
+    """与内置表不同的注册项的哈希, 用于缓存键 (插件变化时缓存失效)"""
+    custom = {k: v.as_dict() for k, v in _REGISTRY.items() if _BUILTIN.get(k) is not v}
+    if not custom:
+        return ""
+    import json, hashlib
+    return hashlib.sha256(json.dumps(custom, sort_keys=True).encode()).hexdigest()
+
+
+load_env_plugins()
@@ -0,0 +1,169 @@
+"""
+profiling.py - Lightweight per-stage timers and counters for the render pipeline
+
+Off by default: yolo_graph asks begin() for a profile and gets a shared no-op
+object back, so the only cost is a handful of method calls per render.
+
+    import profiling
+    profiling.enable()
+    profiling.add_hook(lambda prof: print(prof.as_dict()))   # called after every render
+    yolo_graph.parse_and_layout(...)
+
+or, for a single block of work:
+
+    with profiling.profile() as prof:
+        yolo_graph.parse_and_layout(...)
+    print(prof.report())
+
+The active profile lives in a context variable, so renders running
+concurrently in threads (server.py, async_render.py) or in asyncio tasks each
+get their own counters. enable(), the hooks and open profile() sessions are
+process-wide: a session collects every render finished while it is open,
+including renders on worker threads started inside the block.
+"""
+# -*- coding: utf-8 -*-
+import time
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager, nullcontext
+
+# 流水线阶段的输出顺序 (未出现的阶段不显示)
+# stream = 流式解析与逐层推断交织进行 (load + build)
+STAGE_ORDER = ("cache", "load", "build", "stream", "diff", "lod", "shapes", "layout", "route", "bundle", "render", "export")
+
+_NULL_CTX = nullcontext()
+
+
+class Profile:
+    """一次渲染 (或 profile() 块) 的阶段耗时与计数器"""
+    __slots__ = ("label", "seconds", "calls", "counters", "_outer")
+
+    def __init__(self, label=""):
+        self.label = label
+        self._outer = None   # begin() 之前的活动 profile, end() 时恢复
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - t0
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        for k, v in other.seconds.items(): self.seconds[k] = self.seconds.get(k, 0.0) + v
+        for k, v in other.calls.items(): self.calls[k] = self.calls.get(k, 0) + v
+        for k, v in other.counters.items(): self.count(k, v)
+
+    def _ordered(self):
+        return [s for s in STAGE_ORDER if s in self.seconds] + [s for s in self.seconds if s not in STAGE_ORDER]
+
+    def as_dict(self):
+        return {"label": self.label,
+                "total_ms": round(sum(self.seconds.values()) * 1000, 3),
+                "stages": {s: {"ms": round(self.seconds[s] * 1000, 3), "calls": self.calls[s]} for s in self._ordered()},
+                "counters": dict(self.counters)}
+
+    def report(self):
+        total = sum(self.seconds.values()) or 1e-12
+        lines = [f"⏱️ Profile: {self.label}"]
+        for s in self._ordered():
+            sec = self.seconds[s]
+            lines.append(f"   {s:<8}{sec*1000:>10.2f} ms {sec/total*100:>6.1f}%  ({self.calls[s]} calls)")
+        lines.append(f"   {'total':<8}{total*1000:>10.2f} ms")
+        if self.counters:
+            lines.append("   " + " | ".join(f"{k} {v}" for k, v in self.counters.items()))
+        return "\n".join(lines)
+
+
+class _NullProfile:
+    """关闭时使用的空对象: 所有方法都是空操作"""
+    __slots__ = ()
+    label = ""
+
+    def stage(self, name):
+        return _NULL_CTX
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
+
+_enabled = False
+_current = ContextVar("profiling_current", default=NULL_PROFILE)
+_sessions = []                   # 打开中的 profile() 会话, 所有线程共用
+_merge_lock = threading.Lock()   # 保护 _sessions 及会话的合并, 多个线程的渲染可能同时结束
+_hooks = []
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def add_hook(fn):
+    """注册回调 fn(profile); 每次渲染结束 (开启 profiling 时) 调用一次"""
+    _hooks.append(fn)
+    return fn
+
+
+def remove_hook(fn):
+    if fn in _hooks: _hooks.remove(fn)
+
+
+def begin(label=""):
+    """开始一次渲染的统计; 关闭时返回 NULL_PROFILE"""
+    if not _enabled:
+        return NULL_PROFILE
+    prof = Profile(label)
+    prof._outer = _current.get()
+    _current.set(prof)
+    return prof
+
+
+def active():
+    """当前渲染的 profile (供下游阶段追加计数), 未开启时为 NULL_PROFILE"""
+    return _current.get()
+
+
+def end(prof):
+    if prof is NULL_PROFILE:
+        return
+    if _current.get() is prof:
+        _current.set(prof._outer or NULL_PROFILE)
+    prof._outer = None
+    with _merge_lock:
+        for session in _sessions: session.merge(prof)
+    for fn in list(_hooks):
+        fn(prof)
+
+
+@contextmanager
+def profile(label="session"):
+    """在 with 块内开启 profiling, 产出汇总块内结束的所有渲染 (任意线程) 的 Profile"""
+    was_enabled = _enabled
+    session = Profile(label)
+    with _merge_lock: _sessions.append(session)
+    enable()
+    try:
+        yield session
+    finally:
+        with _merge_lock: _sessions.remove(session)
+        if not was_enabled: disable()
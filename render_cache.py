@@ -0,0 +1,195 @@
+"""
+render_cache.py - Content-addressed on-disk cache for parsed graphs and rendered SVGs
+
+Keys are SHA-256 digests of the YAML bytes plus the theme config, the
+display config, the output kind (extension and gzip flag) and any custom
+module registrations, so an unchanged input skips parsing, layout and
+rendering, and .svg / .svgz / .json / .html targets never share an entry.
+The cache directory is bounded; the least recently used entries are evicted.
+Usage is tracked in memory, so the directory is only rescanned when a write
+pushes it over a limit; eviction then goes down to LOW_WATER of the limits,
+and output stamps of evicted renders are dropped with them. Parsed graphs
+are stored as LayerGraph.to_bytes (JSON + raw arrays), not pickled, so a
+shared cache directory cannot run code in the reader.
+"""
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import hashlib
+
+import module_registry
+from layer_graph import LayerGraph
+
+# 渲染逻辑变化时递增, 使旧缓存全部失效
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = ".yolo_graph_cache"
+
+# 淘汰时降到上限的这个比例, 之后的若干次写入无需再扫描目录
+LOW_WATER = 0.9
+
+
+def _digest(*parts):
+    h = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for p in parts:
+        h.update(b"\0")
+        h.update(p if isinstance(p, bytes) else json.dumps(p, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f: f.write(data)
+    os.replace(tmp, path)
+
+
+class RenderCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=2048, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.skipped_writes = 0
+        self._usage = None   # [条目数, 总字节数] 的估计, 首次写入时扫描一次目录
+        for sub in ("svg", "graph", "out"):
+            os.makedirs(os.path.join(cache_dir, sub), exist_ok=True)
+
+    # ---------- keys ----------
+    def svg_key(self, yaml_bytes, config, display_config, kind=(".svg", False)):
+        """kind: 输出类型 (扩展名, 是否 gzip), 同一配置的不同格式各自缓存"""
+        return _digest(yaml_bytes, config, display_config, list(kind), module_registry.fingerprint())
+
+    def graph_key(self, yaml_bytes):
+        return _digest(yaml_bytes, module_registry.fingerprint())
+
+    def _path(self, kind, key):
+        return os.path.join(self.cache_dir, kind, key)
+
+    def _touch(self, path):
+        try: os.utime(path)
+        except OSError: pass
+
+    # ---------- parsed graphs ----------
+    def get_graph(self, key):
+        path = self._path("graph", key)
+        try:
+            with open(path, 'rb') as f: graph = LayerGraph.from_bytes(f.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self._touch(path)
+        return graph
+
+    def put_graph(self, key, graph):
+        try:
+            data = graph.to_bytes()
+        except TypeError:
+            return   # args 无法用 JSON 表示, 不缓存解析结果
+        _write_atomic(self._path("graph", key), data)
+        self._added(len(data))
+
+    # ---------- rendered SVGs ----------
+    def restore(self, key, out_file):
+        """
+        命中时把缓存的 SVG 放到 out_file 并返回 True.
+        如果 out_file 就是上次由同一个 key 写出的且未被改动, 连文件写入也跳过.
+        """
+        path = self._path("svg", key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return False
+        self.hits += 1
+        self._touch(path)
+
+        stamp_path = self._path("out", _digest(os.path.abspath(out_file)))
+        try:
+            st = os.stat(out_file)
+            with open(stamp_path, 'r') as f: stamp = f.read()
+            if stamp == f"{key} {st.st_size} {st.st_mtime_ns}":
+                self.skipped_writes += 1
+                return True
+        except OSError:
+            pass
+
+        shutil.copyfile(path, out_file)
+        self._stamp(key, out_file)
+        return True
+
+    def store(self, key, out_file):
+        """out_file 已由渲染器写出, 把它复制进缓存并记录输出戳"""
+        path = self._path("svg", key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(out_file, tmp)
+        os.replace(tmp, path)
+        self._stamp(key, out_file)
+        self._added(os.path.getsize(path))
+
+    def _stamp(self, key, out_file):
+        st = os.stat(out_file)
+        stamp_path = self._path("out", _digest(os.path.abspath(out_file)))
+        _write_atomic(stamp_path, f"{key} {st.st_size} {st.st_mtime_ns}".encode())
+
+    # ---------- eviction ----------
+    def _scan(self):
+        """[(mtime_ns, size, kind, name), ...]: svg/ 与 graph/ 下的全部条目"""
+        entries = []
+        for sub in ("svg", "graph"):
+            with os.scandir(os.path.join(self.cache_dir, sub)) as it:
+                for e in it:
+                    if e.name.endswith(".tmp"): continue
+                    try: st = e.stat()
+                    except OSError: continue
+                    entries.append((st.st_mtime_ns, st.st_size, sub, e.name))
+        return entries
+
+    def _added(self, size):
+        """写入一个条目后更新用量估计; 只有超过上限时才扫描目录并淘汰"""
+        if self._usage is None:
+            entries = self._scan()
+            self._usage = [len(entries), sum(e[1] for e in entries)]
+        else:
+            self._usage[0] += 1
+            self._usage[1] += size
+        if self._usage[0] > self.max_entries or self._usage[1] > self.max_bytes:
+            self.evict()
+
+    def evict(self, low_water=LOW_WATER):
+        """
+        超过条目数或总字节数上限时, 按最近使用时间 (mtime) 淘汰最旧的条目, 直到低于上限的 low_water 比例;
+        指向被淘汰渲染结果的输出戳一并删除. 返回淘汰的条目数.
+        """
+        entries = self._scan()
+        total = sum(e[1] for e in entries)
+        self._usage = [len(entries), total]
+        if len(entries) <= self.max_entries and total <= self.max_bytes:
+            return 0
+        max_entries, max_bytes = int(self.max_entries * low_water), int(self.max_bytes * low_water)
+        entries.sort()
+        removed = 0
+        evicted = set()
+        for _, size, sub, name in entries:
+            if len(entries) - removed <= max_entries and total <= max_bytes: break
+            try: os.remove(self._path(sub, name))
+            except OSError: continue
+            removed += 1
+            total -= size
+            if sub == "svg": evicted.add(name)
+        self._usage = [len(entries) - removed, total]
+        if evicted:
+            self._drop_stamps(evicted)
+        return removed
+
+    def _drop_stamps(self, keys):
+        """删除记录的 key 属于 keys 的输出戳"""
+        with os.scandir(os.path.join(self.cache_dir, "out")) as it:
+            for e in it:
+                if e.name.endswith(".tmp"): continue
+                try:
+                    with open(e.path, 'r') as f: key = f.read().split(" ", 1)[0]
+                    if key in keys: os.remove(e.path)
+                except OSError:
+                    continue
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "skipped_writes": self.skipped_writes}
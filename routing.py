@@ -0,0 +1,222 @@
+"""
+routing.py - Edge routing: LayerGraph + Geometry -> link paths
+
+Node rectangles are indexed in a uniform grid so that each edge only looks
+at the cells it actually crosses; routing stays near-linear in the number of
+edges. Routers are selected with the "edge_router" key of the theme config:
+    curves      - fixed curve shapes (vertical / manhattan / detour / bezier)
+    avoid       - same curves, but any curve that cuts through a node is
+                  re-routed orthogonally around the obstacles
+    orthogonal  - every non-adjacent edge is routed orthogonally
+"""
+# -*- coding: utf-8 -*-
+from layer_graph import LANE_BACKBONE, LANE_NECK
+
+
+def link_endpoints(graph, geom, src_idx, dst_idx):
+    """为一条边选择端点与连线样式, 返回 (start_pt, end_pt, dashed, routing)"""
+    lanes = graph.lane
+    p1 = geom.rect(src_idx); p2 = geom.rect(dst_idx)
+    src_col, dst_col = lanes[src_idx], lanes[dst_idx]
+    start_pt = (p1[0]+p1[2], p1[1]+p1[3]/2); end_pt = (p2[0], p2[1]+p2[3]/2)
+    dashed = (dst_col != src_col) or abs(dst_idx - src_idx) > 1
+    routing = "standard"
+
+    if dst_col == LANE_BACKBONE and src_col == LANE_BACKBONE:
+        if abs(dst_idx - src_idx) == 1:
+            start_pt = (p1[0]+p1[2]/2, p1[1]+p1[3]); end_pt = (p2[0]+p2[2]/2, p2[1])
+            routing = "vertical_straight"; dashed = False
+    elif src_col == LANE_BACKBONE and dst_col == LANE_NECK: routing = "manhattan"
+    elif src_col == LANE_NECK and dst_col == LANE_NECK and geom.neck_col[src_idx] == geom.neck_col[dst_idx]:
+        if abs(dst_idx - src_idx) == 1:
+            start_pt = (p1[0]+p1[2]/2, p1[1]+p1[3]); end_pt = (p2[0]+p2[2]/2, p2[1])
+            routing = "vertical_straight"
+        else:
+            start_pt = (p1[0]+p1[2], p1[1]+p1[3]/2); end_pt = (p2[0]+p2[2], p2[1]+p2[3]/2)
+            routing = "detour_right"
+    elif p2[0] < p1[0]:
+        start_pt = (p1[0], p1[1]+p1[3]/2); end_pt = (p2[0]+p2[2], p2[1]+p2[3]/2)
+
+    return start_pt, end_pt, dashed, routing
+
+
+def route_links(graph, geom):
+    """为每条边选择端点与连线样式, 逐条产出 (start_pt, end_pt, dashed, routing)"""
+    for src_idx, dst_idx in zip(graph.edge_src, graph.edge_dst):
+        yield link_endpoints(graph, geom, src_idx, dst_idx)
+
+
+def curve_controls(p1, p2, routing):
+    """与 SVGBuilder.add_link 相同的三次贝塞尔控制点; 直线返回 None"""
+    x1, y1 = p1; x2, y2 = p2
+    if routing == "vertical_straight":
+        return None
+    if routing == "manhattan":
+        mid_x = (x1 + x2) / 2
+        return (mid_x, y1), (mid_x, y2)
+    if routing == "detour_right":
+        return (x1 + 60, y1), (x2 + 60, y2)
+    dist_x = abs(x2 - x1)
+    return (x1 + dist_x * 0.5, y1), (x2 - dist_x * 0.5, y2)
+
+
+class GridIndex:
+    """节点矩形的均匀网格索引: 点查询 O(1), 轴对齐线段查询只访问经过的格子"""
+    __slots__ = ("cell", "cells", "rects")
+
+    def __init__(self, cell=64):
+        self.cell = cell
+        self.cells = {}
+        self.rects = {}
+
+    @classmethod
+    def from_geometry(cls, geom, cell=None):
+        n = len(geom.x)
+        if cell is None:
+            cell = max(32, int(max(geom.h, default=44)))
+        index = cls(cell)
+        for i in range(n):
+            index.insert(i, geom.rect(i))
+        return index
+
+    def insert(self, key, rect):
+        x, y, w, h = rect
+        self.rects[key] = rect
+        c = self.cell
+        for gx in range(int(x // c), int((x + w) // c) + 1):
+            for gy in range(int(y // c), int((y + h) // c) + 1):
+                self.cells.setdefault((gx, gy), []).append(key)
+
+    def _hit(self, key, x0, y0, x1, y1, pad):
+        rx, ry, rw, rh = self.rects[key]
+        return (x1 > rx - pad and x0 < rx + rw + pad and
+                y1 > ry - pad and y0 < ry + rh + pad)
+
+    def remove(self, key):
+        x, y, w, h = self.rects.pop(key)
+        c = self.cell
+        for gx in range(int(x // c), int((x + w) // c) + 1):
+            for gy in range(int(y // c), int((y + h) // c) + 1):
+                self.cells[(gx, gy)].remove(key)
+
+    def query(self, x0, y0, x1, y1):
+        """与矩形 [x0, x1] x [y0, y1] 相交的全部 key"""
+        c = self.cell
+        found = set()
+        for gx in range(int(x0 // c), int(x1 // c) + 1):
+            for gy in range(int(y0 // c), int(y1 // c) + 1):
+                for key in self.cells.get((gx, gy), ()):
+                    if key not in found and self._hit(key, x0, y0, x1, y1, 0): found.add(key)
+        return found
+
+    def hit_point(self, x, y, exclude=(), pad=0):
+        c = self.cell
+        for key in self.cells.get((int(x // c), int(y // c)), ()):
+            if key not in exclude and self._hit(key, x, y, x, y, pad):
+                return key
+        return None
+
+    def hit_segment(self, x0, y0, x1, y1, exclude=(), pad=0):
+        """轴对齐线段与某个矩形相交时返回其 key, 否则返回 None"""
+        if x0 > x1: x0, x1 = x1, x0
+        if y0 > y1: y0, y1 = y1, y0
+        c = self.cell
+        gx0, gx1 = int((x0 - pad) // c), int((x1 + pad) // c)
+        gy0, gy1 = int((y0 - pad) // c), int((y1 + pad) // c)
+        cells = self.cells
+        for gx in range(gx0, gx1 + 1):
+            for gy in range(gy0, gy1 + 1):
+                for key in cells.get((gx, gy), ()):
+                    if key not in exclude and self._hit(key, x0, y0, x1, y1, pad):
+                        return key
+        return None
+
+
+class EdgeRouter:
+    """在固定曲线样式的基础上绕开节点: 采样曲线判断是否穿过节点, 必要时改走正交折线"""
+
+    def __init__(self, graph, geom, mode="avoid", margin=8, samples=12, max_tries=8):
+        self.graph = graph
+        self.geom = geom
+        self.mode = mode
+        self.margin = margin
+        self.samples = samples
+        self.max_tries = max_tries
+        self.index = GridIndex.from_geometry(geom) if mode != "curves" else None
+        self.rerouted = 0
+
+    def _curve_blocked(self, p1, p2, routing, exclude):
+        ctrl = curve_controls(p1, p2, routing)
+        if ctrl is None:
+            return False
+        (ax, ay), (bx, by) = p1, p2
+        (c1x, c1y), (c2x, c2y) = ctrl
+        hit_point = self.index.hit_point
+        k = self.samples
+        for s in range(1, k):
+            t = s / k; u = 1 - t
+            w0, w1, w2, w3 = u*u*u, 3*u*u*t, 3*u*t*t, t*t*t
+            x = w0*ax + w1*c1x + w2*c2x + w3*bx
+            y = w0*ay + w1*c1y + w2*c2y + w3*by
+            if hit_point(x, y, exclude) is not None:
+                return True
+        return False
+
+    def _orthogonal(self, p1, p2, exclude):
+        """H-V-H 折线: 寻找一条不穿过节点的竖直通道, 找不到则返回 None"""
+        (x1, y1), (x2, y2) = p1, p2
+        m = self.margin
+        hit = self.index.hit_segment
+        if abs(x2 - x1) > 2 * m:
+            x = (x1 + x2) / 2
+            step_right = x2 > x1
+            lo, hi = min(x1, x2), max(x1, x2)
+        else:
+            # 同列: 从右侧绕行
+            x = max(x1, x2) + 3 * m
+            step_right = True
+            lo, hi = x, float("inf")
+        for _ in range(self.max_tries):
+            key = (hit(x1, y1, x, y1, exclude, 1) if x != x1 else None)
+            if key is None: key = hit(x, y1, x, y2, exclude, m)
+            if key is None: key = hit(x, y2, x2, y2, exclude, 1)
+            if key is None:
+                return [(x, y1), (x, y2)]
+            rx, ry, rw, rh = self.index.rects[key]
+            x = rx + rw + m if step_right else rx - m
+            if not (lo <= x <= hi): break
+        return None
+
+    def route_edge(self, link, src, dst):
+        """link 为 link_endpoints 的结果; 返回 (start_pt, end_pt, dashed, routing, via)"""
+        start_pt, end_pt, dashed, routing = link
+        if self.mode == "curves" or routing == "vertical_straight":
+            return start_pt, end_pt, dashed, routing, None
+        exclude = (src, dst)
+        if self.mode == "orthogonal" or self._curve_blocked(start_pt, end_pt, routing, exclude):
+            via = self._orthogonal(start_pt, end_pt, exclude)
+            if via is not None:
+                self.rerouted += 1
+                return start_pt, end_pt, dashed, "orthogonal", via
+        return start_pt, end_pt, dashed, routing, None
+
+    def route(self):
+        """逐条产出 (start_pt, end_pt, dashed, routing, via); via 为正交折线的中间点"""
+        for link, src, dst in zip(route_links(self.graph, self.geom), self.graph.edge_src, self.graph.edge_dst):
+            yield self.route_edge(link, src, dst)
+
+
+def route_bounds(route, pad=0):
+    """连线 (route_edges 的元素) 的包围盒 (x0, y0, x1, y1): 曲线取控制多边形, 路由检查的范围都在其中"""
+    start_pt, end_pt, dashed, routing, via = route
+    pts = [start_pt, end_pt]
+    if via: pts += via
+    elif routing != "orthogonal":
+        ctrl = curve_controls(start_pt, end_pt, routing)
+        if ctrl: pts += ctrl
+    xs = [p[0] for p in pts]; ys = [p[1] for p in pts]
+    return min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad
+
+
+def route_edges(graph, geom, config):
+    return EdgeRouter(graph, geom, config.get("edge_router", "curves")).route()
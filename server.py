@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+server.py - Local HTTP render service (standard library only)
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8765] [--workers N] [--cache-entries 512] [--cache-mb 64]
+                     [--modules my_modules.yaml]
+
+Endpoints:
+    POST /render   body = YAML text, options in the query string:
+                       /render?theme=dark&layout=layered&compact=1&bundle=1&show_args=1&scale=n
+                   or a JSON body {"yaml": "...", "theme": "dark", "layout": "...", "display": {...}}
+                   -> image/svg+xml (X-Cache: HIT|MISS, ETag = content hash)
+    GET  /stats    request count, cache hit rate, latency percentiles (JSON)
+    GET  /themes   available theme names (JSON)
+    GET  /health   "ok"
+The interpreter, PyYAML and the theme configs are loaded once; renders run in a
+process pool and finished SVGs are kept in an in-memory LRU keyed by content hash.
+"""
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import themes
+import module_registry
+import yaml_loader
+from main import DISPLAY_CONFIG
+from yolo_graph import render_bytes
+
+# 每个 worker 进程只构建一次主题配置
+_WORKER_CONFIGS = {}
+
+
+def _init_worker():
+    for name in themes.THEMES:
+        _WORKER_CONFIGS[name] = themes.get_config(name)
+
+
+def render_text(yaml_text, theme_name="paper", display_config=None, overrides=None):
+    """YAML 文本 -> SVG bytes (在 worker 进程中执行)"""
+    config = dict(_WORKER_CONFIGS.get(theme_name) or themes.get_config(theme_name))
+    config.update(overrides or {})
+    return render_bytes(yaml_text, config, display_config or DISPLAY_CONFIG)
+
+
+class ResultCache:
+    """按内容哈希索引的内存 LRU, 同时限制条目数与总字节数; 线程安全"""
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None: self.bytes -= len(old)
+            self.entries[key] = data
+            self.bytes += len(data)
+            while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, dropped = self.entries.popitem(last=False)
+                self.bytes -= len(dropped)
+
+
+class RenderService:
+    """渲染任务分发 + 结果缓存 + 统计; 相同 key 的并发请求只渲染一次"""
+
+    def __init__(self, workers=None, cache_entries=512, cache_bytes=64 * 1024 * 1024):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        # workers=0 时直接在请求线程中渲染 (调试用)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker) if self.workers else None
+        if self.pool is None: _init_worker()
+        self.cache = ResultCache(cache_entries, cache_bytes)
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=2048)
+        self.requests = 0
+        self.errors = 0
+        self.renders = 0
+        self.started = time.time()
+
+    @staticmethod
+    def key(yaml_bytes, theme_name, display_config, overrides):
+        h = hashlib.sha256(yaml_bytes)
+        h.update(json.dumps([theme_name, display_config, overrides, module_registry.fingerprint()],
+                            sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def render(self, yaml_bytes, theme_name, display_config, overrides):
+        """返回 (svg_bytes, key, cache_hit); 渲染失败时抛出原始异常"""
+        key = self.key(yaml_bytes, theme_name, display_config, overrides)
+        data = self.cache.get(key)
+        if data is not None:
+            return data, key, True
+
+        with self.lock:
+            fut = self.inflight.get(key)
+            owner = fut is None
+            if owner:
+                text = yaml_bytes.decode("utf-8")
+                if self.pool is not None:
+                    fut = self.pool.submit(render_text, text, theme_name, display_config, overrides)
+                else:
+                    fut = Future()
+                self.inflight[key] = fut
+                self.renders += 1
+        if owner and self.pool is None:
+            # 在锁外渲染: 其他请求 (以及 /stats) 不必等待; 相同 key 的请求等待同一个 Future
+            try: fut.set_result(render_text(text, theme_name, display_config, overrides))
+            except Exception as e: fut.set_exception(e)
+        try:
+            data = fut.result()
+        finally:
+            if owner:
+                with self.lock: self.inflight.pop(key, None)
+        if owner:
+            self.cache.put(key, data)
+        return data, key, False
+
+    def record(self, seconds, ok=True):
+        with self.lock:
+            self.requests += 1
+            if not ok: self.errors += 1
+            self.latencies.append(seconds)
+
+    def stats(self):
+        with self.lock:
+            lat = sorted(self.latencies)
+            requests, errors = self.requests, self.errors
+        pct = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3) if lat else None
+        c = self.cache
+        lookups = c.hits + c.misses
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "requests": requests,
+            "errors": errors,
+            "renders": self.renders,
+            "cache": {"hits": c.hits, "misses": c.misses, "hit_rate": round(c.hits / lookups, 4) if lookups else None,
+                      "entries": len(c.entries), "bytes": c.bytes},
+            "latency_ms": {"count": len(lat), "mean": round(sum(lat) / len(lat) * 1000, 3) if lat else None,
+                           "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": pct(1.0)},
+        }
+
+    def close(self):
+        if self.pool is not None: self.pool.shutdown()
+
+
+def _parse_bool(v):
+    return str(v).lower() in ("1", "true", "yes", "on")
+
+
+def parse_options(query, body=None):
+    """从查询参数 (以及 JSON body) 中解析 (theme, display_config, 布局覆盖项)"""
+    opts = {k: v[-1] for k, v in query.items()}
+    if body:
+        opts.update({k: v for k, v in body.items() if k not in ("yaml", "display")})
+    theme_name = opts.get("theme", "paper")
+    if theme_name not in themes.THEMES:
+        raise ValueError(f"Unknown theme '{theme_name}', available: {', '.join(themes.THEMES)}")
+
+    display = dict(DISPLAY_CONFIG)
+    for k, default in DISPLAY_CONFIG.items():
+        if k in opts:
+            v = opts[k]
+            if isinstance(default, bool):
+                display[k] = v if isinstance(v, bool) else _parse_bool(v)
+            elif isinstance(default, int):
+                display[k] = int(v)
+            else:
+                display[k] = (v or None) if k == "scale" else v
+    if body and isinstance(body.get("display"), dict):
+        display.update({k: v for k, v in body["display"].items() if k in DISPLAY_CONFIG})
+
+    overrides = {}
+    if "layout" in opts: overrides["layout_engine"] = opts["layout"]
+    if "router" in opts: overrides["edge_router"] = opts["router"]
+    if "bundle" in opts: overrides["edge_bundling"] = _parse_bool(opts["bundle"])
+    for flag in ("compact", "css_classes", "auto_size"):
+        if flag in opts: overrides[flag] = _parse_bool(opts[flag])
+    return theme_name, display, overrides
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    service = None  # RenderService, 由 make_server 设置
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code, body, content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False, indent=2).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/stats":
+            self._send(200, self.service.stats())
+        elif path == "/themes":
+            self._send(200, list(themes.THEMES))
+        elif path == "/health":
+            self._send(200, "ok", "text/plain; charset=utf-8")
+        else:
+            self._send(404, {"error": f"Not found: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/render":
+            self._send(404, {"error": f"Not found: {url.path}"})
+            return
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            body = None
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                body = json.loads(raw or b"{}")
+                raw = str(body.get("yaml", "")).encode("utf-8")
+            theme_name, display, overrides = parse_options(parse_qs(url.query), body)
+            data, key, hit = self.service.render(raw, theme_name, display, overrides)
+        except Exception as e:
+            bad_input = isinstance(e, (ValueError, TypeError, KeyError, IndexError)) or yaml_loader.is_yaml_error(e)
+            self._send(400 if bad_input else 500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            etag = f'"{key[:32]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", "image/svg+xml", {"ETag": etag})
+            else:
+                self._send(200, data, "image/svg+xml", {"ETag": etag, "X-Cache": "HIT" if hit else "MISS"})
+            ok = True
+        finally:
+            self.service.record(time.perf_counter() - t0, ok)
+
+
+def make_server(host="127.0.0.1", port=8765, workers=None, cache_entries=512, cache_bytes=64 * 1024 * 1024):
+    service = RenderService(workers, cache_entries, cache_bytes)
+    handler = type("BoundRenderHandler", (RenderHandler,), {"service": service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    return httpd, service
+
+
+def main():
+    args = sys.argv[1:]
+    opt = lambda name, default: args[args.index(name) + 1] if name in args else default
+    if "--modules" in args:
+        # 通过环境变量传给 worker 进程
+        path = opt("--modules", None)
+        module_registry.load_plugin(path)
+        prev = os.environ.get("YOLO_GRAPH_MODULES")
+        os.environ["YOLO_GRAPH_MODULES"] = os.pathsep.join(filter(None, [prev, path]))
+    workers = opt("--workers", None)
+    httpd, service = make_server(opt("--host", "127.0.0.1"), int(opt("--port", 8765)),
+                                 None if workers is None else int(workers),
+                                 int(opt("--cache-entries", 512)), int(opt("--cache-mb", 64)) * 1024 * 1024)
+    host, port = httpd.server_address[:2]
+    print(f"🚀 Serving on http://{host}:{port} | 👷 {service.workers} workers | POST /render, GET /stats")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        httpd.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
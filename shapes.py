@@ -0,0 +1,359 @@
+"""
+shapes.py - Analytic shape, parameter and FLOPs propagation for every model scale
+
+Works directly on the LayerGraph IR, so no torch model has to be built.
+All per-layer quantities are NumPy arrays over the scale axis (n/s/m/l/x, or
+a single "-" scale when the YAML has no `scales:` block) and every formula is
+evaluated once for all scales.
+
+Counting follows the Ultralytics model summary: parameters include BatchNorm
+weights/biases, FLOPs are 2 x conv MACs at the given image size (attention
+matmuls, pooling and activations are not counted, as in thop).
+"""
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+
+
+# 这些模块的 args[0] 是输出通道, 会被宽度系数缩放
+CHANNEL_MODULES = {
+    "Conv", "DWConv", "GhostConv", "Focus", "ConvTranspose", "Bottleneck",
+    "SPP", "SPPF", "C1", "C2", "C3", "C3x", "C2f", "C3k2", "C2PSA", "C2fPSA",
+    "A2C2f", "ELAN1", "RepNCSPELAN4", "ADown", "AConv", "SPPELAN", "SCDown",
+    "PSA", "C2fCIB", "RepC3",
+}
+# 这些模块把 YAML 的 n 当作内部重复次数 (args.insert(2, n))
+REPEAT_MODULES = {"C1", "C2", "C3", "C3x", "C2f", "C3k2", "C2PSA", "C2fPSA", "A2C2f", "RepC3", "C2fCIB"}
+DETECT_MODULES = {"Detect", "Segment", "Pose", "OBB", "v10Detect"}
+
+
+def make_divisible(x, divisor=8):
+    return (np.ceil(x / divisor) * divisor).astype(np.int64)
+
+
+def _int(x):
+    """逐元素 int() (正数向下取整)"""
+    return np.floor(x).astype(np.int64)
+
+
+class Cost:
+    """按尺度累计的参数量与 FLOPs"""
+    __slots__ = ("params", "flops")
+
+    def __init__(self, num_scales):
+        self.params = np.zeros(num_scales, dtype=np.int64)
+        self.flops = np.zeros(num_scales, dtype=np.float64)
+
+    def conv(self, c1, c2, k, hw, g=1, bn=True, bias=False):
+        """Conv2d (+BN); hw 为输出特征图的像素数"""
+        w = (c1 // g) * c2 * (k * k)
+        self.params += w + (2 * c2 if bn else 0) + (c2 if bias else 0)
+        self.flops += 2.0 * w * hw
+
+    def add(self, other, times=1):
+        self.params += other.params * times
+        self.flops += other.flops * times
+
+
+# ---------------- 基础块 ----------------
+
+def _bottleneck(cost, c1, c2, hw, k=(3, 3), e=1.0, g=1):
+    c_ = _int(c2 * e)
+    cost.conv(c1, c_, k[0], hw)
+    cost.conv(c_, c2, k[1], hw, g)
+
+
+def _rep_bottleneck(cost, c1, c2, hw, e=1.0):
+    c_ = _int(c2 * e)
+    cost.conv(c1, c_, 3, hw); cost.conv(c1, c_, 1, hw)   # RepConv: 3x3 + 1x1 分支
+    cost.conv(c_, c2, 3, hw)
+
+
+def _c3(cost, c1, c2, n, hw, e=0.5, block="c3", k=3):
+    """C3 / C3k / RepCSP"""
+    c_ = _int(c2 * e)
+    cost.conv(c1, c_, 1, hw); cost.conv(c1, c_, 1, hw); cost.conv(2 * c_, c2, 1, hw)
+    blk = Cost(np.size(c_))
+    if block == "rep": _rep_bottleneck(blk, c_, c_, hw)
+    elif block == "c3k": _bottleneck(blk, c_, c_, hw, k=(k, k))
+    else: _bottleneck(blk, c_, c_, hw, k=(1, 3))
+    cost.add(blk, n)
+
+
+def _psa_block(cost, c, hw):
+    """PSABlock(c, attn_ratio=0.5, num_heads=c // 64)"""
+    num_heads = np.maximum(c // 64, 1)
+    head_dim = c // num_heads
+    nh_kd = _int(head_dim * 0.5) * num_heads
+    cost.conv(c, c + 2 * nh_kd, 1, hw)        # qkv
+    cost.conv(c, c, 1, hw)                    # proj
+    cost.conv(c, c, 3, hw, g=c)               # pe (depthwise)
+    cost.conv(c, 2 * c, 1, hw); cost.conv(2 * c, c, 1, hw)   # ffn
+
+
+def _area_block(cost, dim, hw, mlp_ratio):
+    """ABlock(dim, num_heads=dim // 32, mlp_ratio)"""
+    num_heads = dim // 32
+    all_head_dim = (dim // num_heads) * num_heads
+    cost.conv(dim, all_head_dim * 3, 1, hw)   # qkv
+    cost.conv(all_head_dim, dim, 1, hw)       # proj
+    cost.conv(all_head_dim, dim, 7, hw, g=dim)  # pe
+    hidden = _int(dim * mlp_ratio)
+    cost.conv(dim, hidden, 1, hw); cost.conv(hidden, dim, 1, hw)
+
+
+# ---------------- 模块规则: fn(cost, c1, c2, n, args, hw_in, hw_out, ctx) ----------------
+
+def _m_conv(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    k = args[1] if len(args) > 1 and isinstance(args[1], int) else 1
+    g = args[4] if len(args) > 4 and isinstance(args[4], int) else 1
+    cost.conv(c1, c2, k, hw_out, g)
+
+
+def _m_dwconv(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    k = args[1] if len(args) > 1 and isinstance(args[1], int) else 1
+    cost.conv(c1, c2, k, hw_out, g=np.gcd(c1, c2))
+
+
+def _m_aconv(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    cost.conv(c1, c2, 3, hw_out)
+
+
+def _m_adown(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    c = c2 // 2
+    cost.conv(c1 // 2, c, 3, hw_out); cost.conv(c1 // 2, c, 1, hw_out)
+
+
+def _m_c2f(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    e = args[2] if len(args) > 2 and isinstance(args[2], float) else 0.5
+    c = _int(c2 * e)
+    cost.conv(c1, 2 * c, 1, hw_out); cost.conv((2 + n) * c, c2, 1, hw_out)
+    blk = Cost(np.size(c)); _bottleneck(blk, c, c, hw_out)
+    cost.add(blk, n)
+
+
+def _m_c3k2(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    c3k = np.asarray(ctx["c3k"]) | bool(len(args) > 1 and args[1] is True)
+    e = args[2] if len(args) > 2 and isinstance(args[2], float) else 0.5
+    c = _int(c2 * e)
+    cost.conv(c1, 2 * c, 1, hw_out); cost.conv((2 + n) * c, c2, 1, hw_out)
+    plain, deep = Cost(np.size(c)), Cost(np.size(c))
+    _bottleneck(plain, c, c, hw_out, e=0.5)
+    _c3(deep, c, c, 2, hw_out, block="c3k")
+    cost.params += n * np.where(c3k, deep.params, plain.params)
+    cost.flops += n * np.where(c3k, deep.flops, plain.flops)
+
+
+def _m_c3(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    _c3(cost, c1, c2, n, hw_out)
+
+
+def _m_sppf(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    c_ = c1 // 2
+    cost.conv(c1, c_, 1, hw_out); cost.conv(c_ * 4, c2, 1, hw_out)
+
+
+def _m_c2psa(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    c = _int(c1 * 0.5)
+    cost.conv(c1, 2 * c, 1, hw_out); cost.conv(2 * c, c1, 1, hw_out)
+    blk = Cost(np.size(c)); _psa_block(blk, c, hw_out)
+    cost.add(blk, n)
+
+
+def _m_a2c2f(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    a2 = bool(args[1]) if len(args) > 1 else True
+    residual = np.asarray(ctx["a2c2f_residual"])
+    mlp_ratio = np.where(residual, 1.2, 2.0)
+    c_ = _int(c2 * 0.5)
+    cost.conv(c1, c_, 1, hw_out); cost.conv((1 + n) * c_, c2, 1, hw_out)
+    blk = Cost(np.size(c_))
+    if a2:
+        for _ in range(2): _area_block(blk, c_, hw_out, mlp_ratio)
+        cost.params += np.where(residual, c2, 0)   # layer-scale gamma
+    else:
+        _c3(blk, c_, c_, 2, hw_out, block="c3k")
+    cost.add(blk, n)
+
+
+def _m_elan(cost, c1, c2, n, args, hw_in, hw_out, ctx, rep_n=None):
+    c3, c4 = args[1], args[2]
+    rep_n = args[3] if rep_n is None and len(args) > 3 else (rep_n or 1)
+    cost.conv(c1, c3, 1, hw_out)
+    if rep_n is False:   # ELAN1: 普通卷积分支
+        cost.conv(c3 // 2, c4, 3, hw_out); cost.conv(c4, c4, 3, hw_out)
+    else:
+        _c3(cost, c3 // 2, c4, rep_n, hw_out, block="rep"); cost.conv(c4, c4, 3, hw_out)
+        _c3(cost, c4, c4, rep_n, hw_out, block="rep"); cost.conv(c4, c4, 3, hw_out)
+    cost.conv(c3 + 2 * c4, c2, 1, hw_out)
+
+
+def _m_elan1(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    _m_elan(cost, c1, c2, n, args, hw_in, hw_out, ctx, rep_n=False)
+
+
+def _m_sppelan(cost, c1, c2, n, args, hw_in, hw_out, ctx):
+    c3 = args[1]
+    cost.conv(c1, c3, 1, hw_out); cost.conv(4 * c3, c2, 1, hw_out)
+
+
+MODULE_RULES = {
+    "Conv": _m_conv, "DWConv": _m_dwconv, "AConv": _m_aconv, "ADown": _m_adown,
+    "C2f": _m_c2f, "C3k2": _m_c3k2, "C3": _m_c3, "SPPF": _m_sppf, "C2PSA": _m_c2psa,
+    "A2C2f": _m_a2c2f, "ELAN1": _m_elan1, "RepNCSPELAN4": _m_elan, "SPPELAN": _m_sppelan,
+}
+
+
+def _detect(cost, chs, hws, nc, legacy, reg_max=16):
+    c2 = np.maximum(np.maximum(chs[0] // 4, 16), reg_max * 4)
+    c3 = np.maximum(chs[0], min(nc, 100))
+    for x, hw in zip(chs, hws):
+        cost.conv(x, c2, 3, hw); cost.conv(c2, c2, 3, hw)
+        cost.conv(c2, 4 * reg_max, 1, hw, bn=False, bias=True)
+        if legacy:
+            cost.conv(x, c3, 3, hw); cost.conv(c3, c3, 3, hw)
+        else:
+            cost.conv(x, x, 3, hw, g=x); cost.conv(x, c3, 1, hw)
+            cost.conv(c3, c3, 3, hw, g=c3); cost.conv(c3, c3, 1, hw)
+        cost.conv(c3, nc, 1, hw, bn=False, bias=True)
+    cost.params += reg_max   # DFL (不参与训练, 但计入参数量)
+
+
+class ShapeTable:
+    """
+    Per-layer results, arrays shaped (num_layers, num_scales) unless noted:
+        scales     scale names, e.g. ['n', 's', 'm', 'l', 'x']
+        c1, c2     input / output channels
+        repeats    depth-scaled repeat count
+        hw         (num_layers,) output feature-map size in pixels (H, W)
+        params     parameter count
+        flops      FLOPs at imgsz
+        known      (num_layers,) False when no formula exists for the module
+    """
+    __slots__ = ("scales", "imgsz", "c1", "c2", "repeats", "hw", "params", "flops", "known")
+
+    def scale_index(self, scale):
+        return self.scales.index(scale) if scale in self.scales else 0
+
+    def totals(self):
+        return {s: {"params": int(self.params[:, k].sum()), "gflops": float(self.flops[:, k].sum() / 1e9)}
+                for k, s in enumerate(self.scales)}
+
+
+def module_stride(name, args):
+    """模块的空间缩放倍数: >1 下采样, <1 上采样"""
+    if name in ("Conv", "DWConv", "GhostConv", "SCDown", "MaxPool2d"):
+        i = 1 if name == "MaxPool2d" else 2
+        return args[i] if len(args) > i and isinstance(args[i], int) else 1
+    if name in ("AConv", "ADown"):
+        return 2
+    if name == "Upsample":
+        return 1 / args[1] if len(args) > 1 and isinstance(args[1], (int, float)) else 0.5
+    return 1
+
+
+def _base_name(module):
+    return str(module).split(".")[-1]
+
+
+def propagate(graph, imgsz=640):
+    """对 LayerGraph 的所有层一次性计算全部尺度的通道 / 尺寸 / 参数量 / FLOPs"""
+    meta = graph.meta
+    scales = meta.get("scales") or {}
+    if scales:
+        names = list(scales)
+        depth = np.array([float(scales[s][0]) for s in names])
+        width = np.array([float(scales[s][1]) for s in names])
+        max_ch = np.array([float(scales[s][2]) for s in names])
+    else:
+        names = ["-"]
+        depth = np.array([float(meta.get("depth_multiple", 1.0))])
+        width = np.array([float(meta.get("width_multiple", 1.0))])
+        max_ch = np.array([np.inf])
+    nc = meta.get("nc", 80)
+    S = len(names)
+    L = len(graph)
+
+    uses = {_base_name(m) for m in graph.modules}
+    legacy = not ({"C3k2", "A2C2f"} & uses)
+    ctx = {
+        "c3k": np.array([s in ("m", "l", "x") for s in names]),
+        "a2c2f_residual": np.array([s in ("l", "x") for s in names]),
+    }
+
+    table = ShapeTable()
+    table.scales = names
+    table.imgsz = imgsz
+    table.c1 = np.zeros((L, S), dtype=np.int64)
+    table.c2 = np.zeros((L, S), dtype=np.int64)
+    table.repeats = np.zeros((L, S), dtype=np.int64)
+    table.hw = [(0, 0)] * L
+    table.params = np.zeros((L, S), dtype=np.int64)
+    table.flops = np.zeros((L, S), dtype=np.float64)
+    table.known = np.zeros(L, dtype=bool)
+
+    in_ch = np.full(S, 3, dtype=np.int64)
+    for i in range(L):
+        name = _base_name(graph.modules[i])
+        args = graph.args[i]
+        srcs = [s for s in graph.sources(i)]
+        src_c = [table.c2[s] if 0 <= s < i else in_ch for s in srcs]
+        src_hw = [table.hw[s] if 0 <= s < i else (imgsz, imgsz) for s in srcs]
+        c1 = src_c[0] if src_c else in_ch
+        hw_in = src_hw[0] if src_hw else (imgsz, imgsz)
+        st = module_stride(name, args)
+        h = max(1, math.ceil(hw_in[0] / st)); w = max(1, math.ceil(hw_in[1] / st))
+
+        n = graph.repeats[i]
+        n_s = np.maximum(np.round(n * depth), 1).astype(np.int64) if n > 1 else np.full(S, n, dtype=np.int64)
+
+        cost = Cost(S)
+        known = True
+        if name == "Concat":
+            c2 = sum(src_c)
+            h, w = hw_in
+        elif name in DETECT_MODULES:
+            c2 = c1
+            h, w = hw_in
+            _detect(cost, src_c, [hh * ww for hh, ww in src_hw], int(nc), legacy)
+        elif name in CHANNEL_MODULES and args and isinstance(args[0], int):
+            c2 = make_divisible(np.minimum(args[0], max_ch) * width) if args[0] != nc else np.full(S, args[0])
+            rule = MODULE_RULES.get(name)
+            reps = n_s if name in REPEAT_MODULES else np.ones(S, dtype=np.int64)
+            if rule is None: known = False
+            else: rule(cost, c1, c2, reps, args, hw_in[0] * hw_in[1], h * w, ctx)
+        else:
+            c2 = c1
+            known = name in ("Upsample", "MaxPool2d", "Identity")
+
+        table.c1[i] = c1
+        table.c2[i] = c2
+        table.repeats[i] = n_s
+        table.hw[i] = (h, w)
+        table.params[i] = cost.params * (1 if name in REPEAT_MODULES else n_s)
+        table.flops[i] = cost.flops * (1 if name in REPEAT_MODULES else n_s)
+        table.known[i] = known
+    return table
+
+
+def main():
+    import sys
+    import yaml_loader
+    from layer_graph import build_graph, format_count
+
+    if len(sys.argv) < 2:
+        print("Usage: python shapes.py model.yaml [imgsz]")
+        return
+    imgsz = int(sys.argv[2]) if len(sys.argv) > 2 else 640
+    graph = build_graph(yaml_loader.load_model(sys.argv[1]))
+    table = propagate(graph, imgsz)
+    print(f"{'scale':>5} {'params':>12} {'GFLOPs':>8}   @{imgsz}")
+    for s, t in table.totals().items():
+        print(f"{s:>5} {t['params']:>12,} {t['gflops']:>8.1f}")
+    unknown = sorted({graph.labels[i] for i in range(len(graph)) if not table.known[i]})
+    if unknown:
+        print(f"⚠️ No formula for: {', '.join(unknown)} (counted as 0)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import xml.etree.ElementTree as ET
+
+import themes
+import contact_sheet
+from main import DISPLAY_CONFIG
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+
+def test_captions_are_escaped(tmp_path):
+    odd = tmp_path / "v8 & <tiny>.yaml"
+    shutil.copy(os.path.join(EXAMPLES, "yolov8.yaml"), odd)
+    out = tmp_path / "sheet.svg"
+    contact_sheet.render_sheet([str(odd), os.path.join(EXAMPLES, "yolo11.yaml")], str(out),
+                               themes.get_config("paper"), DISPLAY_CONFIG, workers=1)
+    root = ET.parse(out).getroot()
+    captions = [t.text for t in root.iter("{http://www.w3.org/2000/svg}text") if t.text and "layers)" in t.text]
+    assert captions[0].startswith("v8 & <tiny> (") and len(captions) == 2
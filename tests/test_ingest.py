@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import themes
+import ingest
+from main import DISPLAY_CONFIG
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "yolov8.yaml")
+
+
+def _manifest(path):
+    with open(path, encoding='utf-8') as f: return [json.loads(line) for line in f]
+
+
+def test_long_names_are_shortened(tmp_path):
+    with open(EXAMPLE, encoding='utf-8') as f: yaml_text = f.read()
+    archive = tmp_path / "run.jsonl"
+    names = ["x" * 300, "x" * 299 + "y", "模型" * 100]
+    with open(archive, 'w', encoding='utf-8') as f:
+        for name in names:
+            f.write(json.dumps({"name": name, "yaml": yaml_text}) + "\n")
+    out = tmp_path / "out"
+    assert ingest.run_ingest([str(archive)], str(out), themes.get_config("paper"), DISPLAY_CONFIG) == (3, 0)
+    entries = _manifest(out / "manifest.jsonl")
+    members = [e["files"][0] for e in entries]
+    assert len(set(members)) == 3
+    assert all(len(os.path.basename(m).encode("utf-8")) < 255 for m in members)
+    assert all(os.path.exists(out / m) for m in members)
+
+
+def test_write_errors_do_not_stop_the_run(tmp_path, monkeypatch):
+    with open(EXAMPLE, encoding='utf-8') as f: yaml_text = f.read()
+    archive = tmp_path / "run.yaml"
+    archive.write_text("\n---\n".join([yaml_text] * 3), encoding='utf-8')
+    write = ingest.DirSink.write
+
+    def flaky(self, index, member, data):
+        if index == 1: raise OSError(36, "File name too long")
+        write(self, index, member, data)
+
+    monkeypatch.setattr(ingest.DirSink, "write", flaky)
+    out = tmp_path / "out"
+    assert ingest.run_ingest([str(archive)], str(out), themes.get_config("paper"), DISPLAY_CONFIG) == (2, 1)
+    entries = _manifest(out / "manifest.jsonl")
+    assert [("error" in e) for e in entries] == [False, True, False]
+    assert "File name too long" in entries[1]["error"]
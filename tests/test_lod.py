@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import os
+
+import lod
+from main import DISPLAY_CONFIG
+from yolo_graph import load_graph
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "yolo11.yaml")
+
+
+def test_collapsed_nodes_report_layer_count_not_repeats():
+    graph = load_graph(EXAMPLE)
+    stages = lod.find_stages(graph)
+    view = lod.collapse(graph, stages)
+    for k in range(len(stages)):
+        members = stages.members(k)
+        text = view.sub_text(k, DISPLAY_CONFIG)
+        assert view.layer_counts[k] == len(members)
+        if len(members) > 1:
+            assert f"{len(members)} layers" in text
+            assert view.repeats[k] == 1 and "n=" not in text
+        else:
+            assert view.repeats[k] == graph.repeats[members.start]
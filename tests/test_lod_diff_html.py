@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import themes
+import yolo_graph
+from main import DISPLAY_CONFIG
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+
+@pytest.mark.parametrize("mode", ["overview", "groups"])
+def test_lod_html_writes_viewer(tmp_path, mode):
+    out = tmp_path / "lod.html"
+    yolo_graph.render_lod(os.path.join(EXAMPLES, "yolo11.yaml"), [(themes.get_config("paper"), str(out))],
+                          DISPLAY_CONFIG, mode)
+    page = out.read_text(encoding='utf-8')
+    assert page.lstrip().lower().startswith("<!doctype html") and "<canvas" in page
+    assert "<svg" not in page
+
+
+@pytest.mark.parametrize("render", [
+    lambda out: yolo_graph.render_lod(os.path.join(EXAMPLES, "yolo11.yaml"), [(themes.get_config("paper"), out)],
+                                      DISPLAY_CONFIG, "tiles"),
+    lambda out: yolo_graph.render_diff(os.path.join(EXAMPLES, "yolov8.yaml"), os.path.join(EXAMPLES, "yolo11.yaml"),
+                                       [(themes.get_config("paper"), out)], DISPLAY_CONFIG),
+])
+def test_html_rejected_where_viewer_cannot_show_it(tmp_path, render):
+    out = tmp_path / "out.html"
+    with pytest.raises(ValueError, match=r"\.html"):
+        render(str(out))
+    assert not out.exists()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import profiling
+import yolo_graph
+from main import DISPLAY_CONFIG
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "yolo11.yaml")
+
+
+def _text():
+    with open(EXAMPLE, encoding='utf-8') as f: return f.read()
+
+
+def test_concurrent_renders_keep_separate_profiles():
+    text = _text()
+    seen = []
+    hook = profiling.add_hook(lambda p: seen.append((p.counters.get("layers"), p.counters.get("elements"))))
+    barrier = threading.Barrier(4)
+
+    def work():
+        barrier.wait()
+        for _ in range(10):
+            yolo_graph.render_bytes(text, "paper", DISPLAY_CONFIG)
+
+    try:
+        with profiling.profile() as session:
+            threads = [threading.Thread(target=work) for _ in range(4)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+    finally:
+        profiling.remove_hook(hook)
+    assert len(seen) == 40 and len(set(seen)) == 1
+    layers, elements = seen[0]
+    # 会话汇总了所有工作线程中的渲染
+    assert session.counters["layers"] == 40 * layers
+    assert session.counters["elements"] == 40 * elements
+    assert session.calls["render"] == 40
+    assert profiling.active() is profiling.NULL_PROFILE
+
+
+def test_session_collects_main_and_worker_thread_renders():
+    text = _text()
+    with profiling.profile() as session:
+        yolo_graph.render_bytes(text, "paper", DISPLAY_CONFIG)
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(yolo_graph.render_bytes, text, "paper", DISPLAY_CONFIG).result()
+    yolo_graph.render_bytes(text, "paper", DISPLAY_CONFIG)   # 会话结束后的渲染不计入
+    assert session.calls["render"] == 2
+    assert session.counters["layers"] == 48
+    assert all(session.seconds[s] > 0 for s in ("stream", "layout", "render"))
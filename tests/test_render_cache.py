@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+
+import themes
+from main import DISPLAY_CONFIG
+from layer_graph import LayerGraph
+from render_cache import RenderCache
+from yolo_graph import render_themes, graph_from_text
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "yolov8.yaml")
+
+
+def _render(cache, tmp_path, names):
+    config = themes.get_config("paper")
+    targets = [(config, str(tmp_path / n)) for n in names]
+    return render_themes(EXAMPLE, targets, DISPLAY_CONFIG, cache), [t[1] for t in targets]
+
+
+def _read(path):
+    with open(path, 'rb') as f: return f.read()
+
+
+def test_formats_do_not_share_cache_entries(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    hits, first = _render(cache, tmp_path, ["a.svg", "a.json", "a.svgz"])
+    assert hits == [False, False, False]
+
+    hits, second = _render(cache, tmp_path, ["b.json", "b.svg", "b.svgz"])
+    assert hits == [True, True, True]
+    assert _read(second[0]) == _read(first[1])
+    assert _read(second[1]) == _read(first[0])
+    assert _read(second[0]).lstrip().startswith(b"{")
+    assert _read(second[1]).lstrip().startswith(b"<")
+    assert gzip.decompress(_read(second[2])) == _read(first[0])
+
+
+def test_exporter_outputs_do_not_share_cache_entries(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    _, first = _render(cache, tmp_path, ["a.svg", "a.dot", "a.mmd"])
+    hits, second = _render(cache, tmp_path, ["b.mmd", "b.svg", "b.dot"])
+    assert hits == [True, True, True]
+    assert _read(second[0]) == _read(first[2])
+    assert _read(second[1]) == _read(first[0])
+    assert _read(second[2]) == _read(first[1])
+
+
+def test_html_viewer_does_not_share_cache_entries(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    _, first = _render(cache, tmp_path, ["a.html", "a.svg"])
+    hits, second = _render(cache, tmp_path, ["b.svg", "b.html"])
+    assert hits == [True, True]
+    assert _read(second[0]) == _read(first[1])
+    assert _read(second[1]) == _read(first[0])
+    assert b"<canvas" in _read(second[1])
+
+
+def test_graph_round_trip_without_pickle(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    for name in ("yolov8", "yolo11", "yolo12", "yolov9s"):
+        path = EXAMPLE.replace("yolov8", name)
+        with open(path, 'rb') as f: data = f.read()
+        graph = graph_from_text(data)
+        cache.put_graph(cache.graph_key(data), graph)
+        back = cache.get_graph(cache.graph_key(data))
+        for col in LayerGraph.__slots__:
+            assert getattr(back, col) == getattr(graph, col), (name, col)
+
+
+def test_eviction_is_bounded_and_drops_stamps(tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / "cache"), max_entries=100)
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or scan())
+    config = themes.get_config("paper")
+    for k in range(60):
+        yaml_file = tmp_path / f"m{k}.yaml"
+        with open(EXAMPLE, encoding='utf-8') as f: yaml_file.write_text(f.read() + f"\n# {k}\n", encoding='utf-8')
+        render_themes(str(yaml_file), [(config, str(tmp_path / f"m{k}.svg"))], DISPLAY_CONFIG, cache)
+    # 120 次写入 (svg + graph) 只扫描了少数几次
+    assert len(scans) < 10
+    cache.evict()
+    svgs = set(os.listdir(tmp_path / "cache" / "svg"))
+    assert len(svgs) + len(os.listdir(tmp_path / "cache" / "graph")) <= 100
+    for stamp in os.listdir(tmp_path / "cache" / "out"):
+        assert _read(tmp_path / "cache" / "out" / stamp).split(b" ")[0].decode() in svgs
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import server
+from main import DISPLAY_CONFIG
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "yolov8.yaml")
+
+
+def test_inline_render_does_not_hold_the_lock(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    render_text = server.render_text
+
+    def slow(*args):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return render_text(*args)
+
+    monkeypatch.setattr(server, "render_text", slow)
+    service = server.RenderService(workers=0)
+    with open(EXAMPLE, 'rb') as f: yaml_bytes = f.read()
+    results = []
+    run = lambda: results.append(service.render(yaml_bytes, "paper", dict(DISPLAY_CONFIG), {}))
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    threads[0].start()
+    assert started.wait(5)
+    threads[1].start()
+    # 渲染进行中, 统计与记录不被阻塞
+    stats = []
+    probe = threading.Thread(target=lambda: (service.record(0.001), stats.append(service.stats())))
+    probe.start()
+    probe.join(2)
+    blocked = probe.is_alive()
+    release.set()
+    probe.join(5)
+    assert not blocked and stats[0]["requests"] == 1
+    for t in threads: t.join(5)
+    assert len(calls) == 1 and len(results) == 2
+    assert results[0][0] == results[1][0] and results[0][0].startswith(b"<")
@@ -0,0 +1,141 @@
+"""
+text_metrics.py - Text width estimation from precomputed glyph-advance tables
+
+No font files are read at runtime. Each family maps to a table of advance
+widths (1/1000 em) for printable ASCII:
+    sans / serif    the Helvetica and Times core-font metrics, which Arial and
+                    Times New Roman are metric-compatible with (regular + bold)
+    Verdana, Georgia, Osifont   the closest table scaled to the family's
+                    average advance
+    monospace       a single advance (Courier New 600, Consolas 550)
+Measurements are memoised per (text, size, font, bold), so a 10k-layer graph
+with mostly repeated labels costs a dictionary lookup per node.
+"""
+# -*- coding: utf-8 -*-
+import unicodedata
+from functools import lru_cache
+
+# ASCII 32..126 的字宽 (1/1000 em)
+_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584)
+_HELVETICA_BOLD = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584)
+_TIMES = (
+    250, 333, 408, 500, 500, 833, 778, 180, 333, 333, 500, 564, 250, 333, 250, 278,
+    500, 500, 500, 500, 500, 500, 500, 500, 500, 500, 278, 278, 564, 564, 564, 444,
+    921, 722, 667, 667, 722, 611, 556, 722, 722, 333, 389, 722, 611, 889, 722, 722,
+    556, 722, 667, 556, 611, 722, 722, 944, 722, 722, 611, 333, 278, 333, 469, 500,
+    333, 444, 500, 444, 500, 444, 333, 500, 500, 278, 278, 500, 278, 778, 500, 500,
+    500, 500, 333, 389, 278, 500, 500, 722, 500, 500, 444, 480, 200, 480, 541)
+_TIMES_BOLD = (
+    250, 333, 555, 500, 500, 1000, 833, 278, 333, 333, 500, 570, 250, 333, 250, 278,
+    500, 500, 500, 500, 500, 500, 500, 500, 500, 500, 333, 333, 570, 570, 570, 500,
+    930, 722, 667, 722, 722, 667, 611, 778, 778, 389, 500, 778, 667, 944, 722, 778,
+    611, 778, 722, 556, 667, 722, 722, 1000, 722, 722, 667, 333, 278, 333, 581, 500,
+    333, 500, 556, 444, 556, 444, 333, 500, 556, 278, 333, 556, 278, 833, 556, 500,
+    556, 556, 444, 389, 333, 556, 500, 722, 500, 500, 444, 394, 220, 394, 520)
+
+
+def _scaled(table, k):
+    return tuple(round(w * k) for w in table)
+
+
+def _mono(w):
+    return (w,) * 95
+
+
+# 字体族 (小写) -> (常规, 粗体) 字宽表
+FAMILIES = {
+    "arial": (_HELVETICA, _HELVETICA_BOLD),
+    "helvetica": (_HELVETICA, _HELVETICA_BOLD),
+    "sans-serif": (_HELVETICA, _HELVETICA_BOLD),
+    "verdana": (_scaled(_HELVETICA, 1.12), _scaled(_HELVETICA_BOLD, 1.18)),
+    "geneva": (_scaled(_HELVETICA, 1.08), _scaled(_HELVETICA_BOLD, 1.12)),
+    "osifont": (_scaled(_HELVETICA, 0.92), _scaled(_HELVETICA_BOLD, 0.92)),
+    "times new roman": (_TIMES, _TIMES_BOLD),
+    "times": (_TIMES, _TIMES_BOLD),
+    "serif": (_TIMES, _TIMES_BOLD),
+    "georgia": (_scaled(_TIMES, 1.1), _scaled(_TIMES_BOLD, 1.12)),
+    "consolas": (_mono(550), _mono(550)),
+    "courier new": (_mono(600), _mono(600)),
+    "courier": (_mono(600), _mono(600)),
+    "monospace": (_mono(600), _mono(600)),
+}
+
+# 表外常用字符的字宽
+_EXTRA = {"→": 1000, "←": 1000, "…": 1000, "×": 584, "−": 584, "·": 278, "°": 400}
+
+
+@lru_cache(maxsize=64)
+def resolve_family(font):
+    """CSS font-family 列表 -> 第一个有字宽表的字体族; 都不认识时按 sans-serif 处理"""
+    for name in font.split(","):
+        name = name.strip().strip("'\"").lower()
+        if name in FAMILIES:
+            return name
+    return "sans-serif"
+
+
+@lru_cache(maxsize=128)
+def _advances(family, bold):
+    """字符 -> 字宽 的字典 (ASCII + _EXTRA), 未收录的字符在 measure 中按需补上"""
+    table = FAMILIES[family][1 if bold else 0]
+    adv = {chr(32 + k): w for k, w in enumerate(table)}
+    adv.update(_EXTRA)
+    return adv
+
+
+def _char_width(c, adv):
+    # 东亚全角字符占满一个 em, 其余按数字宽度估算
+    w = adv[c] = 1000 if unicodedata.east_asian_width(c) in "WF" else adv["0"]
+    return w
+
+
+@lru_cache(maxsize=65536)
+def measure(text, size, font, bold=False):
+    """text 在 font (CSS font-family 字符串) / size px 下的宽度估算 (px)"""
+    adv = _advances(resolve_family(font), bold)
+    try:
+        total = sum(map(adv.__getitem__, text))
+    except KeyError:
+        total = sum(adv[c] if c in adv else _char_width(c, adv) for c in text)
+    return total * size / 1000
+
+
+# 节点内文字的左右留白 (含 5px 色条与文字右移的 2px)
+NODE_PADDING = 24
+
+
+def node_width(label, sub, font, node_w, step=10):
+    """单个节点所需的宽度 (规则同 node_widths); 放得下时返回 node_w"""
+    need = max(measure(label, 14, font, True), measure(sub, 10, font)) + NODE_PADDING
+    return int(-(-need // step) * step) if need > node_w else node_w
+
+
+def node_widths(graph, config, display_config, subs=None, step=10):
+    """
+    每个节点容纳标题 (14px 粗体) 与副标题 (10px) 所需的宽度, 向上取整到 step 的倍数且不小于 node_w.
+    所有节点都放得下 node_w 时返回 None (布局保持固定宽度, 不同字体的主题可以共用布局).
+    subs: 预先算好的副标题列表 (多个主题共用).
+    """
+    font = config["font"]
+    node_w = config["node_w"]
+    if subs is None:
+        subs = [graph.sub_text(i, display_config) for i in range(len(graph))]
+    widths = None
+    for i, (label, sub) in enumerate(zip(graph.labels, subs)):
+        w = node_width(label, sub, font, node_w, step)
+        if w != node_w:
+            if widths is None: widths = [node_w] * len(graph)
+            widths[i] = w
+    return widths
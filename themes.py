@@ -24,6 +24,18 @@ DEFAULT_LAYOUT = {
     }
 }
 
+# ================= 可选功能 (默认值保持原有输出) =================
+# 主题可以覆盖; main.py 的 --layout / --router / --bundle / --css / --compact / --auto-size 可以开启
+DEFAULT_OPTIONS = {
+    "layout_engine": "lanes",  # lanes (经典三泳道) | layered (分层布局, 适合超深模型)
+    "edge_router": "curves",   # curves (固定曲线) | avoid (曲线穿过节点时绕行) | orthogonal (全部正交折线)
+    "edge_bundling": False,    # True: 同源 / 同目标的连线合并为共用总线 (bundling.py), 减少 <path> 数量
+    "css_classes": False,      # True: 颜色 / 字体写在 <style> 的 class 中, 多主题共用同一份几何 body
+    "compact": False,          # True: 紧凑输出 (<use> 节点模板 + 短 class + 相对路径), 输出名以 .svgz 结尾时 gzip 压缩
+    "precision": 1,            # compact 模式下坐标保留的小数位数
+    "auto_size": False,        # True: 文字放不下 node_w 时按字宽表加宽节点与泳道 (text_metrics.py)
+}
+
 # ================= 主题定义 =================
 
 # 1. 科研黑白灰 (Paper / Academic) - 默认
@@ -247,7 +259,7 @@ THEMES = {
 
 def get_config(theme_name="paper"):
     """合并默认布局和选定主题"""
-    base = DEFAULT_LAYOUT.copy()
+    base = {**DEFAULT_LAYOUT, **DEFAULT_OPTIONS}
     # Default to paper if theme not found
     theme = THEMES.get(theme_name, THEME_PAPER)
 
@@ -0,0 +1,497 @@
+"""
+watch.py - Watch mode: re-render a model YAML incrementally on every save
+
+A WatchSession keeps everything the last render produced in memory: the YAML
+text and the line span of every layer, the raw layer definitions, the
+LayerGraph (channels / strides), and per target the Geometry, the routes and
+the encoded SVG fragment of every node. On a change
+    1. the edited lines are found by comparing the old and new text, mapped
+       to layers through the spans, and only those layers are re-parsed
+    2. edited layers are re-inferred in place (LayerGraph.update_row); a layer
+       whose channels / stride changed queues the next layer and the layers
+       that take it as input (`from`), so propagation stops as soon as the
+       outputs stop changing
+    3. nodes whose label / subtitle changed get a new fragment, and the output
+       file is patched in place (or rewritten from the first changed chunk on)
+Geometry and routes only depend on lanes, `from` indices and node widths, so
+they are reused as long as those stay the same. When an edit changes a node's
+auto-size width, the target is laid out again; if the canvas, lanes and
+drawing order stay the same, only the nodes that moved are redrawn and only
+the edges whose bounding box touches a moved node are routed again (each
+target keeps its router's node grid and a grid of edge boxes for that).
+Anything else (layers added or removed, `from` edits, meta keys, a relayout
+that resizes a lane, edge bundling or compact output with a new node size)
+falls back to a full parse / layout of the affected targets.
+"""
+# -*- coding: utf-8 -*-
+import heapq
+import os
+import textwrap
+import time
+from bisect import bisect_right
+
+import profiling
+import yaml_loader
+from layer_graph import build_graph, build_graph_stream
+from layout import compute_layout, layout_key
+from routing import EdgeRouter, GridIndex, link_endpoints, route_bounds
+from yolo_graph import (annotate_shapes, node_widths, route_graph, _builder_for, _exporter_for, _is_html,
+                        _draw_lanes, _draw_node, _draw_links, _draw_titles)
+
+# 连线包围盒的外扩: 覆盖路由检查时的 margin (8) 与线段判定的 1px
+_ROUTE_PAD = 9
+
+
+class _Target:
+    """
+    一个输出目标的渲染状态:
+        kind    "svg" (原地修补) | "svgz" (修补片段后整体重新压缩) | "html" | "export" (每次整体重写)
+        chunks  编码后的 SVG 片段: [头部 + 背景泳道, 节点 ..., 连线 ..., 标题 + 结尾];
+                routes 为列表时每条连线一个片段, 捆绑时所有连线一个片段
+        slot    slot[i] 为节点 i 在 chunks 中的下标, 连线 e 的片段为 chunks[link_base + e]
+        keep    紧凑输出中首次使用某种尺寸的节点 -> 它带出的模板定义 (重画时保留)
+        router  路由器 (节点网格随重新布局原地更新), edges 为连线包围盒的网格; 都在首次需要时建立
+    """
+    __slots__ = ("config", "out_file", "kind", "svg", "geom", "routes", "widths", "chunks", "slot",
+                 "link_base", "keep", "router", "edges")
+
+    def __init__(self, config, out_file):
+        self.config = config
+        self.out_file = out_file
+        if _exporter_for(out_file) is not None: self.kind = "export"
+        elif _is_html(out_file): self.kind = "html"
+        elif str(out_file).endswith(".svgz"): self.kind = "svgz"
+        else: self.kind = "svg"
+        self.chunks = None
+
+
+def _common_prefix(a, b):
+    """a, b 公共前缀的长度 (二分比较切片, 比较在 C 中完成)"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]: lo = mid
+        else: hi = mid - 1
+    return lo
+
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]: lo = mid
+        else: hi = mid - 1
+    return lo
+
+
+class WatchSession:
+    def __init__(self, yaml_path, targets, display_config):
+        self.yaml_path = yaml_path
+        self.display_config = display_config
+        self.targets = [_Target(config, out_file) for config, out_file in targets]
+        self.text = None
+        self.graph = None
+        self.items = None       # 图顺序的层定义 [from, n, module, args]
+        self.spans = None       # 文件顺序的 (start_line, end_line, graph_idx); 不支持增量时为 None
+        self.starts = None
+        self.consumers = None   # consumers[i]: 以第 i 层为输入的层
+        self.nodes = None       # 每个节点上次输出的 (label, sub, type_id)
+        self.layouts = {}
+        self.width_memo = {}
+
+    def _read(self):
+        with open(self.yaml_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    # ---------- 完整解析 ----------
+    def _parse(self, text):
+        spans = []
+        items = {"backbone": [], "head": []}
+
+        def records():
+            for section, payload in yaml_loader.iter_model(text, spans=spans):
+                if section != "meta": items[section].append(payload)
+                yield section, payload
+
+        try:
+            graph = build_graph_stream(records())
+        except ValueError:
+            self.graph = build_graph(yaml_loader.load_model_text(text))
+            self.items = self.spans = None
+            return
+        self.graph = graph
+        self.items = items["backbone"] + items["head"]
+        counts = {"backbone": 0, "head": 0}
+        base = {"backbone": 0, "head": graph.backbone_len}
+        file_spans = []
+        for section, start, end in spans:
+            file_spans.append((start, end, base[section] + counts[section]))
+            counts[section] += 1
+        # 同一行有多层 (流式写法) 或区间不递增时不做增量
+        if len(self.items) != len(graph) or any(
+                s >= e or (k and s < file_spans[k - 1][1]) for k, (s, e, _) in enumerate(file_spans)):
+            self.spans = None
+        else:
+            self.spans = file_spans
+            self.starts = [s for s, _, _ in file_spans]
+
+    def full(self, text=None):
+        """完整解析 + 所有目标的布局与输出; 返回 ("full", 层数)"""
+        prof = profiling.begin(f"{self.yaml_path} [watch]")
+        try:
+            with prof.stage("stream"):
+                if text is None: text = self._read()
+                self.text = None
+                self._parse(text)
+            graph = self.graph
+            prof.count("layers", len(graph))
+            with prof.stage("shapes"): annotate_shapes(graph, self.display_config)
+            self.consumers = [[] for _ in range(len(graph))]
+            for s, d in zip(graph.edge_src, graph.edge_dst):
+                self.consumers[s].append(d)
+            self.nodes = [self._node_key(i) for i in range(len(graph))]
+            self.layouts = {}
+            self.width_memo = {}
+            for t in self.targets:
+                self._render(prof, t)
+            self.text = text
+            return "full", len(graph)
+        finally:
+            profiling.end(prof)
+
+    def _node_key(self, i):
+        g = self.graph
+        return g.labels[i], g.sub_text(i, self.display_config), g.type_id[i]
+
+    def _render(self, prof, t):
+        """单个目标的完整输出 (布局按 layout_key + 节点宽度共用), 并记录每个节点 / 连线的片段"""
+        graph, config, dc = self.graph, t.config, self.display_config
+        if t.kind == "export":
+            with prof.stage("export"):
+                with open(t.out_file, 'w', encoding='utf-8') as f: _exporter_for(t.out_file)(graph, f, config, dc)
+            return
+        if "subs" not in self.width_memo: self.width_memo["subs"] = [key[1] for key in self.nodes]
+        with prof.stage("layout"): t.widths = node_widths(graph, config, dc, self.width_memo)
+        lk = (layout_key(config), t.widths and tuple(t.widths))
+        t.router = t.edges = None
+        if lk not in self.layouts:
+            with prof.stage("layout"): geom = compute_layout(graph, config, t.widths)
+            if config.get("edge_bundling"):
+                routes = route_graph(graph, geom, config, prof)
+            else:
+                # 与 route_graph 相同, 但保留路由器供之后的增量重新路由
+                with prof.stage("route"):
+                    t.router = EdgeRouter(graph, geom, config.get("edge_router", "curves"))
+                    routes = list(t.router.route())
+            self.layouts[lk] = geom, routes
+        t.geom, t.routes = geom, routes = self.layouts[lk]
+        if t.kind == "html":
+            import html_viewer
+            with prof.stage("render"):
+                with open(t.out_file, 'w', encoding='utf-8') as f:
+                    html_viewer.write_html(graph, geom, routes, config, dc, f, os.path.basename(self.yaml_path))
+            return
+        with prof.stage("render"):
+            svg = t.svg = _builder_for(config)(config)
+            parts = []
+            svg._write = parts.append
+            svg.begin(geom.width, geom.height)
+            _draw_lanes(svg, geom)
+            chunks = ["".join(parts)]
+            slot = [0] * len(graph)
+            keep = {}
+            templates = getattr(svg, "_templates", None)
+            for i in geom.order:
+                parts.clear()
+                if templates is not None:
+                    known = len(templates)
+                    _draw_node(svg, graph, geom, i, dc)
+                    if len(templates) > known: keep[i] = parts[0].encode("utf-8")
+                else:
+                    _draw_node(svg, graph, geom, i, dc)
+                slot[i] = len(chunks)
+                chunks.append("".join(parts))
+            t.link_base = len(chunks)
+            if isinstance(routes, list):
+                for route in routes:
+                    parts.clear()
+                    svg.add_link(*route)
+                    chunks.append("".join(parts))
+            else:
+                parts.clear()
+                _draw_links(svg, routes)
+                chunks.append("".join(parts))
+            parts.clear()
+            _draw_titles(svg, geom)
+            svg.end()
+            chunks.append("".join(parts))
+            t.chunks = [c.encode("utf-8") for c in chunks]
+            t.slot = slot
+            t.keep = keep
+            self._write(t)
+        prof.count("elements", svg.elements)
+
+    def _write(self, t):
+        if t.kind == "svgz":
+            import gzip
+            with gzip.open(t.out_file, 'wb', compresslevel=9) as f: f.write(b"".join(t.chunks))
+        else:
+            with open(t.out_file, 'wb') as f: f.write(b"".join(t.chunks))
+
+    # ---------- 增量更新 ----------
+    def _changed_layers(self, text):
+        """改动只落在层定义内且行数不变时, 返回 {graph_idx: 新的层定义}; 否则 None"""
+        old = self.text
+        if self.spans is None or old.count("\n") != text.count("\n"):
+            return None
+        p = _common_prefix(old, text)
+        s = _common_suffix(old, text, min(len(old), len(text)) - p)
+        first = old.count("\n", 0, p)
+        last = max(old.count("\n", 0, max(p, len(old) - s - 1)), text.count("\n", 0, max(p, len(text) - s - 1)))
+        spans, starts = self.spans, self.starts
+        a = bisect_right(starts, first) - 1
+        if a < 0 or spans[a][1] <= first:
+            return None
+        b = a
+        while spans[b][1] <= last:
+            if b + 1 == len(spans) or spans[b + 1][0] != spans[b][1]: return None
+            b += 1
+        # 区间 [spans[a].start, spans[b].end) 的新文本; 行号在改动区之外不变
+        lo = text.rfind("\n", 0, p) + 1
+        for _ in range(first - spans[a][0]): lo = text.rfind("\n", 0, lo - 1) + 1
+        hi = lo
+        for _ in range(spans[b][1] - spans[a][0]):
+            hi = text.find("\n", hi) + 1
+            if hi == 0: hi = len(text); break
+        try:
+            items = yaml_loader.safe_load(textwrap.dedent(text[lo:hi]))
+        except Exception:
+            return None
+        if not isinstance(items, list) or len(items) != b - a + 1:
+            return None
+        changed = {}
+        for (_, _, i), item in zip(spans[a:b + 1], items):
+            if not (isinstance(item, list) and len(item) == 4): return None
+            if item != self.items[i]: changed[i] = item
+        return changed
+
+    def _reinfer(self, changed):
+        """重新推断改动的层及其下游 (输出不变即停止传播); 返回重新推断的层, 图结构改变时返回 None"""
+        g = self.graph
+        queue = list(changed)
+        heapq.heapify(queue)
+        queued = set(queue)
+        touched = []
+        while queue:
+            i = heapq.heappop(queue)
+            before = g.c2[i], g.stride[i]
+            item = changed.get(i, self.items[i])
+            if not g.update_row(i, item):
+                return None
+            self.items[i] = item
+            touched.append(i)
+            if (g.c2[i], g.stride[i]) != before:
+                for j in [i + 1] + self.consumers[i]:
+                    if j < len(g) and j not in queued:
+                        queued.add(j)
+                        heapq.heappush(queue, j)
+        return touched
+
+    def update(self):
+        """
+        文件改动后调用: 返回 (mode, 重新推断的层数), mode 为 "incremental" | "full";
+        内容未变化时返回 None.
+        """
+        text = self._read()
+        if text == self.text:
+            return None
+        if self.text is None:
+            return self.full(text)
+        prof = profiling.begin(f"{self.yaml_path} [watch]")
+        try:
+            with prof.stage("stream"): changed = self._changed_layers(text)
+            if changed is None:
+                profiling.end(prof); prof = profiling.NULL_PROFILE
+                return self.full(text)
+            self.text = None   # 中途出错时下一次改动做完整解析
+            with prof.stage("build"): touched = self._reinfer(changed)
+            if touched is None:
+                profiling.end(prof); prof = profiling.NULL_PROFILE
+                return self.full(text)
+            graph = self.graph
+            if graph.shapes is not None:
+                with prof.stage("shapes"):
+                    graph.shapes = None
+                    annotate_shapes(graph, self.display_config)
+                touched = range(len(graph))
+            redraw = []
+            for i in touched:
+                key = self._node_key(i)
+                if key != self.nodes[i]:
+                    self.nodes[i] = key
+                    redraw.append(i)
+            prof.count("layers", len(touched))
+            prof.count("nodes", len(redraw))
+            self.width_memo = {}
+            self.layouts = {}
+            for t in self.targets:
+                self._patch(prof, t, touched, redraw)
+            self.text = text
+            return "incremental", len(touched)
+        finally:
+            profiling.end(prof)
+
+    def _patch(self, prof, t, touched, redraw):
+        if t.kind == "export":
+            if touched: self._render(prof, t)
+            return
+        if not redraw:
+            return
+        if t.kind == "html":
+            self._render(prof, t)
+            return
+        graph, config = self.graph, t.config
+        redraw = set(redraw)
+        links = ()
+        if config.get("auto_size"):
+            import text_metrics
+            font, node_w = config["font"], config["node_w"]
+            widths = list(t.widths) if t.widths else [node_w] * len(graph)
+            for i in redraw:
+                label, sub, _ = self.nodes[i]
+                widths[i] = text_metrics.node_width(label, sub, font, node_w)
+            if widths != (t.widths or [node_w] * len(graph)):
+                # 节点宽度改变: 重新布局这个目标, 画布或泳道改变时整体重画
+                moved_links = self._relayout(prof, t, widths if any(w != node_w for w in widths) else None)
+                if moved_links is None:
+                    self._render(prof, t)
+                    return
+                moved, links = moved_links
+                redraw.update(moved)
+        with prof.stage("render"):
+            svg, chunks, geom = t.svg, t.chunks, t.geom
+            parts = []
+            svg._write = parts.append
+            slots = []
+            same_size = True
+            for i in redraw:
+                parts.clear()
+                _draw_node(svg, graph, geom, i, self.display_config)
+                slots.append(t.slot[i])
+                same_size = self._put(chunks, slots[-1], t.keep.get(i, b"") + "".join(parts).encode("utf-8")) and same_size
+            for e in links:
+                parts.clear()
+                svg.add_link(*t.routes[e])
+                slots.append(t.link_base + e)
+                same_size = self._put(chunks, slots[-1], "".join(parts).encode("utf-8")) and same_size
+            slots.sort()
+            if t.kind == "svgz":
+                self._write(t)
+            else:
+                with open(t.out_file, 'r+b') as f:
+                    if same_size:
+                        # 片段长度不变: 逐个原地覆盖
+                        off, pos = 0, 0
+                        for k in slots:
+                            off += sum(map(len, chunks[pos:k]))
+                            f.seek(off)
+                            f.write(chunks[k])
+                            off += len(chunks[k])
+                            pos = k + 1
+                    else:
+                        f.seek(sum(map(len, chunks[:slots[0]])))
+                        f.write(b"".join(chunks[slots[0]:]))
+                        f.truncate()
+        prof.count("files")
+
+    @staticmethod
+    def _put(chunks, k, frag):
+        """替换片段, 返回长度是否不变"""
+        same = len(frag) == len(chunks[k])
+        chunks[k] = frag
+        return same
+
+    def _relayout(self, prof, t, widths):
+        """
+        按新的节点宽度重新布局 t; 只重新路由包围盒碰到移动节点的连线.
+        返回 (移动的节点, 路由改变的连线); 需要整体重画时返回 None.
+        """
+        graph, config, old = self.graph, t.config, t.geom
+        if not isinstance(t.routes, list) or hasattr(t.svg, "_templates"):
+            return None   # 捆绑是全局的; 紧凑输出的节点模板按首次出现的尺寸编号
+        with prof.stage("layout"):
+            geom = compute_layout(graph, config, widths)
+            if (geom.width, geom.height, geom.lane_bounds, geom.order, geom.neck_col) != (
+                    old.width, old.height, old.lane_bounds, old.order, old.neck_col):
+                return None
+            moved = [i for i in range(len(graph)) if old.x[i] != geom.x[i] or old.y[i] != geom.y[i]
+                     or old.w[i] != geom.w[i] or old.h[i] != geom.h[i]]
+            if len(moved) * 4 > len(graph):
+                return None
+        with prof.stage("route"):
+            router = t.router
+            if router is None:
+                router = t.router = EdgeRouter(graph, old, config.get("edge_router", "curves"))
+            edges = t.edges
+            if edges is None:
+                edges = t.edges = GridIndex(256)
+                for e, route in enumerate(t.routes):
+                    x0, y0, x1, y1 = route_bounds(route, _ROUTE_PAD)
+                    edges.insert(e, (x0, y0, x1 - x0, y1 - y0))
+            hit = set()
+            for i in moved:
+                for x, y, w, h in (old.rect(i), geom.rect(i)):
+                    hit |= edges.query(x, y, x + w, y + h)
+                if router.index is not None:
+                    router.index.remove(i)
+                    router.index.insert(i, geom.rect(i))
+            router.geom = geom
+            routes = list(t.routes)
+            src, dst = graph.edge_src, graph.edge_dst
+            links = []
+            for e in sorted(hit):
+                s, d = src[e], dst[e]
+                route = router.route_edge(link_endpoints(graph, geom, s, d), s, d)
+                if route != routes[e]:
+                    routes[e] = route
+                    x0, y0, x1, y1 = route_bounds(route, _ROUTE_PAD)
+                    edges.remove(e)
+                    edges.insert(e, (x0, y0, x1 - x0, y1 - y0))
+                    links.append(e)
+            prof.count("rerouted", len(hit))
+        t.geom, t.routes, t.widths = geom, routes, widths
+        return moved, links
+
+
+def watch(yaml_path, targets, display_config, interval=0.2, on_update=None):
+    """
+    轮询 yaml_path 的修改时间, 每次改动后增量更新所有 targets, 直到 Ctrl+C.
+    on_update(mode, layers, seconds) 在首次渲染和每次更新后调用;
+    YAML 暂时无法解析 (编辑到一半) 时打印错误并继续监视.
+    """
+    session = WatchSession(yaml_path, targets, display_config)
+    t0 = time.perf_counter()
+    mode, layers = session.full()
+    if on_update: on_update(mode, layers, time.perf_counter() - t0)
+    last = os.stat(yaml_path).st_mtime_ns
+    try:
+        while True:
+            time.sleep(interval)
+            try:
+                mtime = os.stat(yaml_path).st_mtime_ns
+            except FileNotFoundError:
+                continue  # 编辑器保存时可能先删除再重建文件
+            if mtime == last:
+                continue
+            last = mtime
+            t0 = time.perf_counter()
+            try:
+                result = session.update()
+            except Exception as e:
+                print(f"❌ {type(e).__name__}: {e}")
+                continue
+            if result is not None and on_update:
+                on_update(*result, time.perf_counter() - t0)
+    except KeyboardInterrupt:
+        pass
+    return session
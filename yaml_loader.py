@@ -0,0 +1,176 @@
+"""
+yaml_loader.py - Fast loading of model YAMLs
+
+PyYAML is imported on first use. The libyaml-backed CSafeLoader is used when
+PyYAML was built with it, with a clean fallback to the pure-Python SafeLoader.
+Model files are first cut down to the top-level keys the graph actually reads
+(backbone / head / scales / nc / multiples) with comments dropped, so long
+headers and unrelated keys (training hyper-parameters, docs) are never scanned.
+Anything unusual at the top level falls back to parsing the whole document.
+"""
+# -*- coding: utf-8 -*-
+import re
+import sys
+
+# build_graph 用到的顶层键 (与 layer_graph.META_KEYS 一致, 外加 backbone / head)
+MODEL_KEYS = ("backbone", "head", "nc", "scales", "depth_multiple", "width_multiple")
+
+_TOP_KEY = re.compile(r"([A-Za-z_][\w.-]*)[ \t]*:(?:[ \t]|$)")
+
+_loader = None
+
+
+def safe_loader():
+    """CSafeLoader (libyaml) 可用时优先使用, 否则退回纯 Python 的 SafeLoader"""
+    global _loader
+    if _loader is None:
+        import yaml
+        _loader = getattr(yaml, "CSafeLoader", None) or yaml.SafeLoader
+    return _loader
+
+
+def safe_load(stream):
+    import yaml
+    return yaml.load(stream, Loader=safe_loader())
+
+
+def is_yaml_error(e):
+    """e 是否为 PyYAML 的解析错误; PyYAML 尚未导入时不可能是, 也不会为此导入"""
+    yaml = sys.modules.get("yaml")
+    return yaml is not None and isinstance(e, yaml.YAMLError)
+
+
+def select_keys(text, keys=MODEL_KEYS):
+    """
+    按顶层键切分文本, 只保留 keys 中的键及其缩进子块, 丢弃空行和整行注释.
+    顶层出现无法识别的行 (文档标记、流式映射、续行等) 时返回 None, 由调用方完整解析.
+    """
+    out = []
+    keep = False
+    for line in text.splitlines(True):
+        s = line.lstrip()
+        if not s or s[0] == "#":
+            continue
+        if line[0] in " \t" or s[0] == "-" and s[1:2] in (" ", "\n", "\r", ""):
+            if keep: out.append(line)
+            continue
+        m = _TOP_KEY.match(line)
+        if m is None:
+            return None
+        keep = m.group(1) in keys
+        if keep: out.append(line)
+    return "".join(out)
+
+
+def load_model_text(text, keys=MODEL_KEYS):
+    """模型 YAML 文本 (str / bytes) -> dict, 只包含 keys 中的顶层键"""
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    part = select_keys(text, keys)
+    if part is not None:
+        try:
+            d = safe_load(part)
+            if d is None or isinstance(d, dict):
+                return d or {}
+        except Exception:
+            pass  # 例如锚点定义在被跳过的键里, 退回完整解析
+    d = safe_load(text) or {}
+    return {k: v for k, v in d.items() if k in keys} if isinstance(d, dict) else d
+
+
+def load_model(path, keys=MODEL_KEYS):
+    with open(path, 'r', encoding='utf-8') as f:
+        return load_model_text(f.read(), keys)
+
+
+# ---------------- 流式 (事件) 解析 ----------------
+
+def _skip_node(loader):
+    """丢弃一个完整节点的事件, 不构造任何对象"""
+    import yaml
+    depth = 0
+    while True:
+        ev = loader.get_event()
+        if isinstance(ev, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+            depth += 1
+        elif isinstance(ev, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+            depth -= 1
+        if depth == 0:
+            return
+
+
+def _build_node(loader, anchors):
+    """从事件流构造一个节点 (标量 / 列表 / 映射); 标量直接调用 SafeConstructor, 不缓存节点"""
+    import yaml
+    ev = loader.get_event()
+    if isinstance(ev, yaml.AliasEvent):
+        if ev.anchor not in anchors:
+            raise ValueError(f"Alias *{ev.anchor} refers to an anchor nested inside a skipped key")
+        return anchors[ev.anchor]
+    if isinstance(ev, yaml.ScalarEvent):
+        tag = ev.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.ScalarNode, ev.value, ev.implicit)
+        ctor = loader.yaml_constructors.get(tag) or loader.yaml_constructors[None]
+        value = ctor(loader, yaml.ScalarNode(tag, ev.value, ev.start_mark, ev.end_mark, ev.style))
+    elif isinstance(ev, yaml.SequenceStartEvent):
+        value = []
+        if ev.anchor: anchors[ev.anchor] = value
+        while not loader.check_event(yaml.SequenceEndEvent):
+            value.append(_build_node(loader, anchors))
+        loader.get_event()
+        return value
+    elif isinstance(ev, yaml.MappingStartEvent):
+        value = {}
+        if ev.anchor: anchors[ev.anchor] = value
+        while not loader.check_event(yaml.MappingEndEvent):
+            k = _build_node(loader, anchors)
+            value[k] = _build_node(loader, anchors)
+        loader.get_event()
+        return value
+    else:
+        raise ValueError(f"Unexpected YAML event {type(ev).__name__}")
+    if ev.anchor: anchors[ev.anchor] = value
+    return value
+
+
+def iter_model(stream, keys=MODEL_KEYS, spans=None):
+    """
+    基于 PyYAML 事件 API 的流式读取: 逐条产出 ("backbone" | "head", layer) 以及 ("meta", (key, value)).
+    stream 可以是文件对象 (按块读取) 或字符串; 整个文档从不完整构造, 不需要的顶层键只跳过事件.
+    layer 为 [from, n, module, args] 列表, 产出后即可丢弃.
+    spans: 可选列表, 按文件顺序追加每层所在的行区间 (section, start_line, end_line),
+    end_line 为下一个节点的起始行 (层后的注释行计入该层).
+    """
+    import yaml
+    loader = safe_loader()(stream)
+    anchors = {}
+    try:
+        loader.get_event()  # StreamStart
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()  # DocumentStart
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise ValueError("Model YAML must be a mapping at the top level")
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _build_node(loader, anchors)
+            if key in ("backbone", "head") and loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    if spans is None:
+                        yield key, _build_node(loader, anchors)
+                        continue
+                    start = loader.peek_event().start_mark.line
+                    layer = _build_node(loader, anchors)
+                    spans.append((key, start, loader.peek_event().start_mark.line))
+                    yield key, layer
+                loader.get_event()
+            elif key in keys:
+                yield "meta", (key, _build_node(loader, anchors))
+            elif getattr(loader.peek_event(), "anchor", None):
+                _build_node(loader, anchors)  # 带锚点的值可能被后面的层引用
+            else:
+                _skip_node(loader)
+    finally:
+        loader.dispose()
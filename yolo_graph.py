@@ -2,15 +2,42 @@
 yolo_graph.py - Core logic for parsing YAML and generating SVG
 """
 # -*- coding: utf-8 -*-
-import yaml
-import math
-import xml.sax.saxutils
+import io
+import os
+from contextlib import contextmanager
+
+from layer_graph import (build_graph, build_graph_stream, TYPE_NAMES, TYPE_CONCAT,
+                         LANE_BACKBONE, LANE_NECK, LANE_HEAD)
+from layout import compute_layout, layout_key
+from routing import route_edges, curve_controls
+import profiling
+import yaml_loader
+
+
 class SVGBuilder:
-    def __init__(self, config):
+    """
+    流式 SVG 写出器: 元素按调用顺序直接写入 out (任意带 write() 的对象),
+    内存占用不随层数增长. 调用方负责 z 序: begin -> 背景 -> 节点 -> 连线 -> 标题 -> end.
+    未传 out 时写入内存缓冲区, 可用 generate() 取回整个文档.
+    """
+    def __init__(self, config, out=None):
         self.config = config
-        self.elements = []
+        self.out = out if out is not None else io.StringIO()
+        self._write = self.out.write
+        self._sep = ""
+        self.elements = 0
         self.width = 0
         self.height = 0
+        self.id_prefix = ""     # 多个模型写入同一文档时 (contact_sheet.py) 区分各自的 clipPath id
+
+    def _emit(self, element):
+        self._write(self._sep + element)
+        self._sep = "\n"
+        self.elements += 1
+
+    def paint(self, group, key):
+        """颜色查找: group 为 colors / type_colors; CSSBuilder 中返回 class 名"""
+        return self.config[group].get(key)
 
     def get_defs(self):
         grads = self.config["gradients"]
@@ -64,36 +91,44 @@ class SVGBuilder:
         stroke_w = "1.5" if is_concat else "1.0"
         
         # 1. 主体矩形
-        self.elements.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{self.config["radius"]}" fill="{fill_attr}" stroke="{self.config["colors"]["stroke"]}" stroke-width="{stroke_w}" {filter_attr}/>')
+        self._emit(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{self.config["radius"]}" fill="{fill_attr}" stroke="{self.config["colors"]["stroke"]}" stroke-width="{stroke_w}" {filter_attr}/>')
         
         # 2. 色条 (Type Strip) - 4px 宽
         if type_color:
             strip_w = 5
             # 使用 clipPath 确保色条贴合左侧圆角
-            clip_id = f"clip_{int(x)}_{int(y)}"
-            self.elements.append(f'<clipPath id="{clip_id}"><rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{self.config["radius"]}" /></clipPath>')
+            clip_id = f"clip_{self.id_prefix}{int(x)}_{int(y)}"
+            self._emit(f'<clipPath id="{clip_id}"><rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{self.config["radius"]}" /></clipPath>')
             
             # 绘制色条，使用 clipPath 裁切多余部分
-            self.elements.append(f'<rect x="{x}" y="{y}" width="{strip_w}" height="{h}" fill="{type_color}" clip-path="url(#{clip_id})" />')
+            self._emit(f'<rect x="{x}" y="{y}" width="{strip_w}" height="{h}" fill="{type_color}" clip-path="url(#{clip_id})" />')
 
         cx, cy = x + w/2, y + h/2
         # 文字稍微右移避开色条
         text_offset = 2
         
-        self.elements.append(f'<text x="{cx+text_offset}" y="{cy-8}" font-weight="bold" font-size="14" fill="{self.config["colors"]["text_main"]}" text-anchor="middle" dominant-baseline="middle">{label}</text>')
-        self.elements.append(f'<text x="{cx+text_offset}" y="{cy+11}" font-size="10" fill="{self.config["colors"]["text_sub"]}" text-anchor="middle" dominant-baseline="middle">{sub}</text>')
+        self._emit(f'<text x="{cx+text_offset}" y="{cy-8}" font-weight="bold" font-size="14" fill="{self.config["colors"]["text_main"]}" text-anchor="middle" dominant-baseline="middle">{label}</text>')
+        self._emit(f'<text x="{cx+text_offset}" y="{cy+11}" font-size="10" fill="{self.config["colors"]["text_sub"]}" text-anchor="middle" dominant-baseline="middle">{sub}</text>')
         return {"L": (x, cy), "R": (x+w, cy), "T": (cx, y), "B": (cx, y+h), "rect": (x, y, w, h)}
 
-    def add_bg_lane(self, x, w, h, label, color):
-        self.elements.insert(0, f'<rect x="{x}" y="30" width="{w}" height="{h-30}" fill="{color}" />')
-        self.elements.append(f'<text x="{x+w/2}" y="55" font-weight="bold" font-size="18" fill="{self.config["colors"]["text_main"]}" text-anchor="middle" letter-spacing="1">{label}</text>')
-        self.elements.append(f'<line x1="{x+20}" y1="65" x2="{x+w-20}" y2="65" stroke="#90A4AE" stroke-width="1"/>')
+    def begin(self, width, height):
+        self.width = width; self.height = height
+        self._write(self.get_header())
 
-    def add_link(self, p1, p2, dashed=False, routing_type="standard"):
+    def add_bg_lane(self, x, w, h, color):
+        self._emit(f'<rect x="{x}" y="30" width="{w}" height="{h-30}" fill="{color}" />')
+
+    def add_lane_title(self, x, w, label):
+        self._emit(f'<text x="{x+w/2}" y="55" font-weight="bold" font-size="18" fill="{self.config["colors"]["text_main"]}" text-anchor="middle" letter-spacing="1">{label}</text>')
+        self._emit(f'<line x1="{x+20}" y1="65" x2="{x+w-20}" y2="65" stroke="#90A4AE" stroke-width="1"/>')
+
+    def link_path(self, p1, p2, routing_type="standard", via=None):
         x1, y1 = p1; x2, y2 = p2
         path = ""
         
-        if routing_type == "vertical_straight":
+        if routing_type == "orthogonal" and via:
+            path = f"M {x1} {y1} " + " ".join(f"L {x} {y}" for x, y in via) + f" L {x2} {y2}"
+        elif routing_type == "vertical_straight":
             path = f"M {x1} {y1} L {x2} {y2}"
         elif routing_type == "manhattan":
             mid_x = (x1 + x2) / 2
@@ -108,215 +143,817 @@ class SVGBuilder:
             cp1_x = x1 + dist_x * 0.5; cp1_y = y1
             cp2_x = x2 - dist_x * 0.5; cp2_y = y2
             path = f"M {x1} {y1} C {cp1_x} {cp1_y}, {cp2_x} {cp2_y}, {x2} {y2}"
+        return path
 
+    def add_link(self, p1, p2, dashed=False, routing_type="standard", via=None):
+        path = self.link_path(p1, p2, routing_type, via)
         dash_attr = 'stroke-dasharray="5,3"' if dashed else ''
-        self.elements.append(f'<path d="{path}" stroke="{self.config["colors"]["line"]}" stroke-width="1.2" fill="none" {dash_attr} marker-end="url(#arrow)" />')
+        self._emit(f'<path d="{path}" stroke="{self.config["colors"]["line"]}" stroke-width="1.2" fill="none" {dash_attr} marker-end="url(#arrow)" />')
+
+    def bundle_path(self, lines):
+        return " ".join(f"M {x0} {y0} " + " ".join(f"L {x} {y}" for x, y in rest) for (x0, y0), *rest in lines)
+
+    def arrows_path(self, tips):
+        # 与 #arrow marker 相同的三角形 (stroke-width 1.2 缩放), 尖端超出终点 1.2; (dx, dy) 为单位朝向
+        return " ".join(f"M {x-6*dx+3.6*dy} {y-6*dy-3.6*dx} L {x+1.2*dx} {y+1.2*dy} L {x-6*dx-3.6*dy} {y-6*dy+3.6*dx} z"
+                        for x, y, dx, dy in tips)
+
+    def add_bundle(self, lines, dashed=False):
+        """一组捆绑连线 (多段折线) 输出为一个 <path>, 不带箭头"""
+        dash_attr = 'stroke-dasharray="5,3"' if dashed else ''
+        self._emit(f'<path d="{self.bundle_path(lines)}" stroke="{self.config["colors"]["line"]}" stroke-width="1.2" fill="none" {dash_attr} />')
+
+    def add_arrows(self, tips):
+        """所有捆绑连线的箭头合并为一个 <path>; tips: [(x, y, dx, dy), ...]"""
+        self._emit(f'<path d="{self.arrows_path(tips)}" fill="{self.config["colors"]["line"]}" />')
+
+    def end(self):
+        self._write("</svg>")
 
     def generate(self):
-        return self.get_header() + "\n".join(self.elements) + "</svg>"
-
-
-def parse_and_layout(yaml_path, out_file, config, display_config):
-    with open(yaml_path, 'r') as f: d = yaml.safe_load(f)
-    full_seq = d.get('backbone', []) + d.get('head', [])
-    backbone_len = len(d.get('backbone', []))
-    
-    layers = []
-    # 记录每一层的 output_channels，用于 Concat 回溯
-    # 格式: idx -> channels
-    layer_channels = {}
-    
-    # 初始通道
-    ch = [3]
-    curr_stride = 1
-    
-    for i, item in enumerate(full_seq):
-        f_idx, n, m, args = item
-        args = args or []
-        m_str = str(m)
-        from_idxs = [f_idx] if isinstance(f_idx, int) else list(f_idx)
-        abs_from = [(src if src >= 0 else i + src) for src in from_idxs]
-        
-        c1 = ch[-1]
-        
-        label = m_str.replace("nn.modules.", "").replace("ularytics.", "").replace("C2f", "C2f")
-        if 'Conv' in label: label = "Conv"
-        
-        # --- 修复 Concat 通道数 ---
-        if 'Concat' in label:
-            # Concat 的输出通道数 = 所有输入源的通道数之和
-            c2 = 0
-            for src_idx in abs_from:
-                # 尝试从已记录的 layers 中获取
-                if src_idx in layer_channels:
-                    c2 += layer_channels[src_idx]
-                else:
-                    # 如果找不到（比如来自 Input），假设 c1 (不太可能)
-                    c2 += c1 
+        return self.out.getvalue()
+
+
+class CSSBuilder(SVGBuilder):
+    """
+    主题无关的 SVG 写出器: 元素只带几何属性和 class, 颜色 / 描边 / 字号都放在 <style> 中.
+    同一布局的 body 只生成一次, 每个主题只换一段样式表和 <defs> (见 render_themes).
+    body 只依赖 config["radius"].
+    """
+    def paint(self, group, key):
+        return key
+
+    def stylesheet(self):
+        c = self.config["colors"]
+        rules = [
+            f'text {{ font-family: "{self.config["font"]}"; }}',
+            f'.bg_backbone {{ fill: {c["bg_backbone"]}; }} .bg_neck {{ fill: {c["bg_neck"]}; }} .bg_head {{ fill: {c["bg_head"]}; }}',
+            f'.n {{ stroke: {c["stroke"]}; stroke-width: 1.0; filter: url(#shadow); }} .n.cat {{ stroke-width: 1.5; }}',
+        ]
+        rules.append(" ".join(f'.{g} {{ fill: url(#{g}); }}' for g in ("grad_bb", "grad_neck", "grad_head", "grad_concat", "grad_node")))
+        type_colors = self.config["type_colors"]
+        rules.append(" ".join(f'.t_{t} {{ fill: {type_colors[t]}; }}' if t in type_colors else f'.t_{t} {{ display: none; }}'
+                              for t in TYPE_NAMES))
+        rules += [
+            '.l, .d, .lt { text-anchor: middle; }',
+            f'.l {{ font-weight: bold; font-size: 14px; fill: {c["text_main"]}; dominant-baseline: middle; }}',
+            f'.d {{ font-size: 10px; fill: {c["text_sub"]}; dominant-baseline: middle; }}',
+            f'.lt {{ font-weight: bold; font-size: 18px; fill: {c["text_main"]}; letter-spacing: 1px; }}',
+            '.ll { stroke: #90A4AE; stroke-width: 1; }',
+            f'.e {{ stroke: {c["line"]}; stroke-width: 1.2; fill: none; marker-end: url(#arrow); }} .e.dash {{ stroke-dasharray: 5,3; }}',
+        ]
+        if self.config.get("edge_bundling"):
+            rules.append(f'.e.b {{ marker-end: none; }} .ah {{ fill: {c["line"]}; }}')
+        return "\n            ".join(rules)
+
+    def get_header(self):
+        return f'''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {self.width} {self.height}">
+        <style>
+            {self.stylesheet()}
+        </style>
+        {self.get_defs()}
+        '''
+
+    def add_rect(self, x, y, w, h, fill_id, label, sub, is_concat=False, type_color=None):
+        cls = f"n {fill_id} cat" if is_concat else f"n {fill_id}"
+        r = self.config["radius"]
+        self._emit(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{r}" class="{cls}"/>')
+        if type_color:
+            clip_id = f"clip_{self.id_prefix}{int(x)}_{int(y)}"
+            self._emit(f'<clipPath id="{clip_id}"><rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{r}" /></clipPath>')
+            self._emit(f'<rect x="{x}" y="{y}" width="5" height="{h}" class="t_{type_color}" clip-path="url(#{clip_id})" />')
+        cx, cy = x + w/2, y + h/2
+        self._emit(f'<text x="{cx+2}" y="{cy-8}" class="l">{label}</text>')
+        self._emit(f'<text x="{cx+2}" y="{cy+11}" class="d">{sub}</text>')
+
+    def add_bg_lane(self, x, w, h, color):
+        self._emit(f'<rect x="{x}" y="30" width="{w}" height="{h-30}" class="{color}" />')
+
+    def add_lane_title(self, x, w, label):
+        self._emit(f'<text x="{x+w/2}" y="55" class="lt">{label}</text>')
+        self._emit(f'<line x1="{x+20}" y1="65" x2="{x+w-20}" y2="65" class="ll"/>')
+
+    def add_link(self, p1, p2, dashed=False, routing_type="standard", via=None):
+        path = self.link_path(p1, p2, routing_type, via)
+        self._emit(f'<path d="{path}" class="{"e dash" if dashed else "e"}" />')
+
+    def add_bundle(self, lines, dashed=False):
+        self._emit(f'<path d="{self.bundle_path(lines)}" class="{"e b dash" if dashed else "e b"}" />')
+
+    def add_arrows(self, tips):
+        self._emit(f'<path d="{self.arrows_path(tips)}" class="ah" />')
+
+
+def _fmt(v, digits=1):
+    """定点精度输出数字并去掉多余的 0: 12.50 -> 12.5, 3.0 -> 3"""
+    s = f"{v:.{digits}f}"
+    if "." in s: s = s.rstrip("0").rstrip(".")
+    return "0" if s == "-0" else s
+
+
+class CompactBuilder(CSSBuilder):
+    """
+    紧凑输出: 每种节点尺寸只定义一次裁切路径和节点模板, 节点用 <use> 引用;
+    样式全部走短 class, 坐标按 config["precision"] 位小数输出, 连线使用相对路径命令.
+    色条颜色通过 currentColor 继承自 <use> 的 color (t_* class).
+    """
+    _SHORT = {"grad_bb": "b", "grad_neck": "k", "grad_head": "h", "grad_concat": "c", "grad_node": "o"}
+
+    def __init__(self, config, out=None):
+        super().__init__(config, out)
+        self.digits = config.get("precision", 1)
+        self._templates = {}
+
+    def _f(self, v):
+        return _fmt(v, self.digits)
+
+    def stylesheet(self):
+        c = self.config["colors"]
+        type_colors = self.config["type_colors"]
+        rules = [
+            f'text{{font-family:{self.config["font"]}}}',
+            f'.bg_backbone{{fill:{c["bg_backbone"]}}}.bg_neck{{fill:{c["bg_neck"]}}}.bg_head{{fill:{c["bg_head"]}}}',
+            f'.n{{stroke:{c["stroke"]};stroke-width:1;filter:url(#shadow)}}.n.cat{{stroke-width:1.5}}',
+            "".join(f'.{s}{{fill:url(#{g})}}' for g, s in self._SHORT.items()),
+            "".join(f'.t_{t}{{color:{type_colors.get(t, "transparent")}}}' for t in TYPE_NAMES),
+            '.l,.d,.lt{text-anchor:middle}.l,.d{dominant-baseline:middle}',
+            f'.l{{font-weight:bold;font-size:14px;fill:{c["text_main"]}}}.d{{font-size:10px;fill:{c["text_sub"]}}}',
+            f'.lt{{font-weight:bold;font-size:18px;fill:{c["text_main"]};letter-spacing:1px}}.ll{{stroke:#90A4AE}}',
+            f'.e{{stroke:{c["line"]};stroke-width:1.2;fill:none;marker-end:url(#arrow)}}.e.dash{{stroke-dasharray:5,3}}',
+        ]
+        if self.config.get("edge_bundling"):
+            rules.append(f'.e.b{{marker-end:none}}.ah{{fill:{c["line"]}}}')
+        return "".join(rules)
+
+    def get_defs(self):
+        g = self.config["gradients"]
+        grads = "".join(
+            f'<linearGradient id="{gid}" x2="0" y2="1"><stop offset="0" stop-color="{g[gid + "_start"]}"/>'
+            f'<stop offset="1" stop-color="{g[gid + "_end"]}"/></linearGradient>' for gid in self._SHORT)
+        return ('<defs><filter id="shadow" x="-20%" y="-20%" width="150%" height="150%">'
+                '<feGaussianBlur in="SourceAlpha" stdDeviation="2"/><feOffset dx="2" dy="2" result="offsetblur"/>'
+                '<feComponentTransfer><feFuncA type="linear" slope="0.15"/></feComponentTransfer>'
+                '<feMerge><feMergeNode/><feMergeNode in="SourceGraphic"/></feMerge></filter>'
+                '<marker id="arrow" markerWidth="6" markerHeight="6" refX="5" refY="3" orient="auto" markerUnits="strokeWidth">'
+                f'<path d="M0,0 L0,6 L6,3 z" fill="{self.config["colors"]["line"]}"/></marker>{grads}</defs>')
+
+    def get_header(self):
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                f'viewBox="0 0 {self._f(self.width)} {self._f(self.height)}">'
+                f'<style>{self.stylesheet()}</style>{self.get_defs()}\n')
+
+    def _template(self, w, h):
+        """每种 (w, h) 只输出一次 clipPath + 节点模板, 返回模板 id"""
+        key = (w, h)
+        tid = self._templates.get(key)
+        if tid is None:
+            tid = self._templates[key] = f"n{len(self._templates)}"
+            f = self._f; r = self.config["radius"]
+            self._emit(f'<defs><clipPath id="c{tid}"><rect width="{f(w)}" height="{f(h)}" rx="{r}"/></clipPath>'
+                       f'<g id="{tid}"><rect width="{f(w)}" height="{f(h)}" rx="{r}"/>'
+                       f'<rect width="5" height="{f(h)}" fill="currentColor" stroke="none" clip-path="url(#c{tid})"/></g></defs>')
+        return tid
+
+    def add_rect(self, x, y, w, h, fill_id, label, sub, is_concat=False, type_color=None):
+        f = self._f
+        tid = self._template(w, h)
+        cls = f"n {self._SHORT.get(fill_id, 'o')} t_{type_color}" + (" cat" if is_concat else "")
+        self._emit(f'<use xlink:href="#{tid}" x="{f(x)}" y="{f(y)}" class="{cls}"/>')
+        cx, cy = x + w/2 + 2, y + h/2
+        self._emit(f'<text x="{f(cx)}" y="{f(cy-8)}" class="l">{label}</text>'
+                   f'<text x="{f(cx)}" y="{f(cy+11)}" class="d">{sub}</text>')
+
+    def add_bg_lane(self, x, w, h, color):
+        f = self._f
+        self._emit(f'<rect x="{f(x)}" y="30" width="{f(w)}" height="{f(h-30)}" class="{color}"/>')
+
+    def add_lane_title(self, x, w, label):
+        f = self._f
+        self._emit(f'<text x="{f(x+w/2)}" y="55" class="lt">{label}</text>'
+                   f'<path d="M{f(x+20)} 65h{f(w-40)}" class="ll"/>')
+
+    def link_path(self, p1, p2, routing_type="standard", via=None):
+        # 先按精度取整再求差, 相对坐标不会累积误差
+        f = self._f
+        q = lambda p: (round(p[0], self.digits), round(p[1], self.digits))
+        x1, y1 = q(p1); x2, y2 = q(p2)
+        d = f"M{f(x1)} {f(y1)}"
+        if routing_type == "orthogonal" and via:
+            px, py = x1, y1
+            for x, y in [q(v) for v in via] + [(x2, y2)]:
+                if y == py: d += f"h{f(x - px)}"
+                elif x == px: d += f"v{f(y - py)}"
+                else: d += f"l{f(x - px)} {f(y - py)}"
+                px, py = x, y
+            return d
+        ctrl = curve_controls((x1, y1), (x2, y2), routing_type)
+        if ctrl is None:
+            return d + f"l{f(x2 - x1)} {f(y2 - y1)}"
+        (ax, ay), (bx, by) = ctrl
+        return d + f"c{f(ax - x1)} {f(ay - y1)} {f(bx - x1)} {f(by - y1)} {f(x2 - x1)} {f(y2 - y1)}"
+
+    def add_link(self, p1, p2, dashed=False, routing_type="standard", via=None):
+        self._emit(f'<path d="{self.link_path(p1, p2, routing_type, via)}" class="{"e dash" if dashed else "e"}"/>')
+
+    def bundle_path(self, lines):
+        # 捆绑连线全部是水平 / 竖直线段
+        f = self._f
+        q = lambda p: (round(p[0], self.digits), round(p[1], self.digits))
+        d = ""
+        for line in lines:
+            px, py = q(line[0])
+            d += f"M{f(px)} {f(py)}"
+            for x, y in map(q, line[1:]):
+                if y == py: d += f"h{f(x - px)}"
+                elif x == px: d += f"v{f(y - py)}"
+                else: d += f"l{f(x - px)} {f(y - py)}"
+                px, py = x, y
+        return d
+
+    def arrows_path(self, tips):
+        f = self._f
+        return "".join(f"M{f(x-6*dx+3.6*dy)} {f(y-6*dy-3.6*dx)}l{f(7.2*dx-3.6*dy)} {f(7.2*dy+3.6*dx)}"
+                       f"l{f(-7.2*dx-3.6*dy)} {f(3.6*dx-7.2*dy)}z" for x, y, dx, dy in tips)
+
+    def add_bundle(self, lines, dashed=False):
+        self._emit(f'<path d="{self.bundle_path(lines)}" class="{"e b dash" if dashed else "e b"}"/>')
+
+    def add_arrows(self, tips):
+        self._emit(f'<path d="{self.arrows_path(tips)}" class="ah"/>')
+
+
+def _builder_for(config):
+    if config.get("compact"): return CompactBuilder
+    if config.get("css_classes"): return CSSBuilder
+    return SVGBuilder
+
+
+def _open_out(out_file):
+    """.svgz 结尾时输出 gzip 压缩的 SVG"""
+    if str(out_file).endswith(".svgz"):
+        import gzip
+        return gzip.open(out_file, 'wt', encoding='utf-8', compresslevel=9)
+    return open(out_file, 'w', encoding='utf-8')
+
+
+_LANE_FILLS = {LANE_BACKBONE: "grad_bb", LANE_NECK: "grad_neck", LANE_HEAD: "grad_head"}
+_LANE_BG = {LANE_BACKBONE: "bg_backbone", LANE_NECK: "bg_neck", LANE_HEAD: "bg_head"}
+
+
+def annotate_shapes(graph, display_config):
+    """按需 (scale / show_params / show_flops) 计算各尺度的通道、参数量与 FLOPs"""
+    wants = display_config.get("scale") or display_config.get("show_params") or display_config.get("show_flops")
+    if wants and graph.shapes is None:
+        import shapes  # 依赖 numpy, 仅在需要时导入
+        graph.shapes = shapes.propagate(graph, display_config.get("imgsz", 640))
+    return graph
+
+
+def _draw_node(svg, graph, geom, i, display_config):
+    is_concat = graph.type_id[i] == TYPE_CONCAT
+    fill_id = "grad_concat" if is_concat else _LANE_FILLS.get(graph.lane[i], "grad_node")
+    type_color = svg.paint("type_colors", TYPE_NAMES[graph.type_id[i]])
+    x, y, w, h = geom.rect(i)
+    svg.add_rect(x, y, w, h, fill_id, graph.labels[i], graph.sub_text(i, display_config), is_concat, type_color)
+
+
+def _draw_body(svg, graph, geom, routes, display_config, groups=None):
+    """
+    z 序: 背景泳道 -> 节点 -> 连线 -> 泳道标题.
+    groups: 可选 (group_of, open_fn, close_tag); geom.order 中相邻且 group_of 相同的节点
+    包进 open_fn(g) 与 close_tag 之间 (如 LOD 的阶段 <g>, 分块输出的 <a href>).
+    """
+    _draw_lanes(svg, geom)
+
+    if groups is None:
+        for i in geom.order:
+            _draw_node(svg, graph, geom, i, display_config)
+    else:
+        group_of, open_fn, close_tag = groups
+        cur = None
+        for i in geom.order:
+            g = group_of[i]
+            if g != cur:
+                if cur is not None: svg._emit(close_tag)
+                svg._emit(open_fn(g))
+                cur = g
+            _draw_node(svg, graph, geom, i, display_config)
+        if cur is not None: svg._emit(close_tag)
+
+    _draw_links(svg, routes)
+    _draw_titles(svg, geom)
+
+
+def _draw_lanes(svg, geom):
+    for x, w, label, lane in reversed(geom.lane_bounds):
+        svg.add_bg_lane(x, w, geom.height, svg.paint("colors", _LANE_BG[lane]))
+
+
+def _draw_titles(svg, geom):
+    for x, w, label, lane in geom.lane_bounds:
+        svg.add_lane_title(x, w, label)
+
+
+def _draw_links(svg, routes):
+    """routes: route_edges 的结果, 或开启 edge_bundling 时的 bundling.BundledRoutes"""
+    bundles = getattr(routes, "bundles", None)
+    for start_pt, end_pt, dashed, routing, via in (routes if bundles is None else routes.singles):
+        svg.add_link(start_pt, end_pt, dashed, routing, via)
+    if bundles:
+        for dashed, lines, tips in bundles:
+            svg.add_bundle(lines, dashed)
+        # 多条总线通向同一终点时箭头只画一次
+        svg.add_arrows(list(dict.fromkeys(t for _, _, tips in bundles for t in tips)))
+
+
+def route_graph(graph, geom, config, prof=profiling.NULL_PROFILE):
+    """route_edges + 可选的连线捆绑 (config["edge_bundling"], 见 bundling.py); 返回可重复遍历的结果"""
+    with prof.stage("route"): routes = list(route_edges(graph, geom, config))
+    if config.get("edge_bundling"):
+        import bundling
+        with prof.stage("bundle"): routes = bundling.bundle_routes(graph, geom, routes)
+        prof.count("bundled", routes.bundled)
+    return routes
+
+
+def node_widths(graph, config, display_config, memo=None):
+    """
+    config["auto_size"] 开启且有文字放不下 node_w 时返回逐节点宽度 (见 text_metrics.py), 否则 None.
+    memo: 同一次渲染内共用的字典; 副标题只生成一次, 字体与 node_w 相同的主题只测量一次.
+    """
+    if not config.get("auto_size"):
+        return None
+    import text_metrics
+    if memo is None:
+        return text_metrics.node_widths(graph, config, display_config)
+    key = (config["font"], config["node_w"])
+    if key not in memo:
+        if "subs" not in memo:
+            memo["subs"] = [graph.sub_text(i, display_config) for i in range(len(graph))]
+        memo[key] = text_metrics.node_widths(graph, config, display_config, memo["subs"])
+    return memo[key]
+
+
+def layout_graph(graph, config, display_config):
+    """compute_layout + 自适应节点宽度"""
+    return compute_layout(graph, config, node_widths(graph, config, display_config))
+
+
+def render_svg(graph, geom, config, display_config, out=None, routes=None):
+    """
+    把 LayerGraph + Geometry 流式写入 out; 未传 out 时返回 SVG 字符串.
+    routes: 预先算好的连线 (route_edges 的结果), 多个主题共用同一布局时传入.
+    """
+    annotate_shapes(graph, display_config)
+    if routes is None:
+        routes = route_graph(graph, geom, config)
+    svg = _builder_for(config)(config, out)
+    svg.begin(geom.width, geom.height)
+    _draw_body(svg, graph, geom, routes, display_config)
+    svg.end()
+    profiling.active().count("elements", svg.elements)
+    if out is None:
+        return svg.generate()
+
+
+@contextmanager
+def svg_document(out_file, config, width, height):
+    """
+    多图文档 (contact_sheet.py): 打开 out_file (.svgz 时 gzip), 写出文档头 / 样式 / <defs>,
+    产出已 begin() 的 builder, 用 draw_graph_at 写入各张图; 正常退出 with 时写出结尾.
+    """
+    with _open_out(out_file) as f:
+        svg = _builder_for(config)(config, f)
+        svg.begin(width, height)
+        yield svg
+        svg.end()
+
+
+def draw_graph_at(svg, graph, geom, routes, display_config, x=0, y=0, scale=1.0, caption=None, id_prefix=""):
+    """
+    把一张图的 body (泳道、节点、连线、标题) 写入已 begin() 的 builder, 平移到 (x, y) 并缩放 scale.
+    caption: 写在 (x, y) 上方的一行说明 (XML 转义); id_prefix: 区分同一文档中各张图的 clipPath id.
+    """
+    if caption is not None:
+        caption = str(caption).replace("&", "&amp;").replace("<", "&lt;")
+        svg._emit(f'<text x="{x}" y="{y - 9}" font-size="16" font-weight="bold" '
+                  f'fill="{svg.config["colors"]["text_main"]}">{caption}</text>')
+    svg._emit(f'<g transform="translate({x} {round(y, 2)}) scale({scale:.4g})">')
+    svg.id_prefix = id_prefix
+    _draw_body(svg, graph, geom, routes, display_config)
+    svg._emit('</g>')
+
+
+def _draw_diff_body(svg, diff, geom, routes, display_config):
+    """与 _draw_body 相同的 z 序; 被删除的节点半透明, 增删改的节点加描边和角标, 增删的连线换色"""
+    from graph_diff import SAME, ADDED, REMOVED, CHANGED, DIFF_COLORS
+    graph, status = diff.graph, diff.node_status
+    marks = {ADDED: "+", REMOVED: "−", CHANGED: "~"}
+    for x, w, label, lane in reversed(geom.lane_bounds):
+        svg.add_bg_lane(x, w, geom.height, svg.paint("colors", _LANE_BG[lane]))
+
+    for i in geom.order:
+        s = status[i]
+        if s == REMOVED: svg._emit('<g opacity="0.45">')
+        _draw_node(svg, graph, geom, i, display_config)
+        if s == REMOVED: svg._emit('</g>')
+        if s != SAME:
+            x, y, w, h = geom.rect(i)
+            color = DIFF_COLORS[s]
+            dash = ' stroke-dasharray="5,3"' if s == REMOVED else ''
+            svg._emit(f'<rect x="{x-3}" y="{y-3}" width="{w+6}" height="{h+6}" rx="{svg.config["radius"]+3}" fill="none" stroke="{color}" stroke-width="2.5"{dash}/>')
+            svg._emit(f'<circle cx="{x+w}" cy="{y}" r="8" fill="{color}"/>')
+            svg._emit(f'<text x="{x+w}" y="{y+0.5}" font-size="12" font-weight="bold" fill="#FFFFFF" text-anchor="middle" dominant-baseline="middle">{marks[s]}</text>')
+
+    for (start_pt, end_pt, dashed, routing, via), s in zip(routes, diff.edge_status):
+        if s == SAME:
+            svg.add_link(start_pt, end_pt, dashed, routing, via)
         else:
-            # 普通模块 (Conv, C2f等)，输出通道通常在 args[0]
-            c2 = args[0] if (args and isinstance(args[0], int)) else c1
-            
-        # 记录当前层的输出通道，供后续 Concat 使用
-        layer_channels[i] = c2
-        
-        next_stride = curr_stride
-        if 'Conv' in m_str:
-            for a in args: 
-                if a == 2: next_stride *= 2; break
-        elif 'Upsample' in m_str: next_stride /= 2
-        
-        # 泳道分配
-        col = 0
-        if i >= backbone_len:
-            if 'Detect' in m_str: col = 2
-            else: col = 1
-
-        # --- 颜色与渐变逻辑 ---
-        fill_id = "grad_node"
-        if col == 0: fill_id = "grad_bb"
-        elif col == 1: fill_id = "grad_neck"
-        elif col == 2: fill_id = "grad_head"
-        
-        is_concat = False
-        if 'Concat' in label: 
-            fill_id = "grad_concat"; is_concat = True
-            
-        # --- 核心：匹配色条颜色 ---
-        type_color = config["type_colors"].get("Other") # 默认灰
-        if "Conv" in label: type_color = config["type_colors"]["Conv"]
-        elif "Concat" in label: type_color = config["type_colors"]["Concat"]
-        elif "Detect" in label: type_color = config["type_colors"]["Detect"]
-        elif "Upsample" in label: type_color = config["type_colors"]["Upsample"]
-        elif "C2f" in label: type_color = config["type_colors"]["C2f"]
-        
-        # --- 信息构建 ---
-        info_parts = []
-        if display_config.get("show_channels", True):
-            if c1 != c2 and "Detect" not in label:
-                info_parts.append(f"{c1}→{c2}")
+            dash = ' stroke-dasharray="5,3"' if s == REMOVED else ''
+            svg._emit(f'<path d="{svg.link_path(start_pt, end_pt, routing, via)}" stroke="{DIFF_COLORS[s]}" stroke-width="2" fill="none"{dash}/>')
+
+    for x, w, label, lane in geom.lane_bounds:
+        svg.add_lane_title(x, w, label)
+    svg._emit(f'<text x="12" y="20" font-size="12" fill="{svg.config["colors"]["text_sub"]}">{diff.summary()}</text>')
+
+
+def render_diff(old_path, new_path, targets, display_config):
+    """
+    结构 diff: 两个 YAML 各自流式解析并推断一次 (load_graph), 对齐后合成一张图,
+    新增 / 删除 / 修改的节点与连线按 graph_diff.DIFF_COLORS 高亮 (逐条着色, 不做 edge_bundling).
+    targets: [(config, out_file), ...], 与 render_themes 相同 (.json / .dot / .mmd 导出并集图); 返回 GraphDiff.
+    canvas 查看器不显示 diff 高亮, .html 目标抛出 ValueError.
+    """
+    import graph_diff
+    _reject_html(targets, "--diff")
+    prof = profiling.begin(f"{old_path} -> {new_path}")
+    try:
+        with prof.stage("stream"):
+            old, new = load_graph(old_path), load_graph(new_path)
+        with prof.stage("diff"): diff = graph_diff.diff_graphs(old, new)
+        graph = diff.graph
+        prof.count("layers", len(graph))
+        prof.count("edges", graph.num_edges)
+        with prof.stage("shapes"): annotate_shapes(graph, display_config)
+        layouts = {}
+        width_memo = {}
+        for config, out_file in targets:
+            exporter = _exporter_for(out_file)
+            if exporter is not None:
+                _export(prof, exporter, graph, out_file, config, display_config)
+                continue
+            with prof.stage("layout"): widths = node_widths(graph, config, display_config, width_memo)
+            lk = (layout_key(config), widths and tuple(widths))
+            if lk not in layouts:
+                with prof.stage("layout"): geom = compute_layout(graph, config, widths)
+                with prof.stage("route"): routes = list(route_edges(graph, geom, config))
+                layouts[lk] = geom, routes
+            geom, routes = layouts[lk]
+            with prof.stage("render"):
+                with _open_out(out_file) as f:
+                    svg = _builder_for(config)(config, f)
+                    svg.begin(geom.width, geom.height)
+                    _draw_diff_body(svg, diff, geom, routes, display_config)
+                    svg.end()
+            prof.count("elements", svg.elements)
+        return diff
+    finally:
+        profiling.end(prof)
+
+
+LOD_MODES = ("overview", "groups", "tiles")
+
+
+def _reject_html(targets, mode):
+    for _, out_file in targets:
+        if _is_html(out_file):
+            raise ValueError(f"{mode} does not support .html output ({out_file}), use .svg / .svgz instead")
+
+
+def _stage_group(graph, geom, stages):
+    """groups 模式: 每个阶段一个 <g>, 内含阶段外框"""
+    def open_stage(k):
+        members = stages.members(k)
+        x0 = min(geom.x[i] for i in members) - 8; y0 = min(geom.y[i] for i in members) - 8
+        x1 = max(geom.x[i] + geom.w[i] for i in members) + 8; y1 = max(geom.y[i] + geom.h[i] for i in members) + 8
+        return (f'<g class="stage" id="stage-{k}" data-layers="{members.start}-{members.stop - 1}" '
+                f'data-stride="{int(graph.stride[members.start])}">\n'
+                f'<rect x="{x0}" y="{y0}" width="{x1 - x0}" height="{y1 - y0}" rx="10" fill="none" '
+                f'stroke="#90A4AE" stroke-width="1" stroke-dasharray="4,4"/>')
+    return stages.stage_of, open_stage, '</g>'
+
+
+def render_lod(yaml_path, targets, display_config, mode="overview", max_layers=0):
+    """
+    大模型的分级细节输出 (见 lod.py): 连续同泳道、同步长的层归为一个阶段.
+        overview  每个阶段折叠为一个汇总节点
+        groups    完整图, 每个阶段包在 <g class="stage" id="stage-k"> 中 (查看器 / 编辑器可按组折叠)
+        tiles     overview + 每个阶段一张细节图 ({stem}_stages/stage_NNN.svg), 汇总节点链接到对应分块
+    max_layers: 单个阶段最多包含的层数 (0 = 不限).
+    targets: [(config, out_file), ...]; .json / .dot / .mmd 目标导出折叠后的图 (groups 模式为完整图);
+    .html 目标输出折叠图 (groups 模式为完整图) 的 canvas 查看器, tiles 模式不支持. 返回 lod.Stages.
+    """
+    import lod
+    if mode not in LOD_MODES:
+        raise ValueError(f"Unknown LOD mode '{mode}', available: {', '.join(LOD_MODES)}")
+    if mode == "tiles": _reject_html(targets, "--lod tiles")
+    prof = profiling.begin(f"{yaml_path} [lod:{mode}]")
+    try:
+        with prof.stage("stream"): graph = load_graph(yaml_path)
+        with prof.stage("lod"):
+            stages = lod.find_stages(graph, max_layers)
+            view = graph if mode == "groups" else lod.collapse(graph, stages)
+        prof.count("layers", len(graph))
+        prof.count("stages", len(stages))
+        # 汇总节点没有逐尺度的形状信息, scale / params / FLOPs 只在 groups 模式下生效
+        if mode == "groups":
+            with prof.stage("shapes"): annotate_shapes(graph, display_config)
+        layouts = {}
+        width_memo = {}
+        for config, out_file in targets:
+            exporter = _exporter_for(out_file)
+            if exporter is not None:
+                _export(prof, exporter, view, out_file, config, display_config)
+                continue
+            with prof.stage("layout"): widths = node_widths(view, config, display_config, width_memo)
+            lk = (layout_key(config), widths and tuple(widths))
+            if lk not in layouts:
+                with prof.stage("layout"): geom = compute_layout(view, config, widths)
+                routes = route_graph(view, geom, config, prof)
+                layouts[lk] = geom, routes
+            geom, routes = layouts[lk]
+            if _is_html(out_file):
+                import html_viewer
+                with prof.stage("render"):
+                    with _open_out(out_file) as f:
+                        html_viewer.write_html(view, geom, routes, config, display_config, f,
+                                               f"{os.path.basename(str(yaml_path))} [lod:{mode}]")
+                continue
+            groups = None
+            if mode == "groups":
+                groups = _stage_group(graph, geom, stages)
+            elif mode == "tiles":
+                stem, ext = os.path.splitext(out_file)
+                tile_dir = stem + "_stages"
+                rel = os.path.basename(tile_dir)
+                groups = (range(len(view)), lambda k: f'<a href="{rel}/stage_{k:03d}{ext}">', '</a>')
+            with prof.stage("render"):
+                with _open_out(out_file) as f:
+                    svg = _builder_for(config)(config, f)
+                    svg.begin(geom.width, geom.height)
+                    _draw_body(svg, view, geom, routes, display_config, groups)
+                    svg.end()
+            prof.count("elements", svg.elements)
+            if mode == "tiles":
+                os.makedirs(tile_dir, exist_ok=True)
+                # 阶段内只有一条链, 用分层布局纵向排开
+                tile_config = dict(config, layout_engine="layered")
+                for k in range(len(stages)):
+                    sub = lod.stage_subgraph(graph, stages, k)
+                    with prof.stage("layout"): tile_geom = layout_graph(sub, tile_config, display_config)
+                    with prof.stage("render"):
+                        with _open_out(os.path.join(tile_dir, f"stage_{k:03d}{ext}")) as f:
+                            render_svg(sub, tile_geom, tile_config, display_config, f)
+                    prof.count("tiles")
+        return stages
+    finally:
+        profiling.end(prof)
+
+
+def load_yaml(yaml_path):
+    """只读取构图需要的顶层键, libyaml 可用时自动使用 CSafeLoader (见 yaml_loader.py)"""
+    return yaml_loader.load_model(yaml_path)
+
+
+def load_graph(yaml_path):
+    """
+    按 YAML 事件流逐层构建 LayerGraph: 文件按块读取, 每层到达时即完成推断,
+    内存占用与文档大小 / 注释量无关. 流式读取不支持的文档退回完整解析.
+    """
+    with open(yaml_path, 'r', encoding='utf-8') as f:
+        try:
+            return build_graph_stream(yaml_loader.iter_model(f))
+        except ValueError:
+            pass
+    return build_graph(load_yaml(yaml_path))
+
+
+def graph_from_text(text):
+    """与 load_graph 相同, 输入为 YAML 文本 (str / bytes)"""
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    try:
+        return build_graph_stream(yaml_loader.iter_model(text))
+    except ValueError:
+        return build_graph(yaml_loader.load_model_text(text))
+
+
+def graph_from_source(source):
+    """YAML 文本 (str / bytes)、已加载的 YAML 字典或 LayerGraph -> LayerGraph"""
+    if isinstance(source, (str, bytes)):
+        return graph_from_text(source)
+    if isinstance(source, dict):
+        return build_graph(source)
+    if hasattr(source, "from_ptr"):
+        return source
+    raise TypeError(f"Unsupported source type: {type(source).__name__}")
+
+
+class RenderCancelled(Exception):
+    """render_bytes 的 cancel 事件被置位"""
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise RenderCancelled()
+
+
+def render_bytes(source, config, display_config, fmt="svg", out=None, cancel=None):
+    """
+    不经过文件的渲染入口 (嵌入服务时使用):
+        source   YAML 文本 (str / bytes)、已加载的 YAML 字典或 LayerGraph
+        config   主题配置字典或主题名
+        fmt      svg | svgz | html | json | dot | mermaid (见 exporters.FORMATS)
+        out      可选的可写流 (文本或二进制); 传入时写入 out 并返回 None, 否则返回 bytes
+        cancel   可选的 threading.Event; 置位后在下一个阶段 (解析 / 布局 / 路由 / 输出) 之前抛出 RenderCancelled
+    异步版本见 async_render.py.
+    """
+    import exporters
+    if isinstance(config, str):
+        import themes
+        config = themes.get_config(config)
+    ext = exporters.FORMATS.get(fmt)
+    if ext is None:
+        raise ValueError(f"Unknown format '{fmt}', available: {', '.join(exporters.FORMATS)}")
+    prof = profiling.begin(f"<{type(source).__name__}> [{fmt}]")
+    try:
+        _check_cancel(cancel)
+        with prof.stage("stream"): graph = graph_from_source(source)
+        prof.count("layers", len(graph))
+        exporter = _exporter_for("out" + ext)
+        if exporter is None:
+            with prof.stage("shapes"): annotate_shapes(graph, display_config)
+            _check_cancel(cancel)
+            with prof.stage("layout"): geom = layout_graph(graph, config, display_config)
+            _check_cancel(cancel)
+            routes = route_graph(graph, geom, config, prof)
+            _check_cancel(cancel)
+
+        def write(f):
+            if ext == ".html":
+                import html_viewer
+                with prof.stage("render"): html_viewer.write_html(graph, geom, routes, config, display_config, f)
+            elif exporter is None:
+                with prof.stage("render"): render_svg(graph, geom, config, display_config, f, routes)
             else:
-                info_parts.append(f"{c2}c")
-        
-        if display_config.get("show_repeats", True) and n > 1:
-            info_parts.append(f"n={n}")
-            
-        if display_config.get("show_args", False) and args:
-            # Concat 的参数通常是维度轴，没必要显示
-            if 'Concat' not in label:
-                rem_args = args[1:] if (args and isinstance(args[0], int)) else args
-                if rem_args:
-                    args_str = str(rem_args).replace(" ", "")
-                    if len(args_str) > 10: args_str = args_str[:8] + ".."
-                    info_parts.append(f"a:{args_str}")
-        
-        if display_config.get("show_stride", True):
-            info_parts.append(f"/{int(next_stride)}x")
-            
-        sub_text = " ".join(info_parts)
-        if not sub_text: sub_text = "Layer"
-        
-        layers.append({
-            "idx": i, "label": label, "sub": sub_text,
-            "stride": int(next_stride), "col": col, 
-            "from": abs_from, "fill_id": fill_id, "is_concat": is_concat,
-            "type_color": type_color
-        })
-        ch.append(c2)
-        curr_stride = next_stride
-
-    # 2. 布局计算 (保持 v20 逻辑)
-    svg = SVGBuilder(config)
-    coords = {} 
-    
-    # Backbone
-    current_y = 100
-    backbone_items = [l for l in layers if l['col'] == 0]
-    for l in backbone_items:
-        center_x = config["lane_width_bb"] / 2
-        props = svg.add_rect(center_x - config["node_w"]/2, current_y, config["node_w"], config["node_h"], l['fill_id'], l['label'], l['sub'], l['is_concat'], l['type_color'])
-        props['col'] = 0; props['neck_col_id'] = -1
-        coords[l['idx']] = props
-        current_y += config["bb_step"]
-    max_bb_y = current_y - config["bb_step"] + config["node_h"]
-    
-    # Neck
-    neck_items = [l for l in layers if l['col'] == 1]
-    neck_start_y = 100
-    neck_curr_y = neck_start_y
-    neck_col_idx = 0 
-    neck_cols_layout = [[], [], []]
-    
-    for l in neck_items:
-        if neck_curr_y > max_bb_y and neck_col_idx < 2:
-            neck_col_idx += 1; neck_curr_y = neck_start_y
-        neck_cols_layout[neck_col_idx].append(l)
-        neck_curr_y += config["neck_step"]
-        
-    actual_neck_width = 0
-    for c_id, items in enumerate(neck_cols_layout):
-        if not items: continue
-        base_x = config["lane_width_bb"] + c_id * (config["lane_width_neck_col"] + config["col_gap"])
-        center_x = base_x + config["lane_width_neck_col"] / 2
-        curr_y = neck_start_y
-        for l in items:
-            props = svg.add_rect(center_x - config["node_w"]/2, curr_y, config["node_w"], config["node_h"], l['fill_id'], l['label'], l['sub'], l['is_concat'], l['type_color'])
-            props['col'] = 1; props['neck_col_id'] = c_id
-            coords[l['idx']] = props
-            curr_y += config["neck_step"]
-        actual_neck_width = base_x + config["lane_width_neck_col"]
-
-    # Head
-    head_items = [l for l in layers if l['col'] == 2]
-    head_start_x = actual_neck_width 
-    head_curr_y = neck_start_y
-    for l in head_items:
-        center_x = head_start_x + config["lane_width_head"] / 2
-        src_ys = [coords[s]['rect'][1] for s in l['from'] if s in coords]
-        target_y = sum(src_ys)/len(src_ys) if src_ys else head_curr_y
-        if target_y < head_curr_y: target_y = head_curr_y
-        
-        props = svg.add_rect(center_x - config["node_w"]/2, target_y, config["node_w"], config["node_h"], l['fill_id'], l['label'], l['sub'], l['is_concat'], l['type_color'])
-        props['col'] = 2; props['neck_col_id'] = 99
-        coords[l['idx']] = props
-        head_curr_y = target_y + config["neck_step"]
-
-    # Routing
-    for l in layers:
-        if l['idx'] not in coords: continue
-        dst = coords[l['idx']]
-        for src_idx in l['from']:
-            if src_idx not in coords: continue
-            src = coords[src_idx]
-            p1 = src['rect']; p2 = dst['rect']
-            start_pt = (p1[0]+p1[2], p1[1]+p1[3]/2); end_pt = (p2[0], p2[1]+p2[3]/2)
-            dashed = (l['col'] != src['col']) or abs(l['idx'] - src_idx) > 1
-            routing = "standard"
-            
-            if l['col'] == 0 and src['col'] == 0:
-                if abs(l['idx'] - src_idx) == 1:
-                    start_pt = (p1[0]+p1[2]/2, p1[1]+p1[3]); end_pt = (p2[0]+p2[2]/2, p2[1])
-                    routing = "vertical_straight"; dashed = False
-            elif src['col'] == 0 and dst['col'] == 1: routing = "manhattan"
-            elif src['col'] == 1 and dst['col'] == 1 and src['neck_col_id'] == dst['neck_col_id']:
-                if abs(l['idx'] - src_idx) == 1:
-                    start_pt = (p1[0]+p1[2]/2, p1[1]+p1[3]); end_pt = (p2[0]+p2[2]/2, p2[1])
-                    routing = "vertical_straight"
+                with prof.stage("export"): exporter(graph, f, config, display_config)
+
+        if out is None:
+            buf = io.StringIO()
+            write(buf)
+            data = buf.getvalue().encode("utf-8")
+            if ext == ".svgz":
+                import gzip
+                data = gzip.compress(data, compresslevel=9)
+            prof.count("bytes", len(data))
+            return data
+        if isinstance(out, io.TextIOBase):
+            if ext == ".svgz": raise ValueError("svgz output needs a binary stream")
+            write(out)
+            return None
+        # 二进制流: 包一层文本编码 (svgz 再包一层 gzip), 结束后解除包装, 不关闭 out
+        raw = out
+        if ext == ".svgz":
+            import gzip
+            raw = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=9)
+        text = io.TextIOWrapper(raw, encoding="utf-8", write_through=True)
+        try:
+            write(text)
+            text.flush()
+        finally:
+            text.detach()
+            if raw is not out: raw.close()
+        return None
+    finally:
+        profiling.end(prof)
+
+
+def _is_html(out_file):
+    """.html 输出: 需要布局的 canvas 查看器 (html_viewer.py), 不是 SVG"""
+    return str(out_file).lower().endswith((".html", ".htm"))
+
+
+def _exporter_for(out_file):
+    """非 SVG 输出 (.json / .dot / .mmd ...) 的导出函数, 见 exporters.py; SVG 与 .html 返回 None"""
+    if str(out_file).lower().endswith((".svg", ".svgz", ".html", ".htm")):
+        return None
+    import exporters
+    return exporters.exporter_for(out_file)
+
+
+def _out_kind(out_file):
+    """缓存键中的输出类型: (小写扩展名, 是否 gzip 压缩), 与 _open_out 的判断一致"""
+    out_file = str(out_file)
+    return os.path.splitext(out_file)[1].lower(), out_file.endswith(".svgz")
+
+
+def _export(prof, exporter, graph, out_file, config, display_config):
+    with prof.stage("export"):
+        with open(out_file, 'w', encoding='utf-8') as f: exporter(graph, f, config, display_config)
+    if prof is not profiling.NULL_PROFILE:
+        prof.count("files")
+        prof.count("bytes", os.path.getsize(out_file))
+
+
+def render_themes(yaml_path, targets, display_config, cache=None):
+    """
+    同一个模型输出多个主题: 只解析一次, 每组布局参数 (layout.layout_key) 只布局和路由一次,
+    之后每个主题只是一次序列化. css_classes / compact 模式下圆角相同的主题直接共用同一段 body,
+    只替换 <style> 和 <defs>. out_file 以 .svgz 结尾时输出 gzip 压缩文件.
+    targets: [(config, out_file), ...]; 返回每个 target 是否命中缓存的列表.
+    out_file 为 .json / .dot / .gv / .mmd 时交给 exporters.py, 与 SVG 共用同一次解析且不做布局;
+    为 .html 时输出 canvas 查看器 (html_viewer.py), 与 SVG 共用同一次布局.
+    cache: 可选的 render_cache.RenderCache; 输入未变化时跳过解析、布局与写文件.
+    开启 profiling 时按阶段记录耗时与计数 (见 profiling.py).
+    """
+    prof = profiling.begin(str(yaml_path))
+    try:
+        return _render_themes(prof, yaml_path, targets, display_config, cache)
+    finally:
+        profiling.end(prof)
+
+
+def _render_themes(prof, yaml_path, targets, display_config, cache):
+    hits = [False] * len(targets)
+    keys = [None] * len(targets)
+    if cache is None:
+        with prof.stage("stream"): graph = load_graph(yaml_path)
+    else:
+        with prof.stage("cache"):
+            with open(yaml_path, 'rb') as f: yaml_bytes = f.read()
+            for k, (config, out_file) in enumerate(targets):
+                keys[k] = cache.svg_key(yaml_bytes, config, display_config, _out_kind(out_file))
+                hits[k] = cache.restore(keys[k], out_file)
+            prof.count("cache_hits", sum(hits))
+            if all(hits):
+                return hits
+            graph_key = cache.graph_key(yaml_bytes)
+            graph = cache.get_graph(graph_key)
+        if graph is None:
+            with prof.stage("stream"): graph = graph_from_text(yaml_bytes)
+            with prof.stage("cache"): cache.put_graph(graph_key, graph)
+    prof.count("layers", len(graph))
+    prof.count("edges", graph.num_edges)
+    with prof.stage("shapes"): annotate_shapes(graph, display_config)
+
+    layouts = {}
+    bodies = {}
+    width_memo = {}
+    for k, (config, out_file) in enumerate(targets):
+        if hits[k]:
+            continue
+        exporter = _exporter_for(out_file)
+        if exporter is not None:
+            _export(prof, exporter, graph, out_file, config, display_config)
+            if cache is not None:
+                with prof.stage("cache"): cache.store(keys[k], out_file)
+            continue
+        with prof.stage("layout"):
+            widths = node_widths(graph, config, display_config, width_memo)
+        # 所有节点都放得下 node_w 时 widths 为 None, 不同字体的主题仍共用同一布局
+        lk = (layout_key(config), widths and tuple(widths))
+        if lk not in layouts:
+            with prof.stage("layout"): geom = compute_layout(graph, config, widths)
+            routes = route_graph(graph, geom, config, prof)
+            layouts[lk] = geom, routes
+        geom, routes = layouts[lk]
+        builder = _builder_for(config)
+        with prof.stage("render"):
+            with _open_out(out_file) as f:
+                if _is_html(out_file):
+                    import html_viewer
+                    html_viewer.write_html(graph, geom, routes, config, display_config, f, os.path.basename(str(yaml_path)))
+                elif builder is not SVGBuilder:
+                    bk = (lk, builder, config["radius"], config.get("precision"))
+                    if bk not in bodies:
+                        body = builder(config)
+                        _draw_body(body, graph, geom, routes, display_config)
+                        bodies[bk] = body.generate(), body.elements
+                    svg = builder(config, f)
+                    svg.begin(geom.width, geom.height)
+                    svg._write(bodies[bk][0])
+                    svg.end()
+                    prof.count("elements", bodies[bk][1])
                 else:
-                    start_pt = (p1[0]+p1[2], p1[1]+p1[3]/2); end_pt = (p2[0]+p2[2], p2[1]+p2[3]/2)
-                    routing = "detour_right"
-            elif dst['rect'][0] < src['rect'][0]:
-                start_pt = (p1[0], p1[1]+p1[3]/2); end_pt = (p2[0]+p2[2], p2[1]+p2[3]/2)
-            
-            svg.add_link(start_pt, end_pt, dashed, routing)
-
-    # Output
-    total_w = head_start_x + config["lane_width_head"]
-    svg.width = total_w; svg.height = max_bb_y + 50
-    svg.add_bg_lane(0, config["lane_width_bb"], svg.height, "Backbone", config["colors"]["bg_backbone"])
-    svg.add_bg_lane(config["lane_width_bb"], head_start_x - config["lane_width_bb"], svg.height, "Neck", config["colors"]["bg_neck"])
-    svg.add_bg_lane(head_start_x, config["lane_width_head"], svg.height, "Head", config["colors"]["bg_head"])
-
-    
-    with open(out_file, 'w', encoding='utf-8') as f:
-        f.write(svg.generate())
\ No newline at end of file
+                    render_svg(graph, geom, config, display_config, f, routes)
+        if prof is not profiling.NULL_PROFILE:
+            prof.count("files")
+            prof.count("bytes", os.path.getsize(out_file))
+        if cache is not None:
+            with prof.stage("cache"): cache.store(keys[k], out_file)
+    return hits
+
+
+def parse_and_layout(yaml_path, out_file, config, display_config, cache=None):
+    """解析 YAML 并输出 SVG (单主题的 render_themes); 不经过文件的版本见 render_bytes"""
+    render_themes(yaml_path, [(config, out_file)], display_config, cache)